@@ -0,0 +1,104 @@
+"""語音音源 CPU 基準測試：每個串流即時解碼 (FFmpegPCMAudio) vs. 快取的 Opus 封包
+
+原本每次播放都開一個 ffmpeg 把 mp3 解成 PCM，py-cord 再把 PCM 編碼成 Opus；
+快取版只在第一次轉檔，之後所有串流共用同一份 Opus 封包。
+量測每個串流產生一分鐘音訊所花的 CPU 秒數。需要 ffmpeg；PCM→Opus 編碼需要 py-cord 與 libopus，
+沒有的話只計算 ffmpeg 解碼的部分 (實際成本會更高)。
+
+執行: python ./bench/bench_audio_cpu.py omg.mp3 --streams 10 --seconds 60
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+import audio_cache  # noqa: E402
+
+FRAME_BYTES = 3840  # 20ms、48kHz、雙聲道 16-bit PCM
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def load_encoder():
+    try:
+        from discord import opus
+        if not opus.is_loaded():
+            opus._load_default()
+        return opus.Encoder()
+    except Exception as e:
+        print(f"(沒有 libopus，略過 PCM→Opus 編碼: {e})")
+        return None
+
+
+def bench_ffmpeg(sound_file: str, streams: int, seconds: float, encoder):
+    """原本的做法：每個串流一個 ffmpeg 解碼 PCM，再逐幀編碼成 Opus"""
+    cpu_before, proc_before = children_cpu(), time.process_time()
+    procs = [
+        subprocess.Popen([
+            "ffmpeg", "-loglevel", "error", "-stream_loop", "-1", "-i", sound_file,
+            "-t", str(seconds), "-f", "s16le", "-ar", "48000", "-ac", "2", "pipe:1",
+        ], stdout=subprocess.PIPE)
+        for _ in range(streams)
+    ]
+    frames = 0
+    for proc in procs:
+        while True:
+            pcm = proc.stdout.read(FRAME_BYTES)
+            if len(pcm) < FRAME_BYTES:
+                break
+            if encoder is not None:
+                encoder.encode(pcm, encoder.SAMPLES_PER_FRAME)
+            frames += 1
+        proc.wait()
+    return children_cpu() - cpu_before, time.process_time() - proc_before, frames
+
+
+def bench_cached(sound_file: str, streams: int, seconds: float):
+    """快取版：轉檔一次，之後每個串流只是讀記憶體中的封包"""
+    cpu_before, proc_before = children_cpu(), time.process_time()
+    packets = audio_cache.load_sound(sound_file)
+    setup_cpu = (children_cpu() - cpu_before) + (time.process_time() - proc_before)
+
+    proc_before = time.process_time()
+    frames_per_stream = int(seconds * 50)
+    frames = 0
+    for _ in range(streams):
+        source = audio_cache.OpusLoop(packets, loop=True)
+        for _ in range(frames_per_stream):
+            source.next_packet()
+            frames += 1
+    return setup_cpu, time.process_time() - proc_before, frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sound_file", nargs="?", default=os.getenv("SOUND_FILE_PATH", "omg.mp3"))
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=60.0, help="每個串流的音訊長度")
+    args = parser.parse_args()
+
+    # 轉檔快取放暫存資料夾，確保量到第一次轉檔的成本
+    audio_cache.AUDIO_CACHE_ROOT = tempfile.mkdtemp(prefix="audio_cache_")
+
+    minutes = args.streams * args.seconds / 60
+    print(f"{args.streams} 個串流，每個 {args.seconds:.0f} 秒音訊 ({args.sound_file})")
+
+    child, own, frames = bench_ffmpeg(args.sound_file, args.streams, args.seconds, load_encoder())
+    print(f"FFmpegPCMAudio : ffmpeg {child:.3f}s + 編碼 {own:.3f}s，"
+          f"每串流每分鐘 {(child + own) / minutes:.3f} CPU 秒 ({frames} 幀)")
+
+    setup, own, frames = bench_cached(args.sound_file, args.streams, args.seconds)
+    print(f"CachedOpusAudio: 一次性轉檔 {setup:.3f}s，播放 {own:.3f}s，"
+          f"每串流每分鐘 {own / minutes:.5f} CPU 秒 ({frames} 幀)")
+
+
+if __name__ == "__main__":
+    main()
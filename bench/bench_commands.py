@@ -0,0 +1,429 @@
+"""斜線指令基準測試：不連線 Discord、不呼叫真的 LLM，直接執行指令本身的程式
+
+- 在暫存資料夾建立合成的使用者、任務、複習卡片與題庫 (規模可調)
+- 以假的 ApplicationContext 呼叫各指令的 callback，回覆內容照 Discord 的格式序列化
+- LLM 換成本機的 OpenAI 相容假伺服器 (bench/mock_llm.py)，延遲可調
+- 出題另外量測背景工作 (worker 呼叫 LLM + 把題目貼回頻道)
+
+每個指令回報 p50 / p99 / 平均延遲、吞吐量與尖峰記憶體配置 (tracemalloc)，
+結果可存成 JSON，之後用 --compare 比對是否變慢。
+
+需要完整安裝機器人的套件 (py-cord、openai、pydantic 等)。
+
+執行: python ./bench/bench_commands.py --users 200 --tasks 50 --iterations 200 --out bench_commands.json
+      python ./bench/bench_commands.py --compare bench_commands.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+BOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+sys.path.insert(0, BOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm import MockLLMServer  # noqa: E402
+
+SUBJECTS = ["國文", "數學", "英文", "理化", "歷史"]
+WORDS = ["光合作用", "細胞", "牛頓", "加速度", "醉翁亭記", "二次函數", "三角形", "工業革命",
+         "民主", "氧化", "還原", "電流", "電壓", "文法", "過去式", "單字", "地形", "氣候", "唐朝", "宋朝"]
+
+
+# ==================== 合成資料 ====================
+
+def make_knowledge(folder: str, chunks: int, rng: random.Random):
+    """每個科目一個題庫 JSON (格式同 upload 處理後的輸出)"""
+    os.makedirs(folder, exist_ok=True)
+    for subject in SUBJECTS:
+        docs = [{
+            "category": subject,
+            "source": f"{subject}_第{i // 20 + 1}課.pdf",
+            "content": "，".join(rng.choice(WORDS) + "的說明" for _ in range(40)) + "。",
+        } for i in range(chunks)]
+        with open(os.path.join(folder, f"{subject}.json"), "w", encoding="utf-8") as f:
+            json.dump(docs, f, ensure_ascii=False)
+
+
+def make_users(users: int, tasks: int, rng: random.Random):
+    """合成的使用者資料：作業 / 複習任務、計時紀錄、複習卡片、談心記錄"""
+    from analytics import ensure_stats, record_added, record_completed, record_timer
+    from estimator import observe
+    from srs import new_card
+
+    now = datetime.now()
+    data = {}
+    for u in range(users):
+        user_data = {"tasks": [], "timers": {}, "chat_history": [], "personality_profile": ""}
+        ensure_stats(user_data)
+        for task_id in range(1, tasks + 1):
+            subject = rng.choice(SUBJECTS)
+            created = now - timedelta(days=rng.randint(0, 60))
+            task = {
+                "id": task_id,
+                "type": "作業" if task_id % 3 else "複習",
+                "subject": subject,
+                "estimated_time": rng.choice([20, 30, 45, 60, 90]),
+                "actual_time": None,
+                "deadline": (now + timedelta(days=rng.randint(-20, 40))).replace(microsecond=0).isoformat(),
+                "completed": False,
+                "created_at": created.isoformat(),
+            }
+            if task["type"] == "作業":
+                task["pages"] = f"p.{task_id}-{task_id + 10}"
+            else:
+                task["range"] = f"第{task_id}章"
+                task["confidence"] = rng.randint(1, 10)
+            record_added(user_data, when=created)
+            # 大約一半已完成且有計時紀錄 (越前面的任務越可能已完成)
+            if task_id <= tasks // 2 and rng.random() < 0.8:
+                minutes = round(task["estimated_time"] * rng.uniform(0.6, 1.6), 1)
+                task["actual_time"] = minutes
+                task["completed"] = True
+                done = created + timedelta(days=rng.randint(0, 5))
+                task["completed_at"] = done.isoformat()
+                record_timer(user_data, task, minutes, when=done)
+                record_completed(user_data, task, when=done)
+                observe(user_data, task, minutes)
+            user_data["tasks"].append(task)
+
+        cards = {}
+        for card_id in range(1, tasks // 5 + 1):
+            # 部分卡片今天到期或已逾期
+            cards[str(card_id)] = new_card(card_id, rng.choice(SUBJECTS), f"第{card_id}章", rng.randint(1, 10), 30,
+                                           today=(now + timedelta(days=rng.randint(-5, 10))).date())
+        user_data["cards"] = cards
+        user_data["next_card_id"] = len(cards) + 1
+        user_data["next_task_id"] = tasks + 1
+
+        for i in range(rng.randint(0, 8)):
+            user_data["chat_history"] += [{"role": "user", "content": f"今天讀{rng.choice(WORDS)}好累 ({i})"},
+                                          {"role": "assistant", "content": "辛苦了，記得休息一下 💙"}]
+        data[str(1000 + u)] = user_data
+    return data
+
+
+# ==================== 假的 Discord 物件 ====================
+
+class FakeChannel:
+    def __init__(self, channel_id: int, sink):
+        self.id = channel_id
+        self._sink = sink
+
+    async def send(self, content=None, **kwargs):
+        return self._sink(content, kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, sink):
+        self._sink = sink
+
+    async def send(self, content=None, **kwargs):
+        return self._sink(content, kwargs)
+
+
+class FakeContext:
+    """斜線指令用到的 ApplicationContext 屬性；送出的內容照 Discord API 的格式序列化後記錄下來"""
+
+    def __init__(self, user_id: int, command: str, channel_id: int = 1, guild_id: int = 1):
+        self.author = SimpleNamespace(id=user_id, mention=f"<@{user_id}>", display_name=f"同學{user_id}", voice=None)
+        self.guild = SimpleNamespace(id=guild_id)
+        self.guild_id = guild_id
+        self.channel = FakeChannel(channel_id, self._record)
+        self.channel_id = channel_id
+        self.followup = FakeFollowup(self._record)
+        self.interaction = SimpleNamespace(created_at=datetime.now(timezone.utc))
+        self.command = SimpleNamespace(qualified_name=command)
+        self.responses = 0
+        self.sent_bytes = 0
+
+    def _record(self, content, kwargs):
+        payload = {"content": content}
+        embeds = kwargs.get("embeds") or ([kwargs["embed"]] if kwargs.get("embed") else [])
+        if embeds:
+            payload["embeds"] = [embed.to_dict() for embed in embeds]
+        if kwargs.get("view") is not None:
+            payload["components"] = kwargs["view"].to_components()
+        self.responses += 1
+        self.sent_bytes += len(json.dumps(payload, ensure_ascii=False, default=str))
+
+    async def respond(self, content=None, **kwargs):
+        return self._record(content, kwargs)
+
+    async def defer(self, **kwargs):
+        pass
+
+
+# ==================== 要量測的指令 ====================
+
+def scenarios(study, args, today: str):
+    """(名稱, 指令, 參數產生函式)；參數要全部明確傳入 (預設值是 Option 物件)
+
+    計時與完成任務用後半段還沒完成的任務：同一次 i 先開始計時、再結束計時、最後完成
+    """
+    undone = args.tasks - args.tasks // 2
+
+    def task_id(i):
+        return args.tasks // 2 + (i // args.users) % undone + 1
+
+    return [
+        ("新增作業", study.add_homework,
+         lambda i: dict(日期=today, 科目=SUBJECTS[i % 5], 頁數="p.1-10", 預估時間=30, 自動修正=bool(i % 2))),
+        ("新增複習", study.add_review,
+         lambda i: dict(科目=SUBJECTS[i % 5], 範圍="第1-3章", 把握度=i % 10 + 1, 預估時間=30,
+                        使用遺忘曲線=bool(i % 2), 自動修正=False)),
+        ("開始計時", study.start_timer, lambda i: dict(任務編號=task_id(i))),
+        ("結束計時", study.stop_timer, lambda i: dict(任務編號=task_id(i))),
+        ("完成任務", study.complete_task, lambda i: dict(任務編號=task_id(i))),
+        ("我的任務", study.my_tasks, lambda i: {}),
+        ("查看日期", study.view_date, lambda i: dict(日期=today)),
+        ("整月行事曆", study.monthly_calendar, lambda i: dict(年份=None, 月份=None)),
+        ("統計", study.study_stats, lambda i: dict(期間=("今天", "本週")[i % 2], 往前=0)),
+        ("讀書計畫", study.study_plan, lambda i: dict(每日分鐘=120, 天數=7)),
+        ("今日複習", study.due_reviews, lambda i: {}),
+        ("出題", study.exam,
+         lambda i: dict(subject=SUBJECTS[i % 5], 主題=WORDS[i % len(WORDS)] if i % 2 else None)),
+        ("談心", study.chat_with_bot, lambda i: dict(心情=f"明天要考{WORDS[i % len(WORDS)]}，好緊張")),
+    ]
+
+
+async def run_quiz_job(study):
+    """背景出題：worker 取出工作並呼叫 LLM，再由機器人把題目貼回頻道"""
+    from jobs import run_job
+
+    job = await asyncio.to_thread(study.job_queue.claim, ["generate_quiz"])
+    if job is None:
+        return 0
+    await asyncio.to_thread(run_job, job, study.job_queue)
+    finished = await asyncio.to_thread(study.job_queue.pop_finished, ["generate_quiz"], 50, study.JOB_OWNER, True)
+    for job in finished:
+        await study.on_quiz_job(job)
+    return len(finished)
+
+
+# ==================== 量測 ====================
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def measure(name, call, iterations: int, concurrency: int, trace_calls: int):
+    """先量延遲與吞吐量，再另外跑幾次量尖峰記憶體 (tracemalloc 會拖慢執行)"""
+    latencies, errors, sent = [], 0, 0
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors, sent
+        async with limit:
+            ctx = None
+            started = time.perf_counter()
+            try:
+                ctx = await call(i)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    logging.error(f"❌ {name} 第 {i} 次失敗: {e!r}")
+            latencies.append(time.perf_counter() - started)
+            if ctx is not None:
+                sent += ctx.sent_bytes
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    elapsed = time.perf_counter() - started
+
+    peak = 0
+    if trace_calls:
+        tracemalloc.start()
+        for i in range(iterations, iterations + trace_calls):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                await call(i)
+            except Exception:
+                pass
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+    return {
+        "calls": iterations,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+        "throughput": iterations / elapsed if elapsed else 0.0,
+        "peak_kb": peak / 1024,
+        "response_bytes": sent / iterations if iterations else 0,
+    }
+
+
+async def run(args, study):
+    today = datetime.now().strftime("%Y-%m-%d")
+    results = {}
+    for name, command, make_kwargs in scenarios(study, args, today):
+        if args.only and name not in args.only:
+            continue
+
+        async def call(i, command=command, make_kwargs=make_kwargs, name=name):
+            ctx = FakeContext(1000 + i % args.users, name)
+            await command.callback(ctx, **make_kwargs(i))
+            return ctx
+
+        results[name] = await measure(name, call, args.iterations, args.concurrency, args.trace_calls)
+        print(f"  {name} 完成", file=sys.stderr)
+
+    if not args.only or "出題" in args.only:
+        async def quiz_job(i):
+            await run_quiz_job(study)
+
+        # 出題指令排入的工作數 = iterations + trace_calls
+        results["出題(背景)"] = await measure("出題(背景)", quiz_job, args.iterations, 1, args.trace_calls)
+    return results
+
+
+# ==================== 輸出與比對 ====================
+
+def print_table(results):
+    print(f"\n{'指令':<10}{'p50':>9}{'p99':>9}{'平均':>9}{'次/秒':>9}{'尖峰':>10}{'回覆':>9}{'錯誤':>6}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['p50_ms']:>7.2f}ms{r['p99_ms']:>7.2f}ms{r['mean_ms']:>7.2f}ms"
+              f"{r['throughput']:>9.1f}{r['peak_kb']:>8.0f}KB{r['response_bytes']:>8.0f}B{r['errors']:>6}")
+
+
+def compare(old, new, threshold: float) -> bool:
+    """與之前的結果比對，p50 / p99 變慢超過 threshold 就算退步"""
+    print(f"\n與 {old['created_at']} 的結果比較 (門檻 +{threshold:.0%}):")
+    regressed = False
+    for name, r in new["commands"].items():
+        before = old["commands"].get(name)
+        if not before:
+            print(f"  {name:<10} (新指令)")
+            continue
+        marks = []
+        for key in ("p50_ms", "p99_ms", "peak_kb"):
+            change = (r[key] - before[key]) / before[key] if before[key] else 0.0
+            flag = "⚠️" if change > threshold else ""
+            regressed |= bool(flag) and key != "peak_kb"
+            marks.append(f"{key[:-3]} {before[key]:.1f}→{r[key]:.1f} ({change:+.0%}){flag}")
+        print(f"  {name:<10} " + " | ".join(marks))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=50, help="每位使用者的任務數")
+    parser.add_argument("--chunks", type=int, default=300, help="每個科目的題庫片段數")
+    parser.add_argument("--iterations", type=int, default=200, help="每個指令執行次數")
+    parser.add_argument("--concurrency", type=int, default=1, help="同時執行的指令數")
+    parser.add_argument("--trace-calls", type=int, default=5, help="量測尖峰記憶體的額外次數 (0 = 不量)")
+    parser.add_argument("--latency", type=float, default=50, help="假 LLM 的回覆延遲 (毫秒)")
+    parser.add_argument("--user-db", action="store_true", help="使用者資料改存 SQLite (USER_DB)")
+    parser.add_argument("--only", nargs="*", help="只量測這些指令 (例如 --only 新增作業 談心)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="把結果存成 JSON 檔")
+    parser.add_argument("--compare", help="與之前存的 JSON 比較")
+    parser.add_argument("--threshold", type=float, default=0.2, help="視為退步的變慢比例")
+    parser.add_argument("--keep", action="store_true", help="保留暫存資料夾")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # 先把 --out / --compare 換成絕對路徑，下面會切換到暫存資料夾
+    out = os.path.abspath(args.out) if args.out else None
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+
+    llm = MockLLMServer(latency=args.latency / 1000).start()
+    workdir = tempfile.mkdtemp(prefix="bench_commands_")
+    os.chdir(workdir)
+
+    # 機器人讀的設定都在 import 時決定，要在 import study 之前設好
+    # (已經設定的環境變數不會被 .env 覆蓋)
+    os.environ.update({
+        "OPENROUTER_BASE_URL": llm.base_url,
+        "OPENROUTER_API_KEY": "mock",
+        "INGEST_WORKERS": "0",
+        "LLM_WORKERS": "0",
+        "KNOWLEDGE_WATCH_INTERVAL": "0",
+        "ENABLE_EMBEDDINGS": "0",
+        "SHARD_COUNT": "0",
+        "SHARD_PROCESSES": "1",
+        "METRICS_PORT": "0",
+        "JOB_DB": os.path.join(workdir, "jobs.sqlite3"),
+        "QUIZ_HISTORY_FILE": os.path.join(workdir, "quiz_history.jsonl"),
+        "USER_DB": os.path.join(workdir, "study_data.sqlite3") if args.user_db else "",
+    })
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    make_knowledge("json_knowledge", args.chunks, rng)
+    data = make_users(args.users, args.tasks, rng)
+    with open("study_data.json", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    data_mb = os.path.getsize("study_data.json") / 1e6
+    del data
+    print(f"合成資料: {args.users} 位使用者 × {args.tasks} 個任務 ({data_mb:.1f} MB)，"
+          f"{len(SUBJECTS)} 個科目 × {args.chunks} 筆片段 ({time.perf_counter() - started:.1f} 秒)")
+
+    import study
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    # on_ready 裡不需連線的初始化 (不啟動背景工作)
+    study.load_all_knowledge()
+    study.reminder_service.load(study.load_data())
+    study.due_index.load(study.load_data())
+    study.mastery_tracker.load()
+    # 出題結果貼到假的頻道
+    results_channel = FakeChannel(1, lambda content, kwargs: None)
+    study.bot.get_channel = lambda channel_id: results_channel
+
+    print(f"每個指令 {args.iterations} 次 (同時 {args.concurrency} 個)，LLM 延遲 {args.latency:g} ms，"
+          f"使用者資料: {'SQLite' if args.user_db else 'JSON'}", file=sys.stderr)
+    try:
+        results = asyncio.run(run(args, study))
+    finally:
+        llm.stop()
+        os.chdir(BOT_DIR)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n行程尖峰 RSS: {rss_mb:.0f} MB，假 LLM 收到 {llm.requests} 個請求")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {key: getattr(args, key) for key in
+                   ("users", "tasks", "chunks", "iterations", "concurrency", "latency", "user_db", "seed")},
+        "data_mb": data_mb,
+        "rss_mb": rss_mb,
+        "commands": results,
+    }
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 已存到 {out}")
+    if previous and compare(previous, report, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
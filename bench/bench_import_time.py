@@ -0,0 +1,86 @@
+"""啟動匯入時間：以 python -X importtime 匯入機器人模組，彙總各套件花費的時間
+
+每次在新的直譯器中匯入 (沒有 .pyc 以外的快取)，取多次的中位數，
+並列出啟動時就被載入的重量級套件 (應該只在第一次使用時才載入)。
+
+執行: python ./bench/bench_import_time.py --module study --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot")
+
+# 不應該在啟動時載入的套件
+HEAVY = ["openai", "pydantic", "pypdf", "numpy", "langchain_community", "sentence_transformers",
+         "transformers", "torch", "unstructured", "ollama"]
+
+
+def import_once(module: str, workdir: str):
+    """在新的直譯器中匯入一次，回傳 ({頂層套件: 自身微秒}, 總微秒, 錯誤訊息)"""
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(BOT_DIR))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    by_package = defaultdict(int)
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        by_package[name.split(".")[0]] += int(self_us)
+        if name == module:
+            total = int(cumulative_us)
+    error = proc.stderr.strip().splitlines()[-1] if proc.returncode else None
+    return by_package, total, error
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="study", help="要量測的模組 (bot/ 底下)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="把結果存成 JSON 檔")
+    args = parser.parse_args()
+
+    # 在暫存資料夾執行，避免匯入時建立的資料庫等檔案留在專案中
+    workdir = tempfile.mkdtemp(prefix="bench_import_")
+    runs = [import_once(args.module, workdir) for _ in range(args.runs)]
+    error = runs[-1][2]
+    if error:
+        print(f"⚠️ 匯入 {args.module} 失敗 (缺少套件時結果不完整): {error}")
+
+    totals = [total for _, total, _ in runs]
+    packages = defaultdict(list)
+    for by_package, _, _ in runs:
+        for name, us in by_package.items():
+            packages[name].append(us)
+    medians = {name: statistics.median(values) for name, values in packages.items()}
+    loaded_heavy = [name for name in HEAVY if name in medians]
+
+    print(f"匯入 {args.module}: 中位數 {statistics.median(totals) / 1000:.1f} ms ({args.runs} 次)")
+    print("\n花費最多的套件 (自身時間):")
+    for name, us in sorted(medians.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<28} {us / 1000:8.1f} ms")
+    print(f"\n啟動時載入的重量級套件: {', '.join(loaded_heavy) or '無'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "module": args.module,
+                "total_ms": statistics.median(totals) / 1000,
+                "packages_ms": {name: us / 1000 for name, us in medians.items()},
+                "heavy_loaded": loaded_heavy,
+                "error": error,
+            }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
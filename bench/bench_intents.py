@@ -0,0 +1,171 @@
+"""Gateway intents 基準測試：大型伺服器下各設定的啟動資料量、記憶體與每小時事件量
+
+依 Discord gateway 的規則模擬一個大型伺服器送來的 payload (不需連線 Discord)：
+- GUILD_CREATE 只在有 presences 時附上線上成員，否則只有語音中的成員
+- 有 members 且 chunk_guilds_at_startup 時，啟動會下載整個成員名單 (每批 1000 人)
+- 沒訂閱的 intent 完全不會收到對應事件
+
+對每個設定量測解析 JSON 並建立快取的 CPU 時間與快取記憶體 (tracemalloc)。
+
+執行: python ./bench/bench_intents.py --members 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from intents import PROFILES  # noqa: E402
+
+ALL_INTENTS = {
+    "guilds", "members", "guild_presences", "guild_messages", "dm_messages", "message_content",
+    "voice_states", "guild_typing", "guild_reactions",
+}
+
+
+def snowflake(rng: random.Random) -> str:
+    return str(rng.getrandbits(60))
+
+
+def make_user(rng):
+    return {"id": snowflake(rng), "username": f"user{rng.randint(0, 10 ** 6)}", "global_name": "同學",
+            "avatar": f"{rng.getrandbits(128):032x}", "discriminator": "0"}
+
+
+def make_member(rng, user=None):
+    return {"user": user or make_user(rng), "roles": [snowflake(rng) for _ in range(3)], "nick": None,
+            "joined_at": "2025-09-01T08:00:00.000000+00:00", "deaf": False, "mute": False, "flags": 0}
+
+
+def make_presence(rng, user_id):
+    return {"user": {"id": user_id}, "status": rng.choice(["online", "idle", "dnd"]),
+            "activities": [{"name": "Spotify", "type": 2, "details": "讀書音樂", "state": "Lo-fi"}],
+            "client_status": {"desktop": "online"}}
+
+
+def make_message(rng, with_content):
+    return {"id": snowflake(rng), "channel_id": snowflake(rng), "author": make_user(rng),
+            "content": "今天數學作業第三題怎麼算？" * 2 if with_content else "",
+            "timestamp": "2025-10-01T20:00:00.000000+00:00", "embeds": [], "attachments": [],
+            "mentions": [], "mention_roles": [], "pinned": False, "tts": False, "type": 0}
+
+
+def simulate(name, config, args):
+    rng = random.Random(0)
+    intents = ALL_INTENTS if config["intents"] == "all" else set(config["intents"])
+    cache_all = config["member_cache"] == "all"
+    cache_voice = cache_all or "voice" in config["member_cache"]
+
+    online = int(args.members * args.online)
+    users = [make_user(rng) for _ in range(args.members)]
+    voice_ids = {u["id"] for u in users[:args.voice]}
+
+    # ---- 啟動：GUILD_CREATE (+ 成員名單) ----
+    startup = []
+    guild = {
+        "id": snowflake(rng), "member_count": args.members,
+        "channels": [{"id": snowflake(rng), "name": f"頻道{i}", "type": 0} for i in range(200)],
+        "roles": [{"id": snowflake(rng), "name": f"身分組{i}", "permissions": "0"} for i in range(50)],
+        "voice_states": [{"user_id": uid, "channel_id": "1"} for uid in voice_ids] if "voice_states" in intents else [],
+        "members": [make_member(rng, u) for u in users[:args.voice]],
+        "presences": [],
+    }
+    if "guild_presences" in intents:
+        guild["members"] = [make_member(rng, u) for u in users[:online]]
+        guild["presences"] = [make_presence(rng, u["id"]) for u in users[:online]]
+    startup.append(json.dumps(guild))
+    if "members" in intents and config["chunk_guilds_at_startup"]:
+        for start in range(0, args.members, 1000):
+            startup.append(json.dumps({"members": [make_member(rng, u) for u in users[start:start + 1000]]}))
+
+    # ---- 一小時的事件 ----
+    events = []
+    if "guild_presences" in intents:
+        events += [("presence", json.dumps(make_presence(rng, users[rng.randrange(online)]["id"])))
+                   for _ in range(online * args.presence_rate)]
+    if "members" in intents:
+        events += [("member", json.dumps(make_member(rng))) for _ in range(args.joins)]
+    if "guild_messages" in intents:
+        with_content = "message_content" in intents
+        events += [("message", json.dumps(make_message(rng, with_content))) for _ in range(args.messages)]
+    if "guild_typing" in intents:
+        events += [("typing", json.dumps({"user_id": snowflake(rng), "channel_id": snowflake(rng),
+                                          "timestamp": 0})) for _ in range(args.messages * 2)]
+    if "guild_reactions" in intents:
+        events += [("reaction", json.dumps({"user_id": snowflake(rng), "message_id": snowflake(rng),
+                                            "emoji": {"name": "👍"}})) for _ in range(args.messages // 2)]
+    if "voice_states" in intents:
+        events += [("voice", json.dumps({"user_id": rng.choice(users)["id"], "channel_id": "1"}))
+                   for _ in range(args.voice * 4)]
+    rng.shuffle(events)
+
+    # ---- 量測：解析 + 建立 / 更新快取 ----
+    tracemalloc.start()
+    members, messages = {}, deque(maxlen=config["max_messages"] or 0)
+    started = time.perf_counter()
+    for raw in startup:
+        payload = json.loads(raw)
+        for member in payload.get("members", []):
+            uid = member["user"]["id"]
+            if cache_all or (cache_voice and uid in voice_ids):
+                members[uid] = member
+        for presence in payload.get("presences", []):
+            if presence["user"]["id"] in members:
+                members[presence["user"]["id"]]["presence"] = presence
+    startup_seconds = time.perf_counter() - started
+    startup_memory = tracemalloc.get_traced_memory()[0]
+
+    started = time.perf_counter()
+    for kind, raw in events:
+        payload = json.loads(raw)
+        if kind == "presence" and payload["user"]["id"] in members:
+            members[payload["user"]["id"]]["presence"] = payload
+        elif kind == "member" and cache_all:
+            members[payload["user"]["id"]] = payload
+        elif kind == "message":
+            messages.append(payload)
+    events_seconds = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        "profile": name,
+        "startup_payloads": len(startup),
+        "startup_mb": sum(map(len, startup)) / 1e6,
+        "startup_ms": startup_seconds * 1000,
+        "cached_members": len(members),
+        "cache_mb": memory / 1e6,
+        "startup_cache_mb": startup_memory / 1e6,
+        "events_per_hour": len(events),
+        "event_mb_per_hour": sum(len(raw) for _, raw in events) / 1e6,
+        "event_cpu_ms_per_hour": events_seconds * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--online", type=float, default=0.2, help="線上成員比例")
+    parser.add_argument("--voice", type=int, default=50, help="語音頻道中的成員數")
+    parser.add_argument("--messages", type=int, default=5000, help="每小時訊息數")
+    parser.add_argument("--presence-rate", type=int, default=4, help="每位線上成員每小時狀態變更次數")
+    parser.add_argument("--joins", type=int, default=100, help="每小時新成員數")
+    args = parser.parse_args()
+
+    print(f"模擬伺服器：{args.members} 位成員 ({args.online:.0%} 線上)、每小時 {args.messages} 則訊息\n")
+    for name in ["all", "study", "chat", "welcome"]:
+        r = simulate(name, PROFILES[name], args)
+        print(f"[{r['profile']}]")
+        print(f"  啟動: {r['startup_payloads']} 個 payload / {r['startup_mb']:.1f} MB，解析 {r['startup_ms']:.0f} ms，"
+              f"快取 {r['cached_members']} 位成員 ({r['startup_cache_mb']:.1f} MB)")
+        print(f"  每小時: {r['events_per_hour']} 個事件 / {r['event_mb_per_hour']:.1f} MB，"
+              f"處理 {r['event_cpu_ms_per_hour']:.0f} ms，一小時後快取 {r['cache_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
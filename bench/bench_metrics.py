@@ -0,0 +1,90 @@
+"""效能量測的額外成本：關閉時每次呼叫應低於 1 µs，並檢查 Prometheus 端點
+
+執行: python ./bench/bench_metrics.py --calls 1000000
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from metrics import Metrics, serve  # noqa: E402
+
+
+def per_call_ns(func, calls: int) -> float:
+    """扣掉空迴圈後每次呼叫的奈秒數 (取三次最小值)"""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter_ns() - started) / calls)
+    return best
+
+
+def measure(registry: Metrics, calls: int):
+    def plain():
+        return 1
+
+    timed = registry.timed("bench")(plain)
+
+    def with_span():
+        with registry.span("bench"):
+            return 1
+
+    def observe():
+        registry.observe("bench_seconds", 0.01, command="出題")
+
+    baseline = per_call_ns(plain, calls)
+    return {
+        "timed": per_call_ns(timed, calls) - baseline,
+        "span": per_call_ns(with_span, calls) - baseline,
+        "observe": per_call_ns(observe, calls) - baseline,
+    }
+
+
+async def check_endpoint(registry: Metrics) -> int:
+    # 先找一個沒被佔用的埠
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = await serve(registry, "127.0.0.1", port)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    assert response.startswith(b"HTTP/1.1 200"), response[:100]
+    return len(response)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1000000)
+    args = parser.parse_args()
+
+    disabled = measure(Metrics(enabled=False), args.calls)
+    enabled_registry = Metrics(enabled=True)
+    enabled = measure(enabled_registry, args.calls // 10)
+
+    print(f"{'':<10}{'關閉':>12}{'開啟':>12}")
+    for key in ("timed", "span", "observe"):
+        print(f"{key:<10}{disabled[key]:>10.0f}ns{enabled[key]:>10.0f}ns")
+
+    size = asyncio.run(check_endpoint(enabled_registry))
+    print(f"\n/metrics 回應 {size} bytes")
+
+    worst = max(disabled.values())
+    if worst >= 1000:
+        print(f"⚠️ 關閉時的額外成本 {worst:.0f} ns 超過 1 µs")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
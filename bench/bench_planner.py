@@ -0,0 +1,80 @@
+"""讀書計畫基準測試：500 個未完成任務排 14 天所需的時間
+
+執行: python ./bench/bench_planner.py --tasks 500 --days 14
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from planner import build_items, plan  # noqa: E402
+
+
+def make_user_data(count: int, rng: random.Random):
+    now = datetime.now()
+    subjects = ["國文", "英文", "數學", "自然", "社會"]
+    tasks, cards = [], {}
+    for i in range(count):
+        subject = rng.choice(subjects)
+        deadline = now + timedelta(days=rng.randint(-2, 30))
+        if rng.random() < 0.5:
+            tasks.append({
+                "id": i + 1, "type": "作業", "subject": subject, "pages": f"p.{i}",
+                "estimated_time": rng.randint(10, 120), "actual_time": None,
+                "deadline": deadline.isoformat(), "completed": False,
+            })
+        else:
+            tasks.append({
+                "id": i + 1, "type": "複習", "subject": subject, "range": f"第{i}章",
+                "confidence": rng.randint(1, 10), "estimated_time": rng.randint(10, 90),
+                "actual_time": rng.choice([None, 15.0]),
+                "deadline": deadline.isoformat(), "completed": False,
+            })
+    # 部分使用者也有間隔複習卡片
+    for i in range(count // 5):
+        cards[str(i + 1)] = {
+            "id": i + 1, "subject": rng.choice(subjects), "range": f"卡片{i}",
+            "confidence": rng.randint(1, 10), "estimated_time": rng.randint(5, 30),
+            "due": (now + timedelta(days=rng.randint(-3, 20))).date().isoformat(),
+        }
+    estimator = {s: {"n": 5, "log_ratio": rng.uniform(-0.3, 0.5)} for s in subjects}
+    return {"tasks": tasks, "cards": cards, "estimator": estimator}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--daily", type=int, default=180, help="每日可用分鐘")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    user_data = make_user_data(args.tasks, rng)
+    today = datetime.now().date()
+
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        items = build_items(user_data, today, args.days)
+        result = plan(items, args.daily, today, args.days)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    scheduled = sum(len(slots) for _, slots in result["days"])
+    print(f"{len(items)} 個項目 ({args.tasks} 任務 + {len(user_data['cards'])} 卡片)，排 {args.days} 天、每天 {args.daily} 分鐘")
+    print(f"排入 {scheduled} 個時段，來不及 {len(result['late'])} 項，期間外 {len(result['unscheduled'])} 項")
+    print(f"平均 {statistics.mean(timings):.2f} ms | 中位數 {timings[len(timings) // 2]:.2f} ms | p99 {p99:.2f} ms")
+    if p99 >= 100:
+        print("⚠️ p99 超過 100 ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""截止提醒排程基準測試：大量待提醒任務的建立時間、記憶體與閒置 CPU
+
+執行: python ./bench/bench_reminders.py --tasks 100000 --idle 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from scheduler import DeadlineScheduler  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--idle", type=float, default=5.0, help="量測閒置 CPU 的秒數")
+    parser.add_argument("--due", type=int, default=1000, help="最後實際到期觸發的任務數")
+    args = parser.parse_args()
+
+    fired = []
+
+    async def on_due(batch):
+        fired.append((time.time(), len(batch)))
+
+    scheduler = DeadlineScheduler(on_due)
+    rng = random.Random(0)
+    now = time.time()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(args.tasks):
+        # 未來 1~30 天內的截止時間
+        scheduler.schedule((str(i % 5000), i), now + rng.uniform(86400, 30 * 86400), None)
+    build_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    runner = asyncio.create_task(scheduler.run())
+    cpu_before = time.process_time()
+    await asyncio.sleep(args.idle)
+    idle_cpu = time.process_time() - cpu_before
+
+    # 讓一批任務在 0.5 秒後同時到期，確認會被合併成一批觸發
+    due_at = time.time() + 0.5
+    for i in range(args.due):
+        scheduler.schedule(("due", i), due_at, None)
+    await asyncio.sleep(1.0)
+    runner.cancel()
+
+    print(f"任務數: {args.tasks}")
+    print(f"建立排程: {build_seconds * 1000:.1f} ms ({build_seconds / args.tasks * 1e6:.2f} µs/筆)")
+    print(f"記憶體峰值: {peak / 1024 / 1024:.1f} MiB")
+    print(f"閒置 {args.idle:g} 秒 CPU: {idle_cpu * 1000:.2f} ms")
+    if fired:
+        delay = (fired[0][0] - due_at) * 1000
+        print(f"到期觸發: {sum(n for _, n in fired)} 筆 / {len(fired)} 批，延遲 {delay:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
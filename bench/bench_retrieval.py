@@ -0,0 +1,57 @@
+"""題庫檢索延遲基準測試：查詢延遲 vs. 片段數量
+
+執行: python ./bench/bench_retrieval.py --sizes 1000 10000 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from retrieval import BM25Index  # noqa: E402
+
+# 常用字，讓合成語料的雙字詞分佈接近真實課文
+CHARSET = "的一是不了人我在有他這中大來上國個到說們為子和你地出道也時年得就那要下以生會自著去之過家學對可她裡後小麼心多天而能好都然沒日於起還發成事只作當想看文無開手十用主行方又如前所本見經頭面公同三已老從動兩長知民樣現分將外但身些與高意進把法此實回二理美點月明其種聲全工己話兒者向情部正名定女問力機給等幾很業最間新什打便位因重被走電四第門相次東政海口使教西再平真聽世氣信北少關並內加化由卻代軍產入先山五太水萬市眼體別處總才場師書比住員九笑性通目華報立馬命張活難神數件安表原車白應路期叫死常提感金何更反合放做系計或司利受光王果親界及今京務制解各任至清物臺象記邊共風戰干接它許八特覺望直服毛林題建南度統色字請交愛讓認算論百吃義科怎元社術結六功指思非流每青管夫連遠資隊跟帶花快條院變聯言權往展該領傳近留紅治決周保達辦運武半候七必城父強步完革深區即求品士轉量空甚眾技輕程告江語英基派滿式李息寫呢識極令黃德收臉錢黨倒未持取設始版雙歷越史商千片容研像找友孩站廣改議形委早房音火際則首單據導影失拿網香似斯專石若兵弟誰校讀志飛觀爭究包組造落視濟喜離雖壞興跑"
+
+
+def make_corpus(n_docs: int, doc_len: int, rng: random.Random):
+    return ["".join(rng.choices(CHARSET, k=doc_len)) for _ in range(n_docs)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    parser.add_argument("--doc-len", type=int, default=300, help="每個片段的字數")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'片段數':>8} {'建索引(s)':>10} {'p50(ms)':>9} {'p99(ms)':>9}")
+    for size in args.sizes:
+        corpus = make_corpus(size, args.doc_len, rng)
+
+        started = time.perf_counter()
+        index = BM25Index(corpus)
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        for _ in range(args.queries):
+            # 從語料中擷取 2~6 字當作主題關鍵字
+            doc = rng.choice(corpus)
+            start = rng.randrange(len(doc) - 6)
+            query = doc[start:start + rng.randint(2, 6)]
+
+            t0 = time.perf_counter()
+            index.search(query, k=3)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{size:>8} {build_seconds:>10.2f} {statistics.median(latencies):>9.3f} {p99:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""多行程分片測試：多個「機器人行程」同時讀寫共用的使用者資料庫與工作佇列
+
+每個行程模擬自己分片上的伺服器送來的指令 (讀取全部使用者 → 新增任務 → 寫回)。
+一部分使用者同時在多個分片的伺服器中 (--shared)，他們的指令會送到不同行程；
+另外每個行程依 owns_user 為自己負責的使用者排程截止提醒並標記 reminded，
+所以同一位使用者會被好幾個行程同時寫入。
+
+最後檢查沒有遺失任何寫入 (新增的任務與 reminded 標記都還在)、背景工作結果都送回發出的行程、
+每位使用者的提醒剛好由一個行程排程，並比較 1 / 2 / 4 個行程的吞吐量。不需要連線 Discord。
+
+執行: python ./bench/bench_shards.py --users 500 --commands 400 --processes 1 2 4
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+import sharding  # noqa: E402
+from job_queue import JobQueue  # noqa: E402
+from reminders import ReminderService  # noqa: E402
+from sharding import shard_for_guild, split_shards  # noqa: E402
+from user_store import UserStore  # noqa: E402
+
+SHARDS = 8
+JOBS_PER_PROCESS = 50
+# 每位使用者一開始有幾個還沒提醒過的任務
+SEED_TASKS = 5
+
+
+def home_guild(user_id: int) -> int:
+    """每位使用者固定在一個伺服器 (Discord snowflake 格式)"""
+    return ((user_id * 7919) % 64) << 22
+
+
+def run_process(index: int, processes: int, db: str, jobs_db: str, args, seed: int, out):
+    # 跟 run_shards.py 一樣以環境變數告訴行程自己的編號，重新載入 sharding 讓 owns_user 讀到
+    os.environ.update(SHARD_PROCESSES=str(processes), SHARD_PROCESS_INDEX=str(index))
+    importlib.reload(sharding)
+
+    store = UserStore(db)
+    queue = JobQueue(jobs_db)
+    my_shards = set(split_shards(SHARDS, processes)[index])
+    # 只有分片屬於這個行程的伺服器，指令才會送到這個行程；共用的使用者在每個分片都有伺服器
+    shared = list(range(args.shared))
+    my_users = [u for u in range(args.shared, args.users) if shard_for_guild(home_guild(u), SHARDS) in my_shards]
+    rng = random.Random(seed + index)
+
+    async def no_send(user_id, tasks):
+        pass
+
+    reminders = ReminderService(no_send, owns=sharding.owns_user)
+    reminders.load(store.load_all())
+    scheduled = sorted(user_id for user_id, task_ids in reminders._scheduled.items() if task_ids)
+
+    latencies = []
+    added = []
+    reminded = []
+    pending_reminders = {user_id: [f"seed-{i}" for i in range(SEED_TASKS)] for user_id in scheduled}
+    for n in range(args.commands):
+        started = time.perf_counter()
+        data = store.load_all()
+        if n % 4 == 3 and pending_reminders:
+            # 截止提醒到期：標記 reminded (send_task_reminders 的寫入)
+            user_id = rng.choice(list(pending_reminders))
+            task_id = pending_reminders[user_id].pop()
+            if not pending_reminders[user_id]:
+                del pending_reminders[user_id]
+            for task in data[user_id]["tasks"]:
+                if task["id"] == task_id:
+                    task["reminded"] = True
+            reminded.append((user_id, task_id))
+        else:
+            user_id = str(rng.choice(shared if rng.random() < 0.5 and shared else my_users))
+            task_id = f"{index}-{n}"
+            data[user_id]["tasks"].append({"id": task_id, "subject": "數學", "estimated_time": 30})
+            added.append((user_id, task_id))
+        # 指令在讀取與寫回之間通常會 await (LLM、Discord)，其他行程可能在這段時間寫入
+        time.sleep(args.think_ms / 1000)
+        store.save_all(data)
+        latencies.append(time.perf_counter() - started)
+
+    for _ in range(JOBS_PER_PROCESS):
+        queue.enqueue("generate_quiz", {}, channel_id=1, owner=index)
+    out.put({"index": index, "latencies": latencies, "added": added, "reminded": reminded,
+             "scheduled": scheduled, "merges": store.merges})
+
+
+def pop_results(index: int, jobs_db: str, out):
+    queue = JobQueue(jobs_db)
+    popped = []
+    while True:
+        jobs = queue.pop_finished(["generate_quiz"], owner=index, include_unowned=index == 0)
+        if not jobs:
+            break
+        popped.extend(job["owner"] for job in jobs)
+    out.put((index, popped))
+
+
+def run(processes: int, args, workdir: str):
+    db = os.path.join(workdir, f"users-{processes}.sqlite3")
+    jobs_db = os.path.join(workdir, f"jobs-{processes}.sqlite3")
+    store = UserStore(db)
+    deadline = (datetime.now() + timedelta(days=3)).isoformat()
+    store.save_all({str(u): {"tasks": [{"id": f"seed-{i}", "subject": "數學", "deadline": deadline, "completed": False}
+                                       for i in range(SEED_TASKS)],
+                             "timers": {}, "chat_history": [], "personality_profile": ""}
+                    for u in range(args.users)})
+    queue = JobQueue(jobs_db)
+    # 網頁上傳的工作沒有指定行程，應由主行程處理
+    queue.enqueue("generate_quiz", {})
+
+    out = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=run_process, args=(i, processes, db, jobs_db, args, 0, out))
+        for i in range(processes)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    results = [out.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    # 背景 worker 完成所有工作後，各行程取回自己的結果
+    while (job := queue.claim()) is not None:
+        queue.complete(job["id"], job["attempts"], {})
+    poppers = [multiprocessing.Process(target=pop_results, args=(i, jobs_db, out)) for i in range(processes)]
+    for popper in poppers:
+        popper.start()
+    routed = dict(out.get() for _ in poppers)
+    for popper in poppers:
+        popper.join()
+
+    final = store.load_all()
+    present = {(user_id, task["id"]) for user_id, user_data in final.items() for task in user_data["tasks"]}
+    flagged = {(user_id, task["id"]) for user_id, user_data in final.items()
+               for task in user_data["tasks"] if task.get("reminded")}
+    lost = sum(1 for result in results for item in result["added"] if item not in present)
+    lost += sum(1 for result in results for item in result["reminded"] if item not in flagged)
+    misrouted = sum(1 for index, owners in routed.items() for owner in owners if owner not in (index, None))
+    delivered = sum(len(owners) for owners in routed.values())
+    # 各行程實際排程提醒的使用者：每位使用者都要有人負責，且不能有兩個行程都排程
+    scheduled = [user_id for result in results for user_id in result["scheduled"]]
+
+    latencies = sorted(x for result in results for x in result["latencies"])
+    return {
+        "processes": processes,
+        "commands": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "lost": lost,
+        "merges": sum(result["merges"] for result in results),
+        "misrouted": misrouted,
+        "delivered": delivered,
+        "expected_jobs": processes * JOBS_PER_PROCESS + 1,
+        "reminder_owners_ok": len(scheduled) == len(set(scheduled)) == len(final),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--commands", type=int, default=400, help="每個行程的指令數")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--shared", type=int, default=20, help="同時在每個分片都有伺服器的使用者數")
+    parser.add_argument("--think-ms", type=float, default=1, help="每個指令讀取到寫回之間的時間 (毫秒)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_shards_")
+    failed = False
+    try:
+        for processes in args.processes:
+            r = run(processes, args, workdir)
+            print(
+                f"{r['processes']} 行程 | {r['commands']} 個指令 | {r['throughput']:.0f} 指令/秒 | "
+                f"p50 {r['p50_ms']:.2f} ms | p99 {r['p99_ms']:.2f} ms | "
+                f"遺失寫入 {r['lost']} (合併 {r['merges']}) | 工作結果 {r['delivered']}/{r['expected_jobs']} (送錯 {r['misrouted']}) | "
+                f"提醒分配 {'✅' if r['reminder_owners_ok'] else '❌'}"
+            )
+            failed |= r["lost"] > 0 or r["misrouted"] > 0 or r["delivered"] != r["expected_jobs"] \
+                or not r["reminder_owners_ok"]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if failed:
+        print("⚠️ 多行程測試失敗")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
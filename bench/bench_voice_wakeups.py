@@ -0,0 +1,132 @@
+"""語音播放事件迴圈喚醒次數基準測試：輪詢版 vs. after= 回呼版
+
+模擬多個同時播放背景音樂的讀書房，計算事件迴圈醒來 (selector.select 回傳) 的次數
+與計時器觸發次數，換算成每小時的數量。不需要 Discord，VoiceClient 以假物件代替。
+
+執行: python ./bench/bench_voice_wakeups.py --sessions 100 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import selectors
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from voice import GuildPlayer  # noqa: E402
+
+
+class CountingSelector(selectors.DefaultSelector):
+    """計算事件迴圈被喚醒的次數"""
+
+    wakeups = 0
+
+    def select(self, timeout=None):
+        events = super().select(timeout)
+        CountingSelector.wakeups += 1
+        return events
+
+
+class CountingLoop(asyncio.SelectorEventLoop):
+    """計算計時器 (asyncio.sleep / wait_for 逾時) 的數量"""
+
+    timers = 0
+
+    def call_at(self, when, callback, *args, **kwargs):
+        CountingLoop.timers += 1
+        return super().call_at(when, callback, *args, **kwargs)
+
+
+class FakeVoiceClient:
+    """假的 VoiceClient：音源無限循環，stop() 時像 py-cord 一樣在另一個執行緒呼叫 after"""
+
+    def __init__(self):
+        self._after = None
+        self.channel = None
+
+    def is_connected(self):
+        return True
+
+    def is_playing(self):
+        return self._after is not None
+
+    def play(self, source, after=None):
+        self._after = after
+
+    def stop(self):
+        after, self._after = self._after, None
+        if after is not None:
+            threading.Thread(target=after, args=(None,)).start()
+
+    async def disconnect(self):
+        self.stop()
+
+
+async def polling_sessions(count: int, seconds: float):
+    """原本的寫法：每個使用者一個每秒檢查一次的 coroutine"""
+    music_tasks = {}
+
+    async def play_infinite_bell(vc, user_id):
+        # 使用者不會同時按下指令，錯開每個 session 的起始時間
+        await asyncio.sleep(user_id / count)
+        vc.play(object())
+        while vc.is_connected() and user_id in music_tasks:
+            await asyncio.sleep(1)
+        if vc.is_playing():
+            vc.stop()
+
+    for user_id in range(count):
+        music_tasks[user_id] = asyncio.create_task(play_infinite_bell(FakeVoiceClient(), user_id))
+    await asyncio.sleep(seconds)
+    for user_id in list(music_tasks):
+        music_tasks.pop(user_id).cancel()
+
+
+async def event_sessions(count: int, seconds: float):
+    """新的寫法：GuildPlayer 播放中不需要任何計時器"""
+    players = []
+    for guild_id in range(count):
+        player = GuildPlayer(guild_id, lambda loop: object())
+        player.voice_client = FakeVoiceClient()
+        player.play(loop=True, owner=guild_id)
+        players.append(player)
+    await asyncio.sleep(seconds)
+    for player in players:
+        player.stop()
+        await player.wait()
+
+
+def measure(fn, count: int, seconds: float):
+    loop = CountingLoop(CountingSelector())
+    try:
+        CountingSelector.wakeups = 0
+        CountingLoop.timers = 0
+        cpu_before = time.process_time()
+        loop.run_until_complete(fn(count, seconds))
+        return CountingSelector.wakeups, CountingLoop.timers, time.process_time() - cpu_before
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10.0, help="每種寫法模擬的秒數")
+    args = parser.parse_args()
+
+    # 量測時段本身的 sleep 也算一次喚醒，扣掉空迴圈的基準值
+    base_wakeups, base_timers, _ = measure(lambda count, seconds: asyncio.sleep(seconds), 0, args.seconds)
+
+    print(f"{args.sessions} 個同時播放的讀書房，模擬 {args.seconds:.0f} 秒")
+    print(f"{'寫法':<12}{'每小時喚醒':>12}{'每小時計時器':>14}{'CPU (秒)':>10}")
+    for name, fn in (("輪詢", polling_sessions), ("after 回呼", event_sessions)):
+        wakeups, timers, cpu = measure(fn, args.sessions, args.seconds)
+        wakeups = max(0, wakeups - base_wakeups) * 3600 / args.seconds
+        timers = max(0, timers - base_timers) * 3600 / args.seconds
+        print(f"{name:<12}{wakeups:>12.0f}{timers:>14.0f}{cpu:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
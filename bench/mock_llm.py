@@ -0,0 +1,103 @@
+"""本機 OpenAI 相容假伺服器：固定延遲回覆 /v1/chat/completions，不需網路與 API 金鑰
+
+出題 (帶 response_format) 時回傳符合 QuizQuestion 格式的 JSON，其他請求回傳一段固定文字。
+可單獨執行，讓機器人在離線環境下測試 (設定 OPENROUTER_BASE_URL=http://127.0.0.1:8001/v1)。
+
+執行: python ./bench/mock_llm.py --port 8001 --latency 200
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUIZ = {
+    "question": "下列何者是光合作用的產物？",
+    "option_a": "氧氣",
+    "option_b": "氮氣",
+    "option_c": "氦氣",
+    "option_d": "氬氣",
+    "correct_answer": "A",
+    "explanation": "光合作用利用二氧化碳和水產生葡萄糖與氧氣。",
+}
+REPLY = "辛苦了！讀書累的時候記得起來走一走、喝杯水，你已經做得很好了 💙"
+
+
+class MockLLMServer:
+    """在背景執行緒中執行的假伺服器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency)
+                content = json.dumps(QUIZ, ensure_ascii=False) if body.get("response_format") else REPLY
+                payload = json.dumps({
+                    "id": f"chatcmpl-mock-{server.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+                }, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MockLLMServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=200, help="每次回覆的延遲 (毫秒)")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, args.latency / 1000).start()
+    print(f"🤖 假 LLM 伺服器: {server.base_url} (延遲 {args.latency:g} ms)")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+# ==================== 讀書統計 ====================
+# user_data["stats"] 裡預先累加好每日 / 每週的彙總，查詢某一期只要讀一個 bucket，
+# 不必掃描全部任務。每次結束計時、新增、完成任務時增量更新。
+
+# 每日彙總保留天數 (每週彙總全部保留)
+STATS_DAILY_DAYS = int(os.getenv("STATS_DAILY_DAYS", "120"))
+
+STATS_VERSION = 1
+
+
+def day_key(when: datetime) -> str:
+    return when.date().isoformat()
+
+
+def week_key(when: datetime) -> str:
+    year, week, _ = when.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def empty_bucket() -> Dict:
+    return {
+        "minutes": 0.0,            # 計時的總分鐘數
+        "by_subject": {},          # 科目 -> 分鐘
+        "timed_tasks": 0,          # 結束計時的次數
+        "estimated": 0.0,          # 有計時的任務預估分鐘合計
+        "actual": 0.0,             # 有計時的任務實際分鐘合計
+        "added": 0,
+        "completed": 0,
+        "completed_on_time": 0,
+    }
+
+
+def _buckets(stats: Dict, when: datetime):
+    """取得 (當日, 當週) bucket，需要時建立"""
+    daily, weekly = stats["daily"], stats["weekly"]
+    key = day_key(when)
+    if key not in daily:
+        daily[key] = empty_bucket()
+        # 只在開新的一天時清掉太舊的每日資料
+        cutoff = (when - timedelta(days=STATS_DAILY_DAYS)).date().isoformat()
+        for old in [k for k in daily if k < cutoff]:
+            del daily[old]
+    return daily[key], weekly.setdefault(week_key(when), empty_bucket())
+
+
+def _add_timer(stats: Dict, task: Dict, minutes: float, when: datetime):
+    for bucket in _buckets(stats, when):
+        bucket["minutes"] += minutes
+        bucket["by_subject"][task["subject"]] = bucket["by_subject"].get(task["subject"], 0.0) + minutes
+        bucket["timed_tasks"] += 1
+        bucket["estimated"] += task["estimated_time"]
+        bucket["actual"] += minutes
+
+
+def _add_completed(stats: Dict, task: Dict, when: datetime):
+    on_time = not task.get("deadline") or when <= datetime.fromisoformat(task["deadline"])
+    for bucket in _buckets(stats, when):
+        bucket["completed"] += 1
+        bucket["completed_on_time"] += int(on_time)
+
+
+def _add_added(stats: Dict, when: datetime):
+    for bucket in _buckets(stats, when):
+        bucket["added"] += 1
+
+
+def backfill_stats(user_data: Dict) -> Dict:
+    """舊資料沒有 stats 時，從現有任務重建一次
+
+    以前結束計時沒有記錄時間點，實際時間歸在完成日 (沒完成就歸在建立日)。
+    """
+    stats = {"version": STATS_VERSION, "daily": {}, "weekly": {}}
+    for task in user_data.get("tasks", []):
+        created = datetime.fromisoformat(task["created_at"]) if task.get("created_at") else None
+        completed = datetime.fromisoformat(task["completed_at"]) if task.get("completed_at") else None
+        if created:
+            _add_added(stats, created)
+        if completed:
+            _add_completed(stats, task, completed)
+        if task.get("actual_time") and (completed or created):
+            _add_timer(stats, task, task["actual_time"], completed or created)
+    user_data["stats"] = stats
+    return stats
+
+
+def ensure_stats(user_data: Dict) -> Dict:
+    if "stats" not in user_data:
+        return backfill_stats(user_data)
+    return user_data["stats"]
+
+
+def record_timer(user_data: Dict, task: Dict, minutes: float, when: Optional[datetime] = None):
+    """結束計時"""
+    _add_timer(ensure_stats(user_data), task, minutes, when or datetime.now())
+
+
+def record_completed(user_data: Dict, task: Dict, when: Optional[datetime] = None):
+    """完成任務"""
+    _add_completed(ensure_stats(user_data), task, when or datetime.now())
+
+
+def record_added(user_data: Dict, count: int = 1, when: Optional[datetime] = None):
+    """新增任務"""
+    stats = ensure_stats(user_data)
+    for _ in range(count):
+        _add_added(stats, when or datetime.now())
+
+
+def get_day(user_data: Dict, day: date) -> Dict:
+    return ensure_stats(user_data)["daily"].get(day.isoformat(), empty_bucket())
+
+
+def get_week(user_data: Dict, day: date) -> Dict:
+    key = week_key(datetime.combine(day, datetime.min.time()))
+    return ensure_stats(user_data)["weekly"].get(key, empty_bucket())
+
+
+def estimate_ratio(bucket: Dict) -> Optional[float]:
+    """實際 / 預估 (大於 1 代表比預估慢)"""
+    if not bucket["estimated"]:
+        return None
+    return bucket["actual"] / bucket["estimated"]
+
+
+def completion_rate(bucket: Dict) -> Optional[float]:
+    """完成數 / 新增數"""
+    if not bucket["added"]:
+        return None
+    return min(1.0, bucket["completed"] / bucket["added"])
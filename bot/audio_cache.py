@@ -0,0 +1,120 @@
+import os
+import hashlib
+import logging
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# 轉好的 Ogg Opus 檔放這裡，音效檔沒變就不必再轉
+AUDIO_CACHE_ROOT = os.getenv("AUDIO_CACHE_DIR", ".audio_cache")
+OPUS_BITRATE = os.getenv("OPUS_BITRATE", "96k")
+
+_packets: Dict[str, List[bytes]] = {}
+# 載入失敗的音效 { 檔案: ((mtime, size), 錯誤訊息) }，檔案沒變就不再重開 ffmpeg 轉檔
+_failures: Dict[str, Tuple[Optional[Tuple[int, int]], str]] = {}
+_lock = threading.Lock()
+
+
+class SoundUnavailable(RuntimeError):
+    """音效之前已載入失敗且檔案沒有變動"""
+
+
+def _signature(sound_file: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(sound_file)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _cache_path(sound_file: str) -> str:
+    st = os.stat(sound_file)
+    key = hashlib.sha1(f"{os.path.abspath(sound_file)}:{st.st_mtime_ns}:{st.st_size}:{OPUS_BITRATE}".encode()).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(sound_file))[0]
+    return os.path.join(AUDIO_CACHE_ROOT, f"{name}.{key}.opus")
+
+
+def transcode(sound_file: str) -> str:
+    """用 ffmpeg 轉成 Discord 用的 48kHz 雙聲道、20ms 一幀的 Ogg Opus (只轉一次)"""
+    ogg_path = _cache_path(sound_file)
+    if os.path.exists(ogg_path):
+        return ogg_path
+
+    os.makedirs(AUDIO_CACHE_ROOT, exist_ok=True)
+    tmp_path = ogg_path + ".tmp"
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error", "-i", sound_file,
+        "-vn", "-map_metadata", "-1", "-ar", "48000", "-ac", "2",
+        "-c:a", "libopus", "-b:a", OPUS_BITRATE, "-frame_duration", "20",
+        "-f", "ogg", tmp_path,
+    ], check=True)
+    os.replace(tmp_path, ogg_path)
+    logging.info(f"🎼 已轉檔音效: {sound_file} -> {ogg_path}")
+    return ogg_path
+
+
+def read_ogg_packets(ogg_path: str) -> List[bytes]:
+    """把 Ogg 頁面拆回 Opus 封包 (略過 OpusHead / OpusTags 兩個標頭封包)"""
+    with open(ogg_path, "rb") as f:
+        data = f.read()
+
+    packets, partial, pos = [], b"", 0
+    while pos < len(data):
+        if data[pos:pos + 4] != b"OggS":
+            raise ValueError(f"不是有效的 Ogg 檔案: {ogg_path}")
+        segment_count = data[pos + 26]
+        lacing = data[pos + 27:pos + 27 + segment_count]
+        body = pos + 27 + segment_count
+        for size in lacing:
+            partial += data[body:body + size]
+            body += size
+            # 長度 255 表示封包延續到下一段
+            if size < 255:
+                packets.append(partial)
+                partial = b""
+        pos = body
+
+    if not packets or not packets[0].startswith(b"OpusHead"):
+        raise ValueError(f"不是 Opus 音訊: {ogg_path}")
+    return packets[2:]
+
+
+def load_sound(sound_file: str) -> List[bytes]:
+    """取得音效的 Opus 封包 (記憶體中只保留一份，所有播放共用)
+
+    失敗 (沒有 ffmpeg、檔案壞掉) 也會記住，檔案沒變之前直接丟出 SoundUnavailable
+    """
+    signature = _signature(sound_file)
+    with _lock:
+        packets = _packets.get(sound_file)
+        if packets is not None:
+            return packets
+        failure = _failures.get(sound_file)
+        if failure is not None and failure[0] == signature:
+            raise SoundUnavailable(failure[1])
+        try:
+            packets = _packets[sound_file] = read_ogg_packets(transcode(sound_file))
+        except Exception as e:
+            _failures[sound_file] = (signature, str(e))
+            raise
+        _failures.pop(sound_file, None)
+        logging.info(f"🎼 已載入音效 {sound_file}: {len(packets)} 幀 ({len(packets) * 0.02:.1f} 秒)")
+        return packets
+
+
+class OpusLoop:
+    """依序吐出封包，loop=True 時播完立刻從頭開始 (無縫循環)"""
+
+    def __init__(self, packets: List[bytes], loop: bool = False):
+        self.packets = packets
+        self.loop = loop
+        self.position = 0
+
+    def next_packet(self) -> bytes:
+        if self.position >= len(self.packets):
+            if not self.loop or not self.packets:
+                return b""
+            self.position = 0
+        packet = self.packets[self.position]
+        self.position += 1
+        return packet
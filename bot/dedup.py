@@ -0,0 +1,117 @@
+import re
+import zlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 只保留文字與數字，去掉空白、標點與換行
+_NOISE = re.compile(r"[\W_]+", re.UNICODE)
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize(text: str) -> str:
+    """正規化片段內容，排版不同但文字相同的片段會得到相同結果"""
+    return _NOISE.sub("", text).lower()
+
+
+class MinHashDeduper:
+    """以 MinHash + LSH 找出近似重複的片段
+
+    threshold: 估計的 Jaccard 相似度達到此值即視為重複
+    num_perm / bands: 簽章長度與 LSH 分段數 (每段 num_perm // bands 列)
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm 必須能被 bands 整除")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+
+        # 固定種子，同一份資料每次都得到相同結果
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._buckets: Dict[Tuple[int, bytes], int] = {}
+        self._signatures: List[np.ndarray] = []
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        text = normalize(text)
+        if len(text) < self.shingle:
+            return None
+        hashes = np.fromiter(
+            {zlib.crc32(text[i:i + self.shingle].encode("utf-8")) for i in range(len(text) - self.shingle + 1)},
+            dtype=np.uint64,
+        )
+        # h(x) = (a * x + b) mod p；a 取低 32 位，乘積 < 2^64 不會在 uint64 溢位
+        products = ((self._a[:, None] % (1 << 32)) * hashes[None, :]) % _MERSENNE_PRIME
+        return ((products + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+    def find_or_add(self, text: str) -> Optional[int]:
+        """若與已加入的片段重複則回傳其編號，否則加入並回傳 None"""
+        signature = self.signature(text)
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        if signature is None:
+            return None
+
+        keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        candidates = {self._buckets[key] for key in keys if key in self._buckets}
+        for candidate in sorted(candidates):
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold:
+                return candidate
+
+        for key in keys:
+            self._buckets.setdefault(key, position)
+        return None
+
+
+def dedupe_chunks(chunks: List[Dict], threshold: float = 0.8) -> Tuple[List[Dict], Dict]:
+    """移除近似重複的片段，保留最早出現的一筆並記錄其他來源
+
+    回傳 (保留的片段, 統計資訊)
+    """
+    deduper = MinHashDeduper(threshold=threshold)
+    kept: List[Dict] = []
+    kept_at: Dict[int, int] = {}  # deduper 編號 -> kept 中的位置
+    chars_total = chars_saved = 0
+
+    for position, chunk in enumerate(chunks):
+        chars_total += len(chunk["content"])
+        duplicate_of = deduper.find_or_add(chunk["content"])
+        if duplicate_of is None:
+            kept_at[position] = len(kept)
+            kept.append(chunk)
+            continue
+
+        original = kept[kept_at[duplicate_of]]
+        sources = original.setdefault("duplicate_sources", [])
+        for source in [chunk["source"]] + chunk.get("duplicate_sources", []):
+            if source != original["source"] and source not in sources:
+                sources.append(source)
+        chars_saved += len(chunk["content"])
+
+    stats = {
+        "total": len(chunks),
+        "kept": len(kept),
+        "dropped": len(chunks) - len(kept),
+        "chars_total": chars_total,
+        "chars_saved": chars_saved,
+    }
+    return kept, stats
+
+
+def log_dedupe_stats(category: str, stats: Dict):
+    """輸出去重結果 (中文內容大約 1 字 = 1 token，以字數估算節省的嵌入與出題成本)"""
+    if not stats["dropped"]:
+        return
+    ratio = stats["chars_saved"] / stats["chars_total"] * 100 if stats["chars_total"] else 0
+    logging.info(
+        f"   🧹 [{category}] 去除 {stats['dropped']}/{stats['total']} 個重複片段，"
+        f"節省 {stats['chars_saved']} 字 (約 {ratio:.1f}% 題庫與 token 成本)"
+    )
@@ -0,0 +1,230 @@
+import os
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from knowledge_store import content_hash
+
+EMBEDDING_ROOT = os.path.join("json_knowledge", ".embeddings")
+
+# 每批送進模型的片段數，可依 CPU 核心數調整
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+# 累積多少筆就附加到磁碟一次 (中途中斷也不會白算)
+EMBED_FLUSH_EVERY = 512
+
+
+class EmbeddingStore:
+    """單一分類的向量快取 (float16 或 int8，以 memory-map 讀取)
+
+    檔案 (<版本> 只在壓縮時更換，讀取端不會看到寫到一半的檔案)：
+      <分類>.meta.json        目前的版本、格式與維度
+      <分類>.<版本>.vec       向量矩陣 (n, dim) 的原始位元組，新向量直接附加在檔尾
+      <分類>.<版本>.scale     int8 模式下每列的縮放係數 (float32)
+      <分類>.<版本>.keys      每列對應的內容雜湊，一行一個
+    """
+
+    def __init__(self, category: str, root: str = EMBEDDING_ROOT, dtype: str = "int8"):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"不支援的向量格式: {dtype}")
+        self.category = category
+        self.root = root
+        self.dtype = dtype
+        self.meta_path = os.path.join(root, f"{category}.meta.json")
+        self._load()
+
+    def _paths(self, version: int) -> Dict[str, str]:
+        base = os.path.join(self.root, f"{self.category}.{version}")
+        return {"vec": base + ".vec", "scale": base + ".scale", "keys": base + ".keys"}
+
+    @property
+    def _np_dtype(self):
+        return np.int8 if self.dtype == "int8" else np.float16
+
+    def _load(self):
+        self.keys: List[str] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.row_of: Dict[str, int] = {}
+        self.version = 0
+        self.dim = 0
+
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # 以磁碟上的格式為準，避免新舊格式混在同一個檔案
+        self.version, self.dtype, self.dim = meta["version"], meta["dtype"], meta["dim"]
+        paths = self._paths(self.version)
+
+        with open(paths["keys"], "r", encoding="utf-8") as f:
+            keys = f.read().split()
+        # 附加到一半中斷時各檔案的列數可能不同，只採用三個檔案都完整的列
+        rows = min(len(keys), os.path.getsize(paths["vec"]) // (self.dim * np.dtype(self._np_dtype).itemsize))
+        if self.dtype == "int8":
+            rows = min(rows, os.path.getsize(paths["scale"]) // 4)
+        self.keys = keys[:rows]
+        if rows:
+            # mmap 開啟，只有實際讀到的頁面才會進記憶體
+            self.vectors = np.memmap(paths["vec"], dtype=self._np_dtype, mode="r", shape=(rows, self.dim))
+            if self.dtype == "int8":
+                self.scales = np.memmap(paths["scale"], dtype=np.float32, mode="r", shape=(rows,))
+        self.row_of = {key: row for row, key in enumerate(self.keys)}
+
+    def _write_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "dtype": self.dtype, "dim": self.dim}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _write_files(self, version: int, keys: List[str], vectors: np.ndarray, scales: Optional[np.ndarray]):
+        paths = self._paths(version)
+        with open(paths["vec"], "wb") as f:
+            f.write(np.ascontiguousarray(vectors).tobytes())
+        if self.dtype == "int8":
+            with open(paths["scale"], "wb") as f:
+                f.write(np.ascontiguousarray(scales, dtype=np.float32).tobytes())
+        with open(paths["keys"], "w", encoding="utf-8") as f:
+            f.write("".join(key + "\n" for key in keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key: str):
+        return key in self.row_of
+
+    def missing(self, keys: Sequence[str]) -> List[str]:
+        """找出還沒有向量的雜湊 (保留順序、去除重複)"""
+        return [key for key in dict.fromkeys(keys) if key not in self.row_of]
+
+    def _quantize(self, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), None
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def add(self, keys: List[str], vectors: Sequence[Sequence[float]]):
+        """把新向量附加到檔尾，已存在的向量不必重寫"""
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        quantized, scales = self._quantize(matrix)
+
+        os.makedirs(self.root, exist_ok=True)
+        if not os.path.exists(self.meta_path):
+            self.version, self.dim = 1, matrix.shape[1]
+            self._write_files(self.version, [], quantized[:0], None if scales is None else scales[:0])
+            self._write_meta()
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"向量維度 {matrix.shape[1]} 與快取的 {self.dim} 不同")
+
+        paths = self._paths(self.version)
+        rows = len(self.keys)
+        # 先截掉上次中斷時多寫的部分，再依 向量 → 縮放係數 → 雜湊 的順序附加
+        # (雜湊最後寫，中斷時多出的向量沒有對應的雜湊，讀取時會略過)
+        self.vectors = self.scales = None
+        with open(paths["vec"], "r+b") as f:
+            f.truncate(rows * self.dim * quantized.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(quantized.tobytes())
+        if scales is not None:
+            with open(paths["scale"], "r+b") as f:
+                f.truncate(rows * 4)
+                f.seek(0, os.SEEK_END)
+                f.write(scales.tobytes())
+        with open(paths["keys"], "a", encoding="utf-8") as f:
+            f.write("".join(key + "\n" for key in keys))
+
+        self._load()
+
+    def compact(self, live_keys) -> int:
+        """只保留仍在題庫中的向量 (寫成新版本再切換)，回傳移除的筆數"""
+        live = set(live_keys)
+        rows = [row for row, key in enumerate(self.keys) if key in live]
+        removed = len(self.keys) - len(rows)
+        if not removed:
+            return 0
+
+        old_paths = self._paths(self.version)
+        version = self.version + 1
+        self._write_files(
+            version, [self.keys[row] for row in rows],
+            np.asarray(self.vectors)[rows], None if self.scales is None else np.asarray(self.scales)[rows],
+        )
+        self.vectors = self.scales = None
+        self.version = version
+        self._write_meta()
+        self._load()
+        # 已開啟舊版 mmap 的讀取端不受影響 (檔案刪除後內容保留到關閉為止)
+        for path in old_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        return removed
+
+    def matrix(self) -> np.ndarray:
+        """還原成 float32 矩陣"""
+        if self.vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        matrix = np.asarray(self.vectors, dtype=np.float32)
+        if self.scales is not None:
+            matrix *= np.asarray(self.scales)[:, None]
+        return matrix
+
+    def search(self, query_vector: Sequence[float], k: int = 3) -> List[Tuple[str, float]]:
+        """以內積 (向量已正規化即餘弦相似度) 找出最相近的 k 筆 (雜湊, 分數)"""
+        if self.vectors is None or not len(self.keys):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        # 直接用量化後的矩陣做內積，再乘上每列縮放係數
+        scores = self.vectors @ query
+        if self.scales is not None:
+            scores *= np.asarray(self.scales)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[row], float(scores[row])) for row in top]
+
+
+def embed_missing(store: EmbeddingStore, texts: Sequence[str],
+                  embed_fn: Callable[[List[str]], List[List[float]]],
+                  batch_size: int = EMBED_BATCH_SIZE) -> int:
+    """只計算快取中沒有的片段向量，並移除已不在 texts 中的舊向量，回傳新計算的數量
+
+    texts 要是該分類目前全部的片段內容
+    """
+    by_key = {content_hash(text): text for text in texts}
+    # 先移除已刪除或已修改片段的向量，搜尋結果不會被這些找不到的舊向量佔滿
+    removed = store.compact(by_key)
+    if removed:
+        logging.info(f"   🧮 [{store.category}] 移除 {removed} 個已不在題庫中的向量")
+    pending = store.missing(list(by_key))
+    if not pending:
+        return 0
+
+    # 依長度排序再分批，同一批的長度接近，padding 浪費最少
+    pending.sort(key=lambda key: len(by_key[key]))
+
+    started = time.perf_counter()
+    done = 0
+    buffer_keys: List[str] = []
+    buffer_vectors: List[List[float]] = []
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        buffer_keys.extend(batch)
+        buffer_vectors.extend(embed_fn([by_key[key] for key in batch]))
+        if len(buffer_keys) >= EMBED_FLUSH_EVERY:
+            store.add(buffer_keys, buffer_vectors)
+            done += len(buffer_keys)
+            buffer_keys, buffer_vectors = [], []
+            logging.info(f"   🧮 [{store.category}] 已計算 {done}/{len(pending)} 個向量")
+
+    store.add(buffer_keys, buffer_vectors)
+    done += len(buffer_keys)
+
+    elapsed = time.perf_counter() - started
+    logging.info(f"   🧮 [{store.category}] 新增 {done} 個向量，沿用快取 {len(by_key) - done} 個 ({elapsed:.1f} 秒)")
+    return done
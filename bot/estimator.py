@@ -0,0 +1,65 @@
+import os
+import math
+from typing import Dict, Optional, Tuple
+
+# ==================== 預估時間修正 ====================
+# 每位使用者、每個科目各一個「實際 / 預估」比例的指數加權平均 (在 log 空間平均，
+# 快一倍和慢一倍的權重相同)。每次結束計時 O(1) 更新，不需要重算歷史資料。
+
+# 新資料的權重；前幾筆資料用 1/n，等於一般平均，避免第一筆資料決定一切
+ESTIMATE_ALPHA = float(os.getenv("ESTIMATE_ALPHA", "0.3"))
+# 至少要有幾筆紀錄才給建議
+ESTIMATE_MIN_SAMPLES = int(os.getenv("ESTIMATE_MIN_SAMPLES", "2"))
+# 單筆比例的上下限，忘記按結束計時之類的極端值不會把模型帶歪
+RATIO_MIN, RATIO_MAX = 0.2, 5.0
+
+ALL_SUBJECTS = "*"
+
+
+def _update(model: Dict, log_ratio: float):
+    model["n"] = model.get("n", 0) + 1
+    alpha = max(ESTIMATE_ALPHA, 1 / model["n"])
+    model["log_ratio"] = (1 - alpha) * model.get("log_ratio", 0.0) + alpha * log_ratio
+
+
+def user_estimate(task: Dict) -> float:
+    """使用者自己輸入的預估 (自動修正過的任務另外保存原始值)"""
+    return task.get("user_estimate", task["estimated_time"])
+
+
+def observe(user_data: Dict, task: Dict, actual_minutes: float):
+    """結束計時：用這次的實際時間更新該科目與整體的模型"""
+    estimate = user_estimate(task)
+    if not estimate or actual_minutes <= 0:
+        return
+    ratio = min(RATIO_MAX, max(RATIO_MIN, actual_minutes / estimate))
+    models = user_data.setdefault("estimator", {})
+    for key in (task["subject"], ALL_SUBJECTS):
+        _update(models.setdefault(key, {}), math.log(ratio))
+
+
+def get_ratio(user_data: Dict, subject: str) -> Optional[Tuple[float, int]]:
+    """回傳 (實際/預估 比例, 樣本數)；科目資料不夠時改用整體資料"""
+    models = user_data.get("estimator", {})
+    for key in (subject, ALL_SUBJECTS):
+        model = models.get(key)
+        if model and model["n"] >= ESTIMATE_MIN_SAMPLES:
+            return math.exp(model["log_ratio"]), model["n"]
+    return None
+
+
+def suggest(user_data: Dict, subject: str, estimate: int) -> Optional[Tuple[int, float, int]]:
+    """依過去紀錄修正預估，回傳 (建議分鐘, 比例, 樣本數)"""
+    result = get_ratio(user_data, subject)
+    if result is None:
+        return None
+    ratio, samples = result
+    return max(1, round(estimate * ratio)), ratio, samples
+
+
+def forecast_minutes(user_data: Dict, task: Dict) -> float:
+    """預測任務實際需要的分鐘數 (已自動修正過的直接用修正後的值)"""
+    if "user_estimate" in task:
+        return task["estimated_time"]
+    result = get_ratio(user_data, task["subject"])
+    return task["estimated_time"] * result[0] if result else task["estimated_time"]
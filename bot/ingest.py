@@ -0,0 +1,262 @@
+import os
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+# ==================== PDF 處理相關 ====================
+# pypdf / numpy 等較重的套件在真的處理 PDF 時才載入，機器人啟動時不必付出匯入時間
+
+SOURCE_ROOT = "upload"      # 主資料夾
+OUTPUT_ROOT = "json_knowledge" # 輸出的 JSON 要放哪裡
+# 每個分類已處理的 PDF 與當時的 (修改時間 ns, 大小)，PDF 被修改時據此重新處理
+SOURCES_ROOT = os.path.join(OUTPUT_ROOT, ".sources")
+
+# 是否啟用向量嵌入 (需下載 embeddinggemma-300m，CPU 計算較久)
+EMBEDDINGS_ENABLED = os.getenv("ENABLE_EMBEDDINGS", "0") == "1"
+
+CHUNK_SIZE = 1000
+
+# 進度回報 (階段, 已完成, 總數)
+ProgressCallback = Callable[[str, int, int], None]
+
+_embedder = None
+
+def get_embedder():
+    """第一次使用時才載入嵌入模型"""
+    global _embedder
+    if _embedder is None:
+        from embeddings import CustomHuggingFaceEmbeddings
+        _embedder = CustomHuggingFaceEmbeddings()
+    return _embedder
+
+def extract_text(pdf_path, progress: Optional[ProgressCallback] = None):
+    """擷取 PDF 文字 (pypdf 優先，沒有文字層的頁面改用 OCR)"""
+    text, _ = _extract_with_stats(pdf_path, progress)
+    return text
+
+def _extract_with_stats(pdf_path, progress: Optional[ProgressCallback] = None):
+    from pdf_extract import extract_pages, summarize_page_stats
+
+    try:
+        texts, page_stats = extract_pages(pdf_path, progress)
+        logging.info(f"   📄 {os.path.basename(pdf_path)}: {summarize_page_stats(page_stats)}")
+        return "".join(t + "\n" for t in texts if t), page_stats
+    except Exception as e:
+        logging.error(f"❌ 讀取失敗 {pdf_path}: {e}")
+        return "", []
+
+def chunk_text(text: str, category_name: str, filename: str) -> List[Dict]:
+    """切分文字 (Chunking)"""
+    chunks = []
+    for i in range(0, len(text), CHUNK_SIZE):
+        chunk = text[i:i+CHUNK_SIZE]
+        if len(chunk) > 50:
+            chunks.append({
+                "category": category_name, # 標記分類
+                "source": filename,
+                "content": chunk
+            })
+    return chunks
+
+# 同一分類同時只允許一個處理流程寫入 JSON
+category_locks = defaultdict(threading.Lock)
+
+def _load_knowledge_base(category_name) -> List[Dict]:
+    json_filename = os.path.join(OUTPUT_ROOT, f"{category_name}.json")
+    # 檢查是否已有舊檔 (斷點續傳)
+    if os.path.exists(json_filename):
+        try:
+            with open(json_filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"❌ 讀取題庫失敗 {json_filename}: {e}")
+    return []
+
+def _existing_sources(knowledge_base: List[Dict]) -> set:
+    # 被判定為重複而合併的來源也算已處理過
+    existing_files = {item['source'] for item in knowledge_base}
+    existing_files.update(source for item in knowledge_base for source in item.get('duplicate_sources', []))
+    return existing_files
+
+def _source_signature(pdf_path) -> List[int]:
+    stat = os.stat(pdf_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _load_sources(category_name) -> Dict[str, List[int]]:
+    path = os.path.join(SOURCES_ROOT, f"{category_name}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"❌ 讀取來源紀錄失敗 {path}: {e}")
+    return {}
+
+def _save_sources(category_name, sources: Dict[str, List[int]]):
+    os.makedirs(SOURCES_ROOT, exist_ok=True)
+    path = os.path.join(SOURCES_ROOT, f"{category_name}.json")
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(sources, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def _is_up_to_date(sources: Dict[str, List[int]], existing_files: set, filename: str, signature: List[int]) -> bool:
+    """PDF 已處理過且之後沒被修改"""
+    if filename not in existing_files:
+        return False
+    if filename not in sources:
+        # 沒有來源紀錄的舊題庫：視為最新版本，記下目前的狀態
+        sources[filename] = signature
+        return True
+    return sources[filename] == signature
+
+def _drop_source(knowledge_base: List[Dict], filename: str) -> List[Dict]:
+    """移除某個 PDF 的舊片段 (與其他 PDF 重複的片段改記在其他來源名下)"""
+    kept = []
+    for item in knowledge_base:
+        duplicates = [source for source in item.get('duplicate_sources', []) if source != filename]
+        if item['source'] == filename:
+            if not duplicates:
+                continue
+            item = {**item, 'source': duplicates.pop(0)}
+        item = {key: value for key, value in item.items() if key != 'duplicate_sources'}
+        if duplicates:
+            item['duplicate_sources'] = duplicates
+        kept.append(item)
+    return kept
+
+def _save_knowledge_base(category_name, knowledge_base: List[Dict]) -> List[Dict]:
+    """去重、存檔並計算向量，回傳實際存下的片段"""
+    from dedup import dedupe_chunks, log_dedupe_stats
+
+    # 不同版本的 PDF 常有大量相同內容，只保留最早的一份並記下其他來源
+    knowledge_base, dedupe_stats = dedupe_chunks(knowledge_base)
+    log_dedupe_stats(category_name, dedupe_stats)
+
+    os.makedirs(OUTPUT_ROOT, exist_ok=True)
+    json_filename = os.path.join(OUTPUT_ROOT, f"{category_name}.json")
+    # 先寫暫存檔再替換，監看程式不會讀到寫一半的 JSON
+    with open(json_filename + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(knowledge_base, f, ensure_ascii=False, indent=2)
+    os.replace(json_filename + ".tmp", json_filename)
+    logging.info(f"   💾 [{category_name}] 已存檔！")
+
+    if EMBEDDINGS_ENABLED:
+        from embedding_store import EmbeddingStore, embed_missing
+
+        # 只計算內容有變動的片段，其餘沿用快取
+        embed_missing(
+            EmbeddingStore(category_name),
+            [item["content"] for item in knowledge_base],
+            get_embedder().embed_documents,
+        )
+    return knowledge_base
+
+def _count_chunks(knowledge_base: List[Dict], filename: str) -> int:
+    return sum(
+        1 for item in knowledge_base
+        if item["source"] == filename or filename in item.get("duplicate_sources", [])
+    )
+
+def process_category(category_name, folder_path):
+    """處理單一分類資料夾"""
+    with category_locks[category_name]:
+        _process_category(category_name, folder_path)
+
+def _process_category(category_name, folder_path):
+    knowledge_base = _load_knowledge_base(category_name)
+    existing_files = _existing_sources(knowledge_base)
+    sources = _load_sources(category_name)
+    known_sources = dict(sources)
+
+    files = [f for f in os.listdir(folder_path) if f.lower().endswith('.pdf')]
+    logging.info(f"📂 分類 [{category_name}] 發現 {len(files)} 個 PDF")
+
+    updated = False
+    for filename in files:
+        signature = _source_signature(os.path.join(folder_path, filename))
+        if _is_up_to_date(sources, existing_files, filename, signature):
+            continue
+
+        logging.info(f"   🚀 正在處理: {filename}...")
+        text = extract_text(os.path.join(folder_path, filename))
+
+        if not text.strip():
+            logging.warning(f"   ⚠️ {filename} 擷取不到任何文字，已略過")
+        else:
+            if filename in existing_files:
+                # PDF 被修改過：以新版本取代舊片段
+                logging.info(f"   🔁 {filename} 已修改，取代舊版本的片段")
+                knowledge_base = _drop_source(knowledge_base, filename)
+            knowledge_base.extend(chunk_text(text, category_name, filename))
+            sources[filename] = signature
+            updated = True
+
+    # 如果有新資料才存檔
+    if updated:
+        _save_knowledge_base(category_name, knowledge_base)
+    else:
+        logging.info(f"   ⏸️ [{category_name}] 無新增資料。")
+    if sources != known_sources:
+        _save_sources(category_name, sources)
+
+def ingest_file(category_name, pdf_path, progress: Optional[ProgressCallback] = None) -> Dict:
+    """只處理單一 PDF (上傳網頁送來的工作)，回傳處理結果"""
+    from pdf_extract import summarize_page_stats
+
+    filename = os.path.basename(pdf_path)
+    with category_locks[category_name]:
+        knowledge_base = _load_knowledge_base(category_name)
+        existing_files = _existing_sources(knowledge_base)
+        sources = _load_sources(category_name)
+        known_sources = dict(sources)
+        signature = _source_signature(pdf_path)
+        if _is_up_to_date(sources, existing_files, filename, signature):
+            # 可能已經被資料夾監看處理過了
+            if filename not in known_sources:
+                _save_sources(category_name, sources)
+            return {"chunks": _count_chunks(knowledge_base, filename), "pages": 0, "skipped": True}
+
+        logging.info(f"   🚀 正在處理: {filename}...")
+        text, page_stats = _extract_with_stats(pdf_path, progress)
+        if not text.strip():
+            logging.warning(f"   ⚠️ {filename} 擷取不到任何文字，已略過")
+            return {"chunks": 0, "pages": len(page_stats), "page_stats": summarize_page_stats(page_stats)}
+
+        if filename in existing_files:
+            # 重新上傳同名的 PDF：以新版本取代舊片段
+            logging.info(f"   🔁 {filename} 已修改，取代舊版本的片段")
+            knowledge_base = _drop_source(knowledge_base, filename)
+        new_chunks = chunk_text(text, category_name, filename)
+        if progress:
+            progress("chunk", len(new_chunks), len(new_chunks))
+        knowledge_base = _save_knowledge_base(category_name, knowledge_base + new_chunks)
+        sources[filename] = signature
+        _save_sources(category_name, sources)
+        if progress:
+            progress("save", 1, 1)
+
+        return {
+            "chunks": _count_chunks(knowledge_base, filename),
+            "pages": len(page_stats),
+            "page_stats": summarize_page_stats(page_stats),
+        }
+
+def process_pdfs():
+    """處理所有 PDF 檔案"""
+    if not os.path.exists(OUTPUT_ROOT):
+        os.makedirs(OUTPUT_ROOT)
+
+    # 掃描 source_root 下的所有子資料夾
+    if not os.path.exists(SOURCE_ROOT):
+        logging.error(f"找不到 {SOURCE_ROOT} 資料夾")
+        return
+
+    subfolders = [f for f in os.listdir(SOURCE_ROOT) if os.path.isdir(os.path.join(SOURCE_ROOT, f))]
+
+    logging.info(f"🔍 發現分類: {subfolders}")
+
+    for folder in subfolders:
+        folder_path = os.path.join(SOURCE_ROOT, folder)
+        process_category(folder, folder_path)
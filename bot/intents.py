@@ -0,0 +1,65 @@
+import os
+from typing import Dict
+
+# ==================== Gateway intents 與快取設定 ====================
+# 每個機器人入口只訂閱自己處理的事件，不再一律使用 Intents.all()：
+# 少了 presences / members 就不會收到成員上線、狀態變更等大量事件，也不用在啟動時下載整個成員名單。
+# 設定 BOT_INTENTS_PROFILE=all 可以暫時改回全部訂閱 (除錯用)。
+
+PROFILES: Dict[str, Dict] = {
+    # 讀書機器人：斜線指令、@提及回覆、語音頻道 (番茄鐘讀書房)
+    "study": {
+        "intents": ["guilds", "guild_messages", "dm_messages", "message_content", "voice_states"],
+        "member_cache": ["voice"],   # 只快取在語音頻道中的成員
+        "max_messages": None,        # 不需要訊息快取
+        "chunk_guilds_at_startup": False,
+    },
+    # dcbot_api.py / dcbot_ollama.py：只處理 @提及
+    "chat": {
+        "intents": ["guilds", "guild_messages", "dm_messages", "message_content"],
+        "member_cache": [],
+        "max_messages": None,
+        "chunk_guilds_at_startup": False,
+    },
+    # main.py：回覆 "hi" 與歡迎新成員
+    "welcome": {
+        "intents": ["guilds", "guild_messages", "message_content", "members"],
+        "member_cache": [],          # 新成員事件本身就帶有成員資料，不必快取
+        "max_messages": None,
+        "chunk_guilds_at_startup": False,
+    },
+    # 原本的設定：訂閱全部事件、快取所有成員與最近 1000 則訊息
+    "all": {
+        "intents": "all",
+        "member_cache": "all",
+        "max_messages": 1000,
+        "chunk_guilds_at_startup": True,
+    },
+}
+
+
+def bot_options(profile: str) -> Dict:
+    """建立 discord.Bot 的參數：discord.Bot(**bot_options("study"))"""
+    import discord
+
+    config = PROFILES[os.getenv("BOT_INTENTS_PROFILE") or profile]
+    if config["intents"] == "all":
+        intents = discord.Intents.all()
+    else:
+        intents = discord.Intents.none()
+        for name in config["intents"]:
+            setattr(intents, name, True)
+
+    if config["member_cache"] == "all":
+        member_cache = discord.MemberCacheFlags.all()
+    else:
+        member_cache = discord.MemberCacheFlags.none()
+        for name in config["member_cache"]:
+            setattr(member_cache, name, True)
+
+    return {
+        "intents": intents,
+        "member_cache_flags": member_cache,
+        "max_messages": config["max_messages"],
+        "chunk_guilds_at_startup": config["chunk_guilds_at_startup"],
+    }
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# 機器人、背景 worker 與上傳網頁共用的工作佇列 (都從專案根目錄啟動)
+JOB_DB = os.getenv("JOB_DB", "jobs.sqlite3")
+
+# worker 執行工作時每隔幾秒回報一次心跳
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+# 超過這個秒數沒有心跳視為 worker 已當掉 (例如 OCR 時記憶體不足被砍掉)，重試或標記失敗
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',  -- pending / running / done / failed
+    progress    TEXT,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    priority     INTEGER NOT NULL DEFAULT 0,  -- 數字越大越先執行
+    attempts     INTEGER NOT NULL DEFAULT 0,  -- 第幾次執行，結束時據此確認工作沒有被重新排入
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after    REAL NOT NULL DEFAULT 0,     -- 重試的退避時間
+    lock_key     TEXT,                        -- 相同 lock_key 的工作不會同時執行
+    channel_id   INTEGER,                     -- 完成後要通知的頻道
+    user_id      INTEGER,
+    notified     INTEGER NOT NULL DEFAULT 0,  -- 機器人是否已處理完成結果
+    owner        INTEGER,                     -- 由哪個機器人行程處理結果 (NULL = 主行程)
+    heartbeat_at REAL                         -- worker 最後一次回報還活著的時間
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (notified, status);
+"""
+
+
+class JobQueue:
+    """以 SQLite 實作的本機工作佇列，可跨行程共用"""
+
+    def __init__(self, path: str = JOB_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # autocommit 模式，需要交易時自行 BEGIN
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # WAL 讓讀取 (網頁查進度) 不會被寫入擋住
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("payload", "progress", "result"):
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def enqueue(self, kind: str, payload: Dict, priority: int = 0, max_attempts: int = 3,
+                lock_key: Optional[str] = None, channel_id: Optional[int] = None,
+                user_id: Optional[int] = None, owner: Optional[int] = None) -> int:
+        """加入工作，回傳工作編號"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, payload, created_at, priority, max_attempts, lock_key, channel_id, user_id, owner)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), time.time(),
+                 priority, max_attempts, lock_key, channel_id, user_id, owner),
+            )
+            return cursor.lastrowid
+
+    def claim(self, kinds: Optional[List[str]] = None) -> Optional[Dict]:
+        """取出優先度最高的待處理工作並標記為執行中 (沒有工作則回傳 None)"""
+        now = time.time()
+        with self._connect() as conn:
+            # IMMEDIATE 先取得寫入鎖，多個消費者不會拿到同一個工作
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                query = (
+                    "SELECT * FROM jobs WHERE status = 'pending' AND run_after <= ?"
+                    " AND (lock_key IS NULL OR lock_key NOT IN"
+                    "      (SELECT lock_key FROM jobs WHERE status = 'running' AND lock_key IS NOT NULL))"
+                )
+                params: list = [now]
+                if kinds:
+                    query += f" AND kind IN ({','.join('?' * len(kinds))})"
+                    params.extend(kinds)
+                row = conn.execute(query + " ORDER BY priority DESC, id LIMIT 1", params).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, attempts = attempts + 1"
+                    " WHERE id = ?",
+                    (now, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            job = self._to_dict(row)
+            job.update(status="running", started_at=now, heartbeat_at=now, attempts=job["attempts"] + 1)
+            return job
+
+    # 以下寫入都只在工作仍是這次執行 (attempts 相同且還在執行中) 時生效：
+    # 工作被判定卡住而重新排入、甚至被其他 worker 取走後，原本的 worker 寫回的結果會被捨棄
+
+    def heartbeat(self, job_id: int, attempts: int):
+        """worker 還在執行這個工作"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (time.time(), job_id, attempts),
+            )
+
+    def update_progress(self, job_id: int, attempts: int, progress: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (json.dumps(progress, ensure_ascii=False), job_id, attempts),
+            )
+
+    def complete(self, job_id: int, attempts: int, result: Dict) -> bool:
+        """寫回結果，回傳是否成功 (False = 這次執行已不算數)"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?"
+                " WHERE id = ? AND status = 'running' AND attempts = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, attempts),
+            )
+            return cursor.rowcount == 1
+
+    @staticmethod
+    def _fail(conn: sqlite3.Connection, job_id: int, attempts: int, max_attempts: int, error: str, now: float) -> bool:
+        if attempts < max_attempts:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'pending', error = ?, run_after = ?"
+                " WHERE id = ? AND status = 'running' AND attempts = ?",
+                (error, now + 5 * 2 ** (attempts - 1), job_id, attempts),
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?"
+                " WHERE id = ? AND status = 'running' AND attempts = ?",
+                (error, now, job_id, attempts),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, attempts: int, error: str) -> bool:
+        """標記失敗；還有重試次數就以指數退避排回佇列，回傳是否成功 (False = 這次執行已不算數)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            return self._fail(conn, job_id, attempts, row["max_attempts"], error, time.time())
+
+    def requeue_stale(self, stale_seconds: float = JOB_STALE_SECONDS,
+                      timeouts: Optional[Dict[str, float]] = None) -> int:
+        """處理卡在執行中的工作，回傳處理筆數
+
+        超過 stale_seconds 沒有心跳 (worker 當掉)，或執行時間超過該種類的 timeouts (worker 卡住)，
+        就跟執行失敗一樣：還有重試次數就退避後重試，否則標記失敗，不會無限重新排入。
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, kind, attempts, max_attempts, started_at, COALESCE(heartbeat_at, started_at) AS beat"
+                    " FROM jobs WHERE status = 'running'"
+                ).fetchall()
+                handled = 0
+                for row in rows:
+                    timeout = (timeouts or {}).get(row["kind"])
+                    if row["beat"] < now - stale_seconds:
+                        error = f"worker 超過 {stale_seconds:g} 秒沒有回應 (可能已當掉或記憶體不足)"
+                    elif timeout is not None and row["started_at"] < now - timeout:
+                        error = f"執行超過 {timeout:g} 秒"
+                    else:
+                        continue
+                    self._fail(conn, row["id"], row["attempts"], row["max_attempts"], error, now)
+                    handled += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return handled
+
+    def pop_finished(self, kinds: Optional[List[str]] = None, limit: int = 50,
+                     owner: Optional[int] = None, include_unowned: bool = True) -> List[Dict]:
+        """取出已結束但機器人還沒處理結果的工作，並標記為已處理
+
+        owner 為 None 時取出所有工作；否則只取出該行程的工作 (include_unowned 時加上沒有指定行程的工作)
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                query = "SELECT * FROM jobs WHERE notified = 0 AND status IN ('done', 'failed')"
+                params: list = []
+                if kinds:
+                    query += f" AND kind IN ({','.join('?' * len(kinds))})"
+                    params.extend(kinds)
+                if owner is not None:
+                    query += " AND (owner = ? OR owner IS NULL)" if include_unowned else " AND owner = ?"
+                    params.append(owner)
+                rows = conn.execute(query + " ORDER BY id LIMIT ?", params + [limit]).fetchall()
+                conn.executemany("UPDATE jobs SET notified = 1 WHERE id = ?", [(row["id"],) for row in rows])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [self._to_dict(row) for row in rows]
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._connect() as conn:
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各種工作在各狀態的數量 { kind: { status: 數量 } }"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status").fetchall()
+        stats: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            stats.setdefault(row["kind"], {})[row["status"]] = row["n"]
+        return stats
@@ -0,0 +1,121 @@
+import os
+import logging
+from typing import Callable, Dict
+
+from job_queue import JobQueue
+
+# ==================== 背景工作處理函式 (在 worker 行程中執行) ====================
+# 每個函式接收 (工作, 佇列)，回傳會存進 result 的 dict；丟出例外則依重試次數重試
+
+# 工作種類與預設優先度 (數字越大越先執行)
+PRIORITY_QUIZ = 10
+PRIORITY_PERSONALITY = 0
+PRIORITY_INGEST = -10
+
+# worker 分組：OCR/嵌入等 CPU 工作與等待 LLM 的工作分開，出題不會卡在大型 PDF 後面
+INGEST_KINDS = ["ingest_file", "ingest_category", "ingest_all", "compile_knowledge"]
+LLM_KINDS = ["generate_quiz", "analyze_personality"]
+
+# 各種工作正常情況下最多執行多久 (秒)；超過就算 worker 還有心跳也視為卡住
+JOB_TIMEOUTS = {
+    "generate_quiz": 300,
+    "analyze_personality": 300,
+    "ingest_file": 3600,
+    "ingest_category": 3600,
+    "ingest_all": 4 * 3600,
+    "compile_knowledge": 900,
+}
+
+
+def handle_ingest_file(job: Dict, queue: JobQueue) -> Dict:
+    """處理上傳網頁送來的單一 PDF，並回報進度"""
+    from ingest import ingest_file
+
+    def report(stage: str, done: int, total: int):
+        queue.update_progress(job["id"], job["attempts"], {"stage": stage, "done": done, "total": total})
+
+    payload = job["payload"]
+    return ingest_file(payload["category"], payload["path"], progress=report)
+
+
+def handle_ingest_category(job: Dict, queue: JobQueue) -> Dict:
+    """處理單一分類資料夾 (資料夾監看發現有新 PDF)"""
+    from ingest import SOURCE_ROOT, process_category
+
+    category = job["payload"]["category"]
+    process_category(category, os.path.join(SOURCE_ROOT, category))
+    return {"category": category}
+
+
+def handle_ingest_all(job: Dict, queue: JobQueue) -> Dict:
+    """處理所有 PDF (/更新題庫)"""
+    from ingest import process_pdfs
+
+    process_pdfs()
+    # 順便把 JSON 轉成精簡格式，機器人重新載入時不必再轉換
+    return _compile_all()
+
+
+def handle_compile_knowledge(job: Dict, queue: JobQueue) -> Dict:
+    """把有變動的題庫 JSON 轉成精簡格式 (/重載題庫)"""
+    return _compile_all()
+
+
+def _compile_all() -> Dict:
+    from ingest import OUTPUT_ROOT
+    from knowledge_store import ensure_compiled
+
+    categories = 0
+    if os.path.exists(OUTPUT_ROOT):
+        for filename in os.listdir(OUTPUT_ROOT):
+            if filename.endswith(".json"):
+                category, json_path = filename[:-len(".json")], os.path.join(OUTPUT_ROOT, filename)
+                ensure_compiled(category, json_path)
+                categories += 1
+    return {"categories": categories}
+
+
+def handle_generate_quiz(job: Dict, queue: JobQueue) -> Dict:
+    """呼叫 LLM 出題"""
+    from llm import generate_quiz
+
+    payload = job["payload"]
+    quiz = generate_quiz(payload["doc"], payload["subject"])
+    return {"quiz": quiz.model_dump()}
+
+
+def handle_analyze_personality(job: Dict, queue: JobQueue) -> Dict:
+    """分析使用者個性"""
+    from llm import analyze_personality
+
+    return {"personality": analyze_personality(job["payload"]["chat_history"])}
+
+
+HANDLERS: Dict[str, Callable[[Dict, JobQueue], Dict]] = {
+    "ingest_file": handle_ingest_file,
+    "ingest_category": handle_ingest_category,
+    "ingest_all": handle_ingest_all,
+    "compile_knowledge": handle_compile_knowledge,
+    "generate_quiz": handle_generate_quiz,
+    "analyze_personality": handle_analyze_personality,
+}
+
+
+def run_job(job: Dict, queue: JobQueue):
+    """執行單一工作並寫回結果"""
+    handler = HANDLERS.get(job["kind"])
+    if handler is None:
+        queue.fail(job["id"], job["attempts"], f"未知的工作種類: {job['kind']}")
+        return
+    try:
+        result = handler(job, queue)
+    except Exception as e:
+        logging.error(f"❌ 工作 #{job['id']} ({job['kind']}) 第 {job['attempts']} 次失敗: {e}")
+        if not queue.fail(job["id"], job["attempts"], str(e)):
+            logging.warning(f"⚠️ 工作 #{job['id']} 已被判定卡住並重新排入，不再記錄這次的失敗")
+        return
+    if queue.complete(job["id"], job["attempts"], result):
+        logging.info(f"✅ 工作 #{job['id']} ({job['kind']}) 完成")
+    else:
+        # 執行太久被判定卡住：工作已重新排入或交給其他 worker，捨棄這次的結果避免重複貼出
+        logging.warning(f"⚠️ 工作 #{job['id']} ({job['kind']}) 已被判定卡住並重新排入，捨棄這次的結果")
@@ -0,0 +1,193 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+import logging
+from contextlib import contextmanager
+from array import array
+from collections.abc import Sequence
+from typing import Dict, List, Optional
+
+STORE_ROOT = os.path.join("json_knowledge", ".store")
+
+# 轉換鎖超過這個秒數視為持有的行程已經當掉
+COMPILE_LOCK_STALE_SECONDS = 300
+
+
+def _store_paths(root: str, category: str, version: int) -> Dict[str, str]:
+    base = os.path.join(root, f"{category}.{version}")
+    return {
+        "offsets": base + ".off",  # 每個片段在文字檔中的起訖位置 (uint64)
+        "sources": base + ".src",  # 每個片段對應的來源編號 (uint32)
+        "text": base + ".txt",     # 所有片段內容串接成的 UTF-8 文字
+    }
+
+
+def _meta_path(root: str, category: str) -> str:
+    return os.path.join(root, f"{category}.meta.json")
+
+
+def _read_meta(root: str, category: str) -> Optional[Dict]:
+    try:
+        with open(_meta_path(root, category), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def content_hash(text: str) -> str:
+    """以內容計算片段雜湊，相同內容永遠得到相同鍵值"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _compile_lock(root: str, category: str):
+    """多個機器人行程共用同一份精簡格式時，同一個分類一次只讓一個行程轉換"""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f"{category}.lock")
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > COMPILE_LOCK_STALE_SECONDS:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue  # 鎖剛好被釋放
+            time.sleep(0.1)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+def compile_store(category: str, json_path: str, root: str = STORE_ROOT) -> Dict:
+    """把分類 JSON 轉成精簡格式 (只在 JSON 有變動時執行)"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        knowledge_base = json.load(f)
+    stat = os.stat(json_path)
+
+    old_meta = _read_meta(root, category)
+    version = (old_meta["version"] + 1) if old_meta else 1
+    paths = _store_paths(root, category, version)
+    os.makedirs(root, exist_ok=True)
+
+    sources: List[str] = []
+    source_ids: Dict[str, int] = {}
+    offsets = array("Q", [0])
+    chunk_sources = array("I")
+    with open(paths["text"], "wb") as f:
+        for item in knowledge_base:
+            encoded = item["content"].encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            source = item.get("source", "")
+            if source not in source_ids:
+                source_ids[source] = len(sources)
+                sources.append(source)
+            chunk_sources.append(source_ids[source])
+    with open(paths["offsets"], "wb") as f:
+        offsets.tofile(f)
+    with open(paths["sources"], "wb") as f:
+        chunk_sources.tofile(f)
+
+    meta = {
+        "version": version,
+        "count": len(knowledge_base),
+        "sources": sources,
+        "json_mtime_ns": stat.st_mtime_ns,
+        "json_size": stat.st_size,
+    }
+    # meta 最後寫入，讀取端只會看到完整的新版本
+    tmp_meta = _meta_path(root, category) + ".tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_meta, _meta_path(root, category))
+
+    # 清掉舊版本 (仍被 mmap 佔用時略過，下次再清)
+    if old_meta:
+        for path in _store_paths(root, category, old_meta["version"]).values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    logging.info(f"   🗜️ [{category}] 已轉換為精簡格式 ({len(knowledge_base)} 筆片段)")
+    return meta
+
+
+def is_stale(category: str, json_path: str, root: str = STORE_ROOT) -> bool:
+    """JSON 比精簡格式新就需要重新轉換"""
+    meta = _read_meta(root, category)
+    if meta is None:
+        return True
+    stat = os.stat(json_path)
+    return meta["json_mtime_ns"] != stat.st_mtime_ns or meta["json_size"] != stat.st_size
+
+
+def ensure_compiled(category: str, json_path: str, root: str = STORE_ROOT) -> bool:
+    """需要時轉換精簡格式 (機器人行程與 worker 之間不會重複轉換)，回傳是否有轉換"""
+    if not is_stale(category, json_path, root):
+        return False
+    with _compile_lock(root, category):
+        # 等鎖的期間其他行程可能已經轉換好了
+        if not is_stale(category, json_path, root):
+            return False
+        compile_store(category, json_path, root)
+        return True
+
+
+class ChunkStore(Sequence):
+    """單一分類的題庫片段，只載入索引，內容以 mmap 按需讀取
+
+    可以像 list 一樣使用：len(store)、store[i]、random.choice(store)
+    """
+
+    def __init__(self, category: str, json_path: str, root: str = STORE_ROOT):
+        self.category = category
+        ensure_compiled(category, json_path, root)
+
+        meta = _read_meta(root, category)
+        paths = _store_paths(root, category, meta["version"])
+        self.sources: List[str] = meta["sources"]
+
+        self._offsets = array("Q")
+        with open(paths["offsets"], "rb") as f:
+            self._offsets.fromfile(f, meta["count"] + 1)
+        self._source_ids = array("I")
+        with open(paths["sources"], "rb") as f:
+            self._source_ids.fromfile(f, meta["count"])
+
+        self._blob = None
+        if self._offsets[-1]:
+            with open(paths["text"], "rb") as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self._source_ids)
+
+    def content(self, index: int) -> str:
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._blob[start:end].decode("utf-8") if end > start else ""
+
+    def __getitem__(self, index: int) -> Dict:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return {
+            "category": self.category,
+            "source": self.sources[self._source_ids[index]],
+            "content": self.content(index),
+        }
+
+    def close(self):
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
@@ -0,0 +1,64 @@
+import os
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+FileState = Tuple[str, int, int]  # (檔名, 修改時間 ns, 大小)
+
+
+def _scan(folder: str, suffix: str) -> FrozenSet[FileState]:
+    try:
+        with os.scandir(folder) as entries:
+            return frozenset(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(suffix)
+            )
+    except FileNotFoundError:
+        return frozenset()
+
+
+class KnowledgeWatcher:
+    """監看 upload/ 與 json_knowledge/，只回報有變動的分類
+
+    以 stat 輪詢實作 (不需額外套件)，每次只比對檔名、修改時間與大小，
+    成本與檔案數量成正比，跟檔案內容大小無關。
+    """
+
+    def __init__(self, source_root: str, json_root: str):
+        self.source_root = source_root
+        self.json_root = json_root
+        # 一開始視為空的，第一次輪詢會補處理離線期間上傳的 PDF
+        self._sources: Dict[str, FrozenSet[FileState]] = {}
+        self._json: Dict[str, Tuple[int, int]] = self._scan_json()
+
+    def _scan_json(self) -> Dict[str, Tuple[int, int]]:
+        return {
+            name[:-len(".json")]: (mtime, size)
+            for name, mtime, size in _scan(self.json_root, ".json")
+        }
+
+    def poll_sources(self) -> List[str]:
+        """回傳 PDF 有新增或修改的分類"""
+        try:
+            with os.scandir(self.source_root) as entries:
+                folders = [entry.name for entry in entries if entry.is_dir()]
+        except FileNotFoundError:
+            return []
+
+        changed = []
+        current = {}
+        for folder in folders:
+            state = _scan(os.path.join(self.source_root, folder), ".pdf")
+            current[folder] = state
+            # 只有新增或修改才需要處理，刪除 PDF 不影響已建立的題庫
+            if state - self._sources.get(folder, frozenset()):
+                changed.append(folder)
+        self._sources = current
+        return changed
+
+    def poll_json(self) -> Tuple[List[str], List[str]]:
+        """回傳 (需要重新載入的分類, 已被刪除的分類)"""
+        current = self._scan_json()
+        changed = [category for category, state in current.items() if self._json.get(category) != state]
+        removed: Set[str] = set(self._json) - set(current)
+        self._json = current
+        return changed, sorted(removed)
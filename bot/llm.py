@@ -0,0 +1,110 @@
+import os
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv()
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+# 任何 OpenAI 相容的端點 (例如離線測試用的本機假伺服器)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+_client = None
+
+
+def get_client():
+    """第一次呼叫 LLM 時才載入 OpenAI SDK 並建立 client"""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=OPENROUTER_API_KEY,
+            max_retries=0,
+        )
+    return _client
+
+CHAT_MODEL = "deepseek/deepseek-r1-0528:free"
+# 注意：DeepSeek R1 會輸出 <think> 標籤，不適合 structured output
+# 改用支援 structured output 的模型
+QUIZ_MODEL = "meta-llama/llama-3.3-70b-instruct"
+
+
+# ====== Structured Output 模型 ======
+class QuizQuestion(BaseModel):
+    question: str
+    option_a: str
+    option_b: str
+    option_c: str
+    option_d: str
+    correct_answer: str  # "A", "B", "C", or "D"
+    explanation: str
+
+
+# 出題 Prompt
+def build_prompt(doc_data, category):
+    return f"""
+你是一位專業的國中老師。
+科目：{category}
+參考資料來源：{doc_data['source']}
+資料內容：
+{doc_data['content']}
+
+任務：根據資料內容出一題「單選題」，並填寫以下欄位：
+- question: 題目內容
+- option_a: 選項 A 的內容（不需加 A. 前綴）
+- option_b: 選項 B 的內容（不需加 B. 前綴）
+- option_c: 選項 C 的內容（不需加 C. 前綴）
+- option_d: 選項 D 的內容（不需加 D. 前綴）
+- correct_answer: 正確答案，只能填 A、B、C 或 D 其中一個字母
+- explanation: 詳細解析，說明為何正確答案是對的
+
+規則：
+1. 使用繁體中文。
+2. 題目須具備教育意義，幫助學生理解概念，而非僅考察記憶。
+3. 請確保題目與解析的內容都來自提供的資料內容，不要加入額外資訊。
+4. 選項和題目務必合理，不能出現明顯錯誤或不合邏輯的內容。
+5. 請勿使用詩歌體或過於文學化的語言，保持清晰直接，適合國中學生閱讀。
+"""
+
+
+def generate_quiz(doc_data: Dict, category: str) -> QuizQuestion:
+    """使用 OpenRouter API (Structured Output) 出題"""
+    response = get_client().beta.chat.completions.parse(
+        model=QUIZ_MODEL,
+        messages=[
+            {"role": "system", "content": "你是一位專業的國中老師，擅長出題。請按照指定格式回答。"},
+            {"role": "user", "content": build_prompt(doc_data, category)}
+        ],
+        response_format=QuizQuestion,
+    )
+    return response.choices[0].message.parsed
+
+
+def analyze_personality(chat_history: List[Dict]) -> str:
+    """分析使用者個性"""
+    if len(chat_history) < 6:  # 至少3次對話（6條訊息）才開始分析
+        return ""
+
+    # 取最近10次對話
+    recent_messages = chat_history[-20:]
+
+    analysis_prompt = """基於以下對話歷史，請分析這位學生的個性特質。
+
+請以2-3句話描述：
+1. 他們的情緒狀態傾向（焦慮/樂觀/平穩等）
+2. 他們的表達風格（直接/含蓄/幽默等）
+3. 他們最需要的支持類型（鼓勵/實際建議/陪伴等）
+
+對話歷史：
+""" + "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent_messages])
+
+    response = get_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": "你是一位專業的心理分析師，擅長透過對話理解學生的個性。"},
+            {"role": "user", "content": analysis_prompt}
+        ],
+    )
+    return response.choices[0].message.content
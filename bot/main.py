@@ -2,10 +2,12 @@ import discord
 from dotenv import load_dotenv
 import os
 
+from intents import bot_options
+
 # Load environment variables from .env file
 load_dotenv()
 
-bot = discord.Bot(intents = discord.Intents.all())
+bot = discord.Bot(**bot_options("welcome"))
 
 @bot.event
 async def on_ready():
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from array import array
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ==================== 答題紀錄與熟練度 ====================
+# 每次作答都附加一行到 quiz_history.jsonl (只增不改)，啟動時重播一次建立彙總，
+# 之後每次作答增量更新。出題時依熟練度加權抽片段，越常答錯的片段越容易被抽到。
+
+QUIZ_HISTORY_FILE = os.getenv("QUIZ_HISTORY_FILE", "quiz_history.jsonl")
+
+# 權重下限：完全熟練的片段仍有機會再出現
+MIN_WEIGHT = 0.1
+
+
+def chunk_weight(attempts: int, correct: int) -> float:
+    """熟練度 = (答對 + 1) / (作答 + 2)；沒作答過為 0.5、權重 1，越常錯權重越高 (最高 2)"""
+    mastery = (correct + 1) / (attempts + 2)
+    return max(MIN_WEIGHT, 2 * (1 - mastery))
+
+
+class FenwickTree:
+    """樹狀陣列：單點更新與依累積權重抽樣都是 O(log n)"""
+
+    def __init__(self, weights: Sequence[float]):
+        self.size = len(weights)
+        self.weights = array("d", weights)
+        self.tree = array("d", [0.0]) * (self.size + 1)
+        # O(n) 建樹
+        for i in range(1, self.size + 1):
+            self.tree[i] += self.weights[i - 1]
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+
+    def set(self, index: int, weight: float):
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, target: float) -> int:
+        """回傳累積權重超過 target 的第一個位置 (0 起算)"""
+        position, step = 0, 1 << self.size.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self.tree[nxt] <= target:
+                position = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        return min(position, self.size - 1)
+
+    def sample(self, rng: random.Random) -> int:
+        return self.find(rng.random() * self.total)
+
+
+class ChunkSampler:
+    """某位使用者在某個分類的加權抽樣器"""
+
+    def __init__(self, store, chunk_ids: List[str], stats: Dict[str, List[int]]):
+        self.store = store  # 建立時的題庫，題庫被替換後要重建
+        self.rows: Dict[str, List[int]] = defaultdict(list)
+        for row, chunk_id in enumerate(chunk_ids):
+            self.rows[chunk_id].append(row)
+        weights = [chunk_weight(*stats[chunk_id]) if chunk_id in stats else 1.0 for chunk_id in chunk_ids]
+        self.tree = FenwickTree(weights)
+
+    def draw(self, rng: random.Random) -> int:
+        return self.tree.sample(rng)
+
+    def update(self, chunk_id: str, attempts: int, correct: int):
+        weight = chunk_weight(attempts, correct)
+        for row in self.rows.get(chunk_id, ()):
+            self.tree.set(row, weight)
+
+
+class MasteryTracker:
+    """答題紀錄 (append-only) 與每位使用者、每個片段的熟練度"""
+
+    def __init__(self, path: str = QUIZ_HISTORY_FILE):
+        self.path = path
+        # (使用者, 分類) -> 片段 -> [作答次數, 答對次數]
+        self.stats: Dict[Tuple[str, str], Dict[str, List[int]]] = defaultdict(dict)
+        self.samplers: Dict[Tuple[str, str], ChunkSampler] = {}
+        self.rng = random.Random()
+        self._lock = threading.Lock()
+        self._offset = 0  # 已讀到紀錄檔的位置 (follow 用)
+
+    def load(self):
+        """重播答題紀錄建立彙總 (只在啟動時執行)"""
+        if not os.path.exists(self.path):
+            return
+        count = self._replay(lambda event: True)
+        logging.info(f"📈 已載入 {count} 筆答題紀錄")
+
+    def follow(self) -> int:
+        """多個行程共用紀錄檔時：套用其他行程新寫入的作答，回傳筆數"""
+        if not os.path.exists(self.path):
+            return 0
+        pid = os.getpid()
+        return self._replay(lambda event: event.get("pid") != pid)
+
+    def _replay(self, accept) -> int:
+        count = 0
+        with self._lock, open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # 其他行程還沒寫完的最後一行，下次再讀
+                self._offset += len(line)
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 寫到一半就中斷的一行
+                if not accept(event) or event["chunk_id"] is None:
+                    continue
+                key = (event["user_id"], event["category"])
+                attempts, correct = self._apply(*key, event["chunk_id"], event["correct"])
+                sampler = self.samplers.get(key)
+                if sampler is not None:
+                    sampler.update(event["chunk_id"], attempts, correct)
+                count += 1
+        return count
+
+    def _apply(self, user_id: str, category: str, chunk_id: str, correct: bool) -> List[int]:
+        entry = self.stats[(user_id, category)].setdefault(chunk_id, [0, 0])
+        entry[0] += 1
+        entry[1] += int(correct)
+        return entry
+
+    def record(self, user_id: str, category: str, chunk_id: Optional[str], question_id: str,
+               correct: bool, latency: float, selected: str):
+        """記錄一次作答並更新熟練度"""
+        event = {
+            "ts": time.time(),
+            "pid": os.getpid(),
+            "user_id": user_id,
+            "category": category,
+            "chunk_id": chunk_id,
+            "question_id": question_id,
+            "selected": selected,
+            "correct": correct,
+            "latency": round(latency, 3),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            if chunk_id is None:
+                return
+            attempts, correct_count = self._apply(user_id, category, chunk_id, correct)
+            sampler = self.samplers.get((user_id, category))
+            if sampler is not None:
+                sampler.update(chunk_id, attempts, correct_count)
+
+    def draw(self, user_id: str, category: str, store, chunk_ids: List[str]) -> int:
+        """依熟練度加權抽一個片段，回傳片段編號"""
+        key = (user_id, category)
+        with self._lock:
+            sampler = self.samplers.get(key)
+            if sampler is None or sampler.store is not store:
+                sampler = self.samplers[key] = ChunkSampler(store, chunk_ids, self.stats.get(key, {}))
+            return sampler.draw(self.rng)
+
+    def summary(self, user_id: str, category: str) -> Tuple[int, int, int]:
+        """(作答次數, 答對次數, 練過的片段數)"""
+        stats = self.stats.get((user_id, category), {})
+        return sum(a for a, _ in stats.values()), sum(c for _, c in stats.values()), len(stats)
@@ -0,0 +1,222 @@
+import os
+import time
+import asyncio
+import logging
+import inspect
+import functools
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# ==================== 效能量測 ====================
+# 斜線指令耗時、各段處理 (讀寫資料、LLM、Discord 傳送) 的耗時分布與錯誤次數。
+# 預設關閉：timed 直接回傳原本的函式，span 回傳共用的空 context manager，幾乎沒有額外成本。
+# 開啟後可用 /效能統計 查看，或設定 METRICS_PORT 以 Prometheus 文字格式提供 /metrics。
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+# 只在本機開放的 HTTP 埠 (0 = 不開)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PREFIX = "studybot"
+
+# 直方圖的桶 (秒)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """固定桶的耗時分布 (Prometheus histogram)"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # 最後一格是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """依桶估計分位數 (桶內線性內插)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "labels", "started")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe("span_seconds", (("span", self.name),) + self.labels, time.perf_counter() - self.started)
+        if exc_type is not None:
+            self.metrics._inc("span_errors_total", (("span", self.name),) + self.labels)
+        return False
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """直方圖與計數器的集合"""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()  # load_data 等也會在執行緒中呼叫
+
+    def _observe(self, name: str, labels: Labels, value: float):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = Histogram()
+            histogram.observe(value)
+
+    def _inc(self, name: str, labels: Labels, value: float = 1):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if self.enabled:
+            self._observe(name, _labels(labels), value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if self.enabled:
+            self._inc(name, _labels(labels), value)
+
+    def span(self, name: str, **labels):
+        """with metrics.span("discord_send"): ...  量測一段程式的耗時"""
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, _labels(labels))
+
+    def timed(self, name: str):
+        """裝飾器：量測函式 (含 async) 的耗時；關閉時直接回傳原函式"""
+        def decorator(func):
+            if not self.enabled:
+                return func
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self, name: str, label: str) -> List[Dict]:
+        """某個直方圖依 label 分組的 次數 / p50 / p99 / 平均，依總耗時排序"""
+        with self._lock:
+            rows = [
+                {"name": dict(labels).get(label, ""), "count": h.count, "total": h.sum,
+                 "p50": h.quantile(0.5), "p99": h.quantile(0.99), "mean": h.sum / h.count if h.count else 0.0}
+                for (metric, labels), h in self.histograms.items() if metric == name
+            ]
+        return sorted(rows, key=lambda row: -row["total"])
+
+    def counter_total(self, name: str, **labels) -> float:
+        wanted = set(_labels(labels))
+        with self._lock:
+            return sum(v for (metric, key), v in self.counters.items() if metric == name and wanted <= set(key))
+
+    def render(self) -> str:
+        """Prometheus 文字格式"""
+        def fmt(labels: Labels, extra: str = "") -> str:
+            parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} histogram")
+            for (metric, labels), h in histograms:
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += n
+                    le = 'le="%s"' % bound
+                    lines.append(f"{METRICS_PREFIX}_{name}_bucket{fmt(labels, le)} {cumulative}")
+                lines.append(f"{METRICS_PREFIX}_{name}_sum{fmt(labels)} {h.sum}")
+                lines.append(f"{METRICS_PREFIX}_{name}_count{fmt(labels)} {h.count}")
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} counter")
+            for (metric, labels), value in counters:
+                if metric == name:
+                    lines.append(f"{METRICS_PREFIX}_{name}{fmt(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+async def serve(registry: Metrics, host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[asyncio.AbstractServer]:
+    """極簡 HTTP 伺服器：GET /metrics 回傳 Prometheus 文字格式"""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 讀掉剩下的標頭
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", registry.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    if not port:
+        return None
+    server = await asyncio.start_server(handle, host, port)
+    logging.info(f"📊 效能量測端點: http://{host}:{port}/metrics")
+    return server
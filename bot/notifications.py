@@ -0,0 +1,95 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, List
+
+# ==================== 通知頻道批次發送 ====================
+# 指令只把事件放進佇列就返回，背景工作每隔一段時間把累積的事件合併成一則摘要送出，
+# 並用 token bucket 限制發送速率，避免晚上尖峰時撞到 Discord 的頻道速率限制。
+
+# 合併視窗 (秒)：第一個事件進來後等這麼久再一起送出
+NOTIFY_INTERVAL = float(os.getenv("NOTIFY_INTERVAL", "60"))
+# 每分鐘最多送出幾則、可連續送出幾則
+NOTIFY_RATE_PER_MIN = float(os.getenv("NOTIFY_RATE_PER_MIN", "6"))
+NOTIFY_BURST = int(os.getenv("NOTIFY_BURST", "2"))
+# 佇列上限，超過就丟掉最舊的事件
+NOTIFY_MAX_PENDING = int(os.getenv("NOTIFY_MAX_PENDING", "1000"))
+
+# 送出摘要：(事件列表, 統計) -> None
+SendDigest = Callable[[List[Dict], Dict], Awaitable[None]]
+
+
+class TokenBucket:
+    """每秒補充 rate 個 token，最多存 capacity 個"""
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """還要等多久才有 token (0 表示現在就有)"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class NotificationBatcher:
+    """收集通知事件，定期合併成摘要送出"""
+
+    def __init__(self, send: SendDigest, interval: float = NOTIFY_INTERVAL,
+                 bucket: TokenBucket = None, max_pending: int = NOTIFY_MAX_PENDING):
+        self.send = send
+        self.interval = interval
+        self.bucket = bucket or TokenBucket(NOTIFY_RATE_PER_MIN / 60, NOTIFY_BURST)
+        self.pending = deque()
+        self.max_pending = max_pending
+        self._wakeup = asyncio.Event()
+        self.counters = {"published": 0, "sent": 0, "merged": 0, "dropped": 0, "failed": 0}
+
+    def publish(self, kind: str, **fields):
+        """加入一個事件 (不等待、不會失敗)"""
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.counters["dropped"] += 1
+        self.pending.append({"kind": kind, "at": time.time(), **fields})
+        self.counters["published"] += 1
+        self._wakeup.set()
+
+    def stats(self) -> Dict:
+        return {**self.counters, "pending": len(self.pending)}
+
+    async def run(self):
+        """背景主迴圈：沒有事件時完全不醒來"""
+        while True:
+            await self._wakeup.wait()
+            # 等合併視窗結束，再等速率限制允許
+            await asyncio.sleep(self.interval)
+            while (delay := self.bucket.wait_time()) > 0:
+                await asyncio.sleep(delay)
+            self._wakeup.clear()
+
+            batch = list(self.pending)
+            self.pending.clear()
+            if not batch:
+                continue
+            self.bucket.take()
+            self.counters["merged"] += len(batch) - 1
+            try:
+                await self.send(batch, self.stats())
+                self.counters["sent"] += 1
+            except Exception as e:
+                self.counters["failed"] += len(batch)
+                logging.error(f"通知摘要發送失敗 ({len(batch)} 則): {e}")
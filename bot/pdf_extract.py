@@ -0,0 +1,142 @@
+import os
+import time
+import queue
+import logging
+import tempfile
+import multiprocessing
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pypdf import PdfReader, PdfWriter
+
+# 每頁 OCR 最長秒數，超過就放棄這一頁
+OCR_PAGE_TIMEOUT = float(os.getenv("OCR_PAGE_TIMEOUT", "120"))
+# OCR 平行處理的行程數 (預設保留一個核心給機器人，至少 1 個；逐頁逾時需要子行程)
+OCR_WORKERS = max(1, int(os.getenv("OCR_WORKERS", str((os.cpu_count() or 2) - 1))))
+# tesseract 語言包
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "chi_tra+eng").split("+")
+
+
+def _ocr_page(pdf_path: str, page_index: int) -> str:
+    """(子行程) 以 unstructured 的 ocr_only 策略 (本機 tesseract) 辨識單一頁面"""
+    from unstructured.partition.pdf import partition_pdf
+
+    # 只把這一頁另存成暫存 PDF，避免每個行程都處理整份文件
+    writer = PdfWriter()
+    writer.add_page(PdfReader(pdf_path).pages[page_index])
+    fd, page_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer.write(f)
+        # ocr_only 不需下載版面分析模型，可完全離線在 CPU 上執行
+        elements = partition_pdf(filename=page_path, strategy="ocr_only", languages=OCR_LANGUAGES)
+        return "\n".join(element.text for element in elements if element.text)
+    finally:
+        os.remove(page_path)
+
+
+def _ocr_pages(pdf_path: str, page_indexes: List[int], texts: List[str], stats: List[Dict],
+               on_page_done: Callable[[], None]):
+    """以行程池平行 OCR 多個頁面，每頁各自計時"""
+    workers = min(OCR_WORKERS, len(page_indexes))
+    done = queue.Queue()
+    pending = list(page_indexes)
+    in_flight: Dict[int, float] = {}  # 頁面 -> 開始時間
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        # 同時送出的頁面數不超過行程數，送出時間就等於開始時間
+        capacity = workers
+        while pending or in_flight:
+            while pending and len(in_flight) < capacity:
+                index = pending.pop(0)
+                in_flight[index] = time.perf_counter()
+                pool.apply_async(
+                    _ocr_page, (pdf_path, index),
+                    callback=lambda result, index=index: done.put((index, result, None)),
+                    error_callback=lambda error, index=index: done.put((index, None, error)),
+                )
+
+            next_deadline = min(in_flight.values()) + OCR_PAGE_TIMEOUT
+            try:
+                index, result, error = done.get(timeout=max(0.0, next_deadline - time.perf_counter()))
+            except queue.Empty:
+                now = time.perf_counter()
+                for index, started in list(in_flight.items()):
+                    if now - started >= OCR_PAGE_TIMEOUT:
+                        del in_flight[index]
+                        stats[index] = {"page": index + 1, "method": "timeout", "seconds": round(now - started, 2)}
+                        # 逾時的行程還卡著，可用名額少一個
+                        capacity -= 1
+                        on_page_done()
+                if capacity <= 0:
+                    for index in pending:
+                        stats[index] = {"page": index + 1, "method": "skipped", "seconds": 0.0}
+                        on_page_done()
+                    pending.clear()
+                continue
+
+            if index not in in_flight:
+                continue  # 已判定逾時的頁面，結果丟棄
+            seconds = round(time.perf_counter() - in_flight.pop(index), 2)
+            if error is not None:
+                logging.error(f"   ❌ 第 {index + 1} 頁 OCR 失敗: {error}")
+                stats[index] = {"page": index + 1, "method": "failed", "seconds": seconds}
+            else:
+                texts[index] = result
+                stats[index] = {"page": index + 1, "method": "ocr" if result.strip() else "empty", "seconds": seconds}
+            on_page_done()
+    finally:
+        # 直接結束所有行程，連同逾時仍在執行的 OCR
+        pool.terminate()
+        pool.join()
+
+
+def extract_pages(pdf_path: str, progress: Optional[Callable[[str, int, int], None]] = None) -> Tuple[List[str], List[Dict]]:
+    """逐頁擷取文字：先用 pypdf，沒有文字層的頁面再交給 OCR
+
+    progress: 每完成一頁呼叫 progress("extract", 已完成頁數, 總頁數)
+    回傳 (每頁文字, 每頁的處理方式與耗時)
+    """
+    reader = PdfReader(pdf_path)
+    total = len(reader.pages)
+    done = 0
+
+    def on_page_done():
+        nonlocal done
+        done += 1
+        if progress:
+            progress("extract", done, total)
+
+    texts: List[str] = []
+    stats: List[Dict] = []
+    missing: List[int] = []
+
+    for index, page in enumerate(reader.pages):
+        started = time.perf_counter()
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:
+            logging.warning(f"   ⚠️ 第 {index + 1} 頁 pypdf 擷取失敗: {e}")
+            text = ""
+        texts.append(text)
+        stats.append({"page": index + 1, "method": "pypdf", "seconds": round(time.perf_counter() - started, 3)})
+        if not text.strip():
+            missing.append(index)
+        else:
+            on_page_done()
+
+    if missing:
+        logging.info(f"   🔍 {len(missing)} 頁沒有文字層，改用 OCR ({min(OCR_WORKERS, len(missing))} 個行程)")
+        _ocr_pages(pdf_path, missing, texts, stats, on_page_done)
+
+    return texts, stats
+
+
+def summarize_page_stats(stats: List[Dict]) -> str:
+    """彙整每頁處理方式，例如「pypdf 12 頁 (共 0.3 秒)、ocr 3 頁 (共 18.2 秒)」"""
+    counts = Counter(stat["method"] for stat in stats)
+    seconds = Counter()
+    for stat in stats:
+        seconds[stat["method"]] += stat["seconds"]
+    return "、".join(f"{method} {count} 頁 (共 {seconds[method]:.1f} 秒)" for method, count in counts.most_common())
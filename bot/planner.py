@@ -0,0 +1,94 @@
+import heapq
+import math
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from estimator import forecast_minutes
+
+# ==================== 讀書計畫 ====================
+# 最早截止優先 (EDF)：每天依序從「截止日最早、把握度最低」的工作開始填滿可用時間，
+# 一個工作可以拆到好幾天。EDF 在可拆分的情況下只要排得完就一定排得完，
+# 排不完的就是真的超量，會標記出來。整體 O(n log n + 天數)。
+
+# 已經計時過但還沒完成的任務，至少保留預估的這個比例
+MIN_REMAINING_RATIO = 0.1
+
+
+def build_items(user_data: Dict, today: date, horizon_days: int) -> List[Dict]:
+    """把未完成的任務與期間內到期的複習卡片轉成排程項目"""
+    horizon = today + timedelta(days=horizon_days - 1)
+    items = []
+    for task in user_data.get("tasks", []):
+        if task.get("completed"):
+            continue
+        deadline = datetime.fromisoformat(task["deadline"]).date() if task.get("deadline") else horizon
+        forecast = forecast_minutes(user_data, task)
+        spent = task.get("actual_time") or 0
+        detail = task.get("pages") or task.get("range", "")
+        items.append({
+            "label": f"#{task['id']} {task['subject']} {task['type']} {detail}".strip(),
+            "minutes": max(forecast - spent, forecast * MIN_REMAINING_RATIO),
+            "deadline": deadline,
+            "confidence": task.get("confidence", 10),
+        })
+    for card in user_data.get("cards", {}).values():
+        due = date.fromisoformat(card["due"])
+        if due > horizon:
+            continue
+        items.append({
+            "label": f"🃏{card['id']} {card['subject']} {card['range']}",
+            "minutes": card["estimated_time"],
+            # 複習卡片到期當天完成即可，逾期的排在今天
+            "deadline": max(due, today),
+            "confidence": card["confidence"],
+        })
+    return items
+
+
+def plan(items: List[Dict], daily_minutes: int, start: date, days: int) -> Dict:
+    """把項目排進每天的可用時間
+
+    回傳 {"days": [(日期, [(項目, 分鐘)])], "late": [(項目, 來不及的分鐘)], "unscheduled": [項目]}
+    """
+    # 逾期的項目也從今天開始排，但一定會被標記為來不及
+    queue = [
+        (item["deadline"], item["confidence"], index, item["minutes"])
+        for index, item in enumerate(items) if item["minutes"] > 0
+    ]
+    heapq.heapify(queue)
+
+    schedule, late = [], []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        capacity = daily_minutes
+        slots = []
+        while queue and capacity > 0:
+            deadline, confidence, index, remaining = queue[0]
+            minutes = min(remaining, capacity)
+            slots.append((items[index], minutes))
+            capacity -= minutes
+            if remaining - minutes > 1e-9:
+                heapq.heapreplace(queue, (deadline, confidence, index, remaining - minutes))
+            else:
+                heapq.heappop(queue)
+                if day > deadline:
+                    late.append((items[index], minutes))
+        schedule.append((day, slots))
+
+        # 今天結束時還沒排完、且今天就是截止日 (或已逾期) 的項目：來不及了
+        while queue and queue[0][0] <= day:
+            _, _, index, remaining = heapq.heappop(queue)
+            late.append((items[index], remaining))
+
+    unscheduled = [items[index] for _, _, index, _ in sorted(queue)]
+    return {"days": schedule, "late": late, "unscheduled": unscheduled}
+
+
+def needed_daily_minutes(items: List[Dict], start: date) -> int:
+    """讓所有項目都在截止前完成，每天至少需要的分鐘數 (依截止日累積需求計算)"""
+    needed, total = 0.0, 0.0
+    for item in sorted(items, key=lambda item: item["deadline"]):
+        total += item["minutes"]
+        days = max(1, (item["deadline"] - start).days + 1)
+        needed = max(needed, total / days)
+    return math.ceil(needed)
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+from scheduler import DeadlineScheduler
+
+POMODORO_FILE = "pomodoro_sessions.json"
+
+# 機器人離線太久，到期時間已經過了這麼多秒，就從現在重新計時，而不是沿用舊的時間表
+RESUME_GRACE_SECONDS = 60
+
+FOCUS = "focus"
+BREAK = "break"
+LONG_BREAK = "long_break"
+FINISHED = "finished"
+
+# 階段切換通知：(session, 上一個階段)
+PhaseCallback = Callable[[Dict, str], Awaitable[None]]
+
+
+def new_session(user_id: int, guild_id: Optional[int], channel_id: int, voice_channel_id: Optional[int],
+                cycles: int = 1, focus_minutes: int = 25, break_minutes: int = 5,
+                long_break_minutes: int = 15, long_break_every: int = 4) -> Dict:
+    """建立番茄鐘紀錄 (只有資料，沒有任何常駐的 coroutine)
+
+    伺服器中的番茄鐘是整個伺服器共用的讀書房，members 為目前參加的使用者
+    """
+    return {
+        "user_id": user_id,
+        "members": [user_id],
+        "guild_id": guild_id,
+        "channel_id": channel_id,
+        "voice_channel_id": voice_channel_id,
+        "cycles": cycles,
+        "focus_minutes": focus_minutes,
+        "break_minutes": break_minutes,
+        "long_break_minutes": long_break_minutes,
+        "long_break_every": long_break_every,
+        "cycle": 1,
+        "phase": FOCUS,
+        "phase_started_at": None,
+        "phase_ends_at": None,
+    }
+
+
+def phase_minutes(session: Dict, phase: str) -> int:
+    return {
+        FOCUS: session["focus_minutes"],
+        BREAK: session["break_minutes"],
+        LONG_BREAK: session["long_break_minutes"],
+    }[phase]
+
+
+def next_phase(session: Dict) -> str:
+    """專注後休息 (每 long_break_every 輪長休息)，休息後進入下一輪專注或結束"""
+    if session["phase"] == FOCUS:
+        if session["long_break_every"] and session["cycle"] % session["long_break_every"] == 0:
+            return LONG_BREAK
+        return BREAK
+    if session["cycle"] >= session["cycles"]:
+        return FINISHED
+    return FOCUS
+
+
+def room_key(guild_id: Optional[int], user_id: int) -> str:
+    """伺服器內一個讀書房；私訊中每位使用者各自一個"""
+    return str(guild_id) if guild_id else f"dm-{user_id}"
+
+
+class PomodoroManager:
+    """所有番茄鐘共用一個排程迴圈，狀態寫入 JSON，重新啟動後可接續"""
+
+    def __init__(self, on_phase_change: PhaseCallback, path: str = POMODORO_FILE):
+        self.on_phase_change = on_phase_change
+        self.path = path
+        self.sessions: Dict[Hashable, Dict] = {}
+        self.scheduler = DeadlineScheduler(self._on_due)
+
+    @staticmethod
+    def key_of(session: Dict) -> Hashable:
+        return room_key(session["guild_id"], session["user_id"])
+
+    def __contains__(self, key: Hashable):
+        return key in self.sessions
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        return self.sessions.get(key)
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self.sessions.values()), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _enter_phase(self, session: Dict, phase: str, started_at: float):
+        session["phase"] = phase
+        session["phase_started_at"] = started_at
+        session["phase_ends_at"] = started_at + phase_minutes(session, phase) * 60
+        self.scheduler.schedule(self.key_of(session), session["phase_ends_at"])
+
+    def start(self, session: Dict) -> Dict:
+        """開始 (或重新開始) 番茄鐘"""
+        self._enter_phase(session, FOCUS, time.time())
+        self.sessions[self.key_of(session)] = session
+        self._save()
+        return session
+
+    def join(self, key: Hashable, user_id: int) -> Optional[Dict]:
+        """加入進行中的讀書房"""
+        session = self.sessions.get(key)
+        if session is not None and user_id not in session["members"]:
+            session["members"].append(user_id)
+            self._save()
+        return session
+
+    def leave(self, key: Hashable, user_id: int) -> Optional[Dict]:
+        """離開讀書房，最後一個人離開時整個番茄鐘結束；回傳離開後的紀錄"""
+        session = self.sessions.get(key)
+        if session is None or user_id not in session["members"]:
+            return None
+        session["members"].remove(user_id)
+        if not session["members"]:
+            return self.stop(key)
+        self._save()
+        return session
+
+    def stop(self, key: Hashable) -> Optional[Dict]:
+        session = self.sessions.pop(key, None)
+        if session is not None:
+            self.scheduler.cancel(key)
+            self._save()
+        return session
+
+    def restore(self) -> list:
+        """讀回上次執行中的番茄鐘並重新排程，回傳所有紀錄"""
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                sessions = json.load(f)
+        except Exception as e:
+            logging.error(f"讀取番茄鐘紀錄失敗: {e}")
+            return []
+        for session in sessions:
+            key = self.key_of(session)
+            self.sessions[key] = session
+            # 已經過期的會立刻觸發，由 _on_due 接續下一個階段
+            self.scheduler.schedule(key, session["phase_ends_at"])
+        logging.info(f"🍅 已恢復 {len(self.sessions)} 個番茄鐘")
+        return list(self.sessions.values())
+
+    async def _on_due(self, due):
+        now = time.time()
+        for key, _ in due:
+            session = self.sessions.get(key)
+            if session is None:
+                continue
+            previous = session["phase"]
+            phase = next_phase(session)
+            if phase == FINISHED:
+                del self.sessions[key]
+                session["phase"] = FINISHED
+            else:
+                if previous != FOCUS:
+                    session["cycle"] += 1
+                # 正常情況下緊接著上一階段，離線太久則從現在開始
+                started_at = session["phase_ends_at"]
+                if now - started_at > RESUME_GRACE_SECONDS:
+                    started_at = now
+                self._enter_phase(session, phase, started_at)
+            try:
+                await self.on_phase_change(session, previous)
+            except Exception as e:
+                logging.error(f"番茄鐘通知失敗: {e}")
+        self._save()
+
+    async def run(self):
+        await self.scheduler.run()
@@ -0,0 +1,90 @@
+import os
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from scheduler import DeadlineScheduler
+
+# 截止前多久提醒 (小時)
+REMIND_BEFORE_HOURS = float(os.getenv("REMIND_BEFORE_HOURS", "24"))
+
+# 送出提醒：(使用者 ID, 到期的任務列表)
+SendReminders = Callable[[str, List[Dict]], Awaitable[None]]
+
+
+class ReminderService:
+    """任務截止提醒：把所有未完成任務的提醒時間放進 DeadlineScheduler
+
+    啟動時掃描一次任務資料，之後只靠新增 / 完成 / 刪除時的增量更新，
+    閒置時不會輪詢任何使用者。
+    """
+
+    def __init__(self, send: SendReminders, remind_before: timedelta = timedelta(hours=REMIND_BEFORE_HOURS),
+                 owns: Optional[Callable[[str], bool]] = None):
+        self.send = send
+        self.remind_before = remind_before
+        # 多個行程時只排程本行程負責的使用者，其他使用者交給負責的行程
+        self.owns = owns or (lambda user_id: True)
+        self.scheduler = DeadlineScheduler(self._on_due)
+        self._scheduled: Dict[str, Set[int]] = defaultdict(set)  # 使用者 -> 已排程的任務
+
+    def _remind_at(self, task: Dict) -> Optional[float]:
+        if task.get("completed") or task.get("reminded") or not task.get("deadline"):
+            return None
+        try:
+            deadline = datetime.fromisoformat(task["deadline"])
+        except ValueError:
+            return None
+        if deadline <= datetime.now():
+            return None  # 已經過期就不提醒了
+        return (deadline - self.remind_before).timestamp()
+
+    def load(self, data: Dict):
+        """從任務資料建立排程 (只在啟動時執行一次)"""
+        for user_id, user_data in data.items():
+            if not self.owns(user_id):
+                continue
+            for task in user_data.get("tasks", []):
+                self.add_task(user_id, task)
+        logging.info(f"⏰ 已排程 {len(self.scheduler)} 個截止提醒")
+
+    def add_task(self, user_id: str, task: Dict):
+        if not self.owns(user_id):
+            return
+        remind_at = self._remind_at(task)
+        if remind_at is not None:
+            self.scheduler.schedule((user_id, task["id"]), remind_at, dict(task))
+            self._scheduled[user_id].add(task["id"])
+
+    def remove_task(self, user_id: str, task_id: int):
+        self.scheduler.cancel((user_id, task_id))
+        self._scheduled[user_id].discard(task_id)
+
+    def sync_user(self, user_id: str, tasks: List[Dict]):
+        """其他行程改過這位使用者的任務：依最新資料重新排程"""
+        if not self.owns(user_id):
+            return
+        current = {task["id"] for task in tasks}
+        for task_id in self._scheduled[user_id] - current:
+            self.remove_task(user_id, task_id)
+        for task in tasks:
+            if self._remind_at(task) is None:
+                self.remove_task(user_id, task["id"])
+            else:
+                self.add_task(user_id, task)
+
+    async def _on_due(self, due):
+        # 同一位使用者同時到期的任務合併成一則私訊
+        by_user = defaultdict(list)
+        for (user_id, task_id), task in due:
+            by_user[user_id].append(task)
+            self._scheduled[user_id].discard(task_id)
+        for user_id, tasks in by_user.items():
+            try:
+                await self.send(user_id, tasks)
+            except Exception as e:
+                logging.error(f"提醒使用者 {user_id} 失敗: {e}")
+
+    async def run(self):
+        await self.scheduler.run()
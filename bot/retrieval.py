@@ -0,0 +1,72 @@
+import math
+import re
+import heapq
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+# 中日韓統一表意文字範圍
+_CJK = r"㐀-䶿一-鿿豈-﫿"
+_CJK_GAP = re.compile(rf"(?<=[{_CJK}])\s+(?=[{_CJK}])")
+_TOKEN_RUN = re.compile(rf"[A-Za-z0-9]+|[{_CJK}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """將文字切成檢索用詞彙 (中文用雙字詞，英數用單字)"""
+    # PDF 抽出的中文常是「環 滁 皆 山」，先把字與字之間的空白去掉
+    text = _CJK_GAP.sub("", text)
+    tokens = []
+    for run in _TOKEN_RUN.findall(text):
+        if run.isascii():
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    """以倒排索引實作的 BM25 檢索"""
+
+    def __init__(self, docs: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_len = array("I")
+        # { 詞彙: (文件編號陣列, 詞頻陣列) }
+        self.postings: Dict[str, Tuple[array, array]] = {}
+
+        for doc_id, doc in enumerate(docs):
+            counts = Counter(tokenize(doc))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array("I"), array("I"))
+                posting[0].append(doc_id)
+                posting[1].append(tf)
+
+        self.avg_len = (sum(self.doc_len) / len(self.doc_len)) if len(self.doc_len) else 0.0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[int, float]]:
+        """回傳分數最高的 k 筆 (文件編號, 分數)"""
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+
+        k1, b, avg_len, doc_len = self.k1, self.b, self.avg_len, self.doc_len
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, tfs = posting
+            idf = math.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            for doc_id, tf in zip(doc_ids, tfs):
+                norm = k1 * (1 - b + b * doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,40 @@
+import os
+import sys
+import argparse
+import subprocess
+
+from sharding import split_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以多個行程執行讀書機器人，每個行程負責一部分分片")
+    parser.add_argument("--shards", type=int, required=True, help="總分片數")
+    parser.add_argument("--processes", type=int, default=2, help="機器人行程數")
+    parser.add_argument("--user-db", default=os.getenv("USER_DB") or "study_data.sqlite3", help="共用的使用者資料庫")
+    args = parser.parse_args()
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "study.py")
+    processes = []
+    for index, shard_ids in enumerate(split_shards(args.shards, args.processes)):
+        env = dict(
+            os.environ,
+            SHARD_COUNT=str(args.shards),
+            SHARD_IDS=",".join(map(str, shard_ids)),
+            SHARD_PROCESSES=str(args.processes),
+            SHARD_PROCESS_INDEX=str(index),
+            USER_DB=args.user_db,
+        )
+        processes.append(subprocess.Popen([sys.executable, script], env=env))
+        print(f"🚀 行程 {index}: 分片 {shard_ids}")
+
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
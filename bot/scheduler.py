@@ -0,0 +1,98 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+DueCallback = Callable[[List[Tuple[Hashable, Any]]], Awaitable[None]]
+
+
+class DeadlineScheduler:
+    """以 heap 排程的計時器，只在最近的到期時間醒來一次
+
+    - schedule / cancel 為 O(log n)，取消採延遲刪除 (heap 裡的舊項目到期時略過)
+    - 沒有工作時完全不喚醒；同一時間到期的項目會合併成一批交給 on_due
+    """
+
+    def __init__(self, on_due: DueCallback, clock: Callable[[], float] = time.time):
+        self.on_due = on_due
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int, Any]] = {}  # key -> (到期時間, 序號, 資料)
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        return entry[2] if entry else None
+
+    def schedule(self, key: Hashable, when: float, payload: Any = None):
+        """排程 (同一個 key 再次排程會取代舊的)"""
+        seq = next(self._counter)
+        was_next = self._heap[0][0] if self._heap else None
+        self._entries[key] = (when, seq, payload)
+        heapq.heappush(self._heap, (when, seq, key))
+        # 比目前等待的時間更早才需要叫醒迴圈重新計算
+        if was_next is None or when < was_next:
+            self._wakeup.set()
+        self._compact()
+
+    def cancel(self, key: Hashable):
+        self._entries.pop(key, None)
+        self._compact()
+
+    def _compact(self):
+        # 過期項目太多時重建 heap，避免大量取消後佔用記憶體
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [(when, seq, key) for key, (when, seq, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> List[Tuple[Hashable, Any]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != seq:
+                continue  # 已取消或已被重新排程
+            del self._entries[key]
+            due.append((key, entry[2]))
+        return due
+
+    def _drop_stale_head(self):
+        while self._heap:
+            when, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == seq:
+                return
+            heapq.heappop(self._heap)
+
+    async def run(self):
+        """排程主迴圈"""
+        while True:
+            self._drop_stale_head()
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - self.clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue  # 有更早的項目加入，重新計算
+                except asyncio.TimeoutError:
+                    pass
+
+            due = self._pop_due(self.clock())
+            if due:
+                try:
+                    await self.on_due(due)
+                except Exception as e:
+                    logging.error(f"排程處理出錯: {e}")
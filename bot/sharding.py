@@ -0,0 +1,42 @@
+import os
+from typing import List, Optional
+
+# ==================== 分片設定 ====================
+# SHARD_COUNT=0 (預設) 時照舊使用單一 discord.Bot。
+# 設定 SHARD_COUNT 後改用 AutoShardedBot，可以只負責部分分片 (SHARD_IDS)，
+# 多個行程各跑一部分分片時由 run_shards.py 設定 SHARD_PROCESSES / SHARD_PROCESS_INDEX。
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+# 這個行程負責的分片 (逗號分隔)，空白 = 全部
+SHARD_IDS: Optional[List[int]] = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()] or None
+
+# 同時執行的機器人行程數與這個行程的編號
+PROCESS_COUNT = int(os.getenv("SHARD_PROCESSES", "1"))
+PROCESS_INDEX = int(os.getenv("SHARD_PROCESS_INDEX", "0"))
+
+# 主行程負責只能做一次的工作：掃描上傳資料夾、處理網頁上傳的結果
+IS_PRIMARY = PROCESS_INDEX == 0
+MULTI_PROCESS = PROCESS_COUNT > 1
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """Discord 分配伺服器到分片的公式 (私訊一律在分片 0)"""
+    return (guild_id >> 22) % shard_count
+
+
+def split_shards(shard_count: int, processes: int) -> List[List[int]]:
+    """把分片平均分給各行程"""
+    return [list(range(i, shard_count, processes)) for i in range(processes)]
+
+
+def owns_user(user_id) -> bool:
+    """截止提醒等私訊由哪個行程負責 (依使用者 ID 平均分配)"""
+    return not MULTI_PROCESS or int(user_id) % PROCESS_COUNT == PROCESS_INDEX
+
+
+def process_path(path: str) -> str:
+    """多行程時每個行程各自一份的檔案 (例如番茄鐘紀錄)"""
+    if not MULTI_PROCESS:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}.{PROCESS_INDEX}{ext}"
@@ -0,0 +1,117 @@
+from bisect import bisect_right, insort
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+# ==================== 間隔複習 (SM-2) ====================
+# 每個複習項目只存一張卡片 (user_data["cards"])，下一次複習日依每次複習的結果計算，
+# 不再一次建立六個固定間隔的任務。
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def confidence_to_quality(confidence: int) -> int:
+    """把握度 1-10 轉成 SM-2 的回想品質 0-5 (3 以上算記得)"""
+    return max(0, min(5, round(confidence / 2)))
+
+
+def new_card(card_id: int, subject: str, range_text: str, confidence: int,
+             estimated_time: int, today: Optional[date] = None) -> Dict:
+    """建立卡片：今天先學一次，把握度越低，之後的間隔成長越慢"""
+    today = today or date.today()
+    return {
+        "id": card_id,
+        "subject": subject,
+        "range": range_text,
+        "confidence": confidence,
+        "estimated_time": estimated_time,
+        "ease": round(INITIAL_EASE - (10 - confidence) * 0.05, 2),
+        "interval": 0,
+        "repetitions": 0,
+        "lapses": 0,
+        "due": today.isoformat(),
+        "last_reviewed": None,
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+def review(card: Dict, confidence: int, today: Optional[date] = None) -> Dict:
+    """依這次複習的把握度更新卡片 (SM-2)，回傳卡片"""
+    today = today or date.today()
+    quality = confidence_to_quality(confidence)
+
+    if quality < 3:
+        # 忘了：從頭開始，明天再複習
+        card["repetitions"] = 0
+        card["interval"] = 1
+        card["lapses"] += 1
+    else:
+        if card["repetitions"] == 0:
+            card["interval"] = 1
+        elif card["repetitions"] == 1:
+            card["interval"] = 6
+        else:
+            card["interval"] = round(card["interval"] * card["ease"])
+        card["repetitions"] += 1
+
+    card["ease"] = round(max(MIN_EASE, card["ease"] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)), 2)
+    card["confidence"] = confidence
+    card["last_reviewed"] = today.isoformat()
+    card["due"] = (today + timedelta(days=card["interval"])).isoformat()
+    return card
+
+
+class DueIndex:
+    """每位使用者依到期日排序的卡片索引，查今天該複習的卡片不必掃描全部卡片"""
+
+    def __init__(self):
+        self._dates: Dict[str, List[str]] = defaultdict(list)                       # user -> 排序的到期日
+        self._cards: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))  # user -> 到期日 -> 卡片
+        self._due_of: Dict[tuple, str] = {}                                          # (user, 卡片) -> 到期日
+
+    def load(self, data: Dict):
+        """啟動時從資料建立索引"""
+        for user_id, user_data in data.items():
+            for card in user_data.get("cards", {}).values():
+                self.add(user_id, card)
+
+    def add(self, user_id: str, card: Dict):
+        """新增或更新卡片的到期日"""
+        self.remove(user_id, card["id"])
+        due = card["due"]
+        cards = self._cards[user_id]
+        if due not in cards:
+            insort(self._dates[user_id], due)
+        cards[due].add(card["id"])
+        self._due_of[(user_id, card["id"])] = due
+
+    def remove(self, user_id: str, card_id: int):
+        due = self._due_of.pop((user_id, card_id), None)
+        if due is None:
+            return
+        cards = self._cards[user_id]
+        cards[due].discard(card_id)
+        if not cards[due]:
+            del cards[due]
+            dates = self._dates[user_id]
+            dates.pop(bisect_right(dates, due) - 1)
+
+    def reset_user(self, user_id: str, cards):
+        """以最新資料重建某位使用者的索引 (其他行程改過卡片時)"""
+        for ids in list(self._cards[user_id].values()):
+            for card_id in list(ids):
+                self.remove(user_id, card_id)
+        for card in cards:
+            self.add(user_id, card)
+
+    def due(self, user_id: str, today: Optional[date] = None) -> List[int]:
+        """今天 (含之前逾期) 要複習的卡片，越早到期的越前面"""
+        today = (today or date.today()).isoformat()
+        dates = self._dates.get(user_id, [])
+        cards = self._cards[user_id]
+        return [card_id for due in dates[:bisect_right(dates, today)] for card_id in sorted(cards[due])]
+
+    def on(self, user_id: str, day: date) -> List[int]:
+        """指定日期到期的卡片"""
+        return sorted(self._cards[user_id].get(day.isoformat(), ()))
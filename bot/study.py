@@ -3,36 +3,51 @@ import asyncio
 import logging
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 import calendar
 import time
-from pypdf import PdfReader
+import sys
+import atexit
+import subprocess
 import discord
 from discord import Option
 from dotenv import load_dotenv
-from openai import OpenAI 
-from pydantic import BaseModel
 from collections import defaultdict, deque
-import random
-
-
-# ====== Structured Output 模型 ======
-class QuizQuestion(BaseModel):
-    question: str
-    option_a: str
-    option_b: str
-    option_c: str
-    option_d: str
-    correct_answer: str  # "A", "B", "C", or "D"
-    explanation: str
+from retrieval import BM25Index
+from knowledge_store import ChunkStore, content_hash
+from knowledge_watcher import KnowledgeWatcher
+from ingest import EMBEDDINGS_ENABLED, get_embedder
+from job_queue import JobQueue
+from jobs import PRIORITY_INGEST, PRIORITY_PERSONALITY, PRIORITY_QUIZ
+from reminders import ReminderService
+from estimator import forecast_minutes, observe, suggest
+from srs import DueIndex, confidence_to_quality, new_card, review as review_card
+from mastery import MasteryTracker
+from planner import build_items, needed_daily_minutes, plan
+from analytics import completion_rate, ensure_stats, estimate_ratio, get_day, get_week, record_added, record_completed, record_timer
+from voice import PlaybackManager
+from audio_cache import OpusLoop, SoundUnavailable, load_sound
+from notifications import NOTIFY_INTERVAL, NotificationBatcher
+from pomodoro import BREAK, FINISHED, FOCUS, LONG_BREAK, POMODORO_FILE, PomodoroManager, new_session, phase_minutes, room_key
+from sharding import IS_PRIMARY, MULTI_PROCESS, PROCESS_INDEX, SHARD_COUNT, SHARD_IDS, owns_user, process_path
+from user_store import USER_DB, UserStore
+from intents import bot_options
+from metrics import METRICS_HOST, METRICS_PORT, metrics, serve as serve_metrics
+
+if TYPE_CHECKING:
+    from llm import QuizQuestion
 
 
 # ====== 答題按鈕 View ======
 class QuizView(discord.ui.View):
-    def __init__(self, quiz: QuizQuestion, user_id: int):
+    def __init__(self, quiz: "QuizQuestion", user_id: int, subject: str = "", chunk_id: Optional[str] = None, question_id: str = ""):
         super().__init__(timeout=120)
         self.quiz = quiz
         self.user_id = user_id
+        self.subject = subject
+        self.chunk_id = chunk_id
+        self.question_id = question_id
+        self.shown_at = time.monotonic()
         self.answered = False
 
     async def handle_answer(self, interaction: discord.Interaction, selected: str):
@@ -48,6 +63,14 @@ class QuizView(discord.ui.View):
             child.disabled = True
         
         correct = self.quiz.correct_answer.upper()
+        # 記錄作答結果，之後出題會偏向答錯的片段
+        try:
+            await asyncio.to_thread(
+                mastery_tracker.record, str(self.user_id), self.subject, self.chunk_id, self.question_id,
+                selected == correct, time.monotonic() - self.shown_at, selected,
+            )
+        except Exception as e:
+            logging.error(f"記錄作答失敗: {e}")
         if selected == correct:
             result = f"✅ **正確！** 答案是 **{correct}**\n\n📖 **解析：**\n{self.quiz.explanation}"
         else:
@@ -72,19 +95,149 @@ class QuizView(discord.ui.View):
     async def button_d(self, button: discord.ui.Button, interaction: discord.Interaction):
         await self.handle_answer(interaction, "D")
 
+# 每頁顯示幾項
+PAGE_SIZE = 10
+FILTER_ALL = "__all__"
+
+class Paginator(discord.ui.View):
+    """分頁列表：建立時先把每種篩選組合的索引建好，之後翻頁或切換篩選只渲染一頁"""
+
+    def __init__(self, user_id: int, title: str, items: List, format_item, color=None,
+                 description: Optional[str] = None, fields=(), filters: Optional[Dict] = None, footer: str = ""):
+        super().__init__(timeout=300)
+        self.user_id = user_id
+        self.title = title
+        self.items = items
+        self.format_item = format_item
+        self.color = color or discord.Color.blue()
+        self.description = description
+        self.fields = list(fields)  # 每一頁都顯示的固定欄位 [(名稱, 內容)]
+        self.footer = footer
+        self.page = 0
+
+        # filters: {篩選名稱: (取值函式, 選單提示)}；索引 key 為各篩選的值，None 代表全部
+        self.filters = filters or {}
+        self.selected = {name: None for name in self.filters}
+        self.filter_values = {name: {} for name in self.filters}  # 選單的字串值 -> 原本的值
+        self.index = defaultdict(list)
+        getters = [getter for getter, _ in self.filters.values()]
+        for position, item in enumerate(items):
+            values = [getter(item) for getter in getters]
+            for mask in range(1 << len(values)):
+                key = tuple(value if mask >> i & 1 else None for i, value in enumerate(values))
+                self.index[key].append(position)
+
+        for row, (name, (getter, placeholder)) in enumerate(self.filters.items()):
+            counts = defaultdict(int)
+            for item in items:
+                counts[getter(item)] += 1
+            self.filter_values[name] = {str(value): value for value in counts}
+            # 下拉選單最多 25 個選項
+            choices = sorted(counts, key=lambda value: -counts[value])[:24]
+            select = discord.ui.Select(
+                placeholder=placeholder,
+                options=[discord.SelectOption(label=f"全部 ({len(items)})", value=FILTER_ALL)] + [
+                    discord.SelectOption(label=f"{value} ({counts[value]})", value=str(value)) for value in choices
+                ],
+                row=row,
+            )
+            select.callback = self._make_filter_callback(name, select)
+            self.add_item(select)
+        self.update_buttons()
+
+    @property
+    def needs_view(self) -> bool:
+        return bool(self.filters) or len(self.items) > PAGE_SIZE
+
+    def current(self) -> List[int]:
+        return self.index[tuple(self.selected.values())] if self.filters else range(len(self.items))
+
+    def page_count(self) -> int:
+        return max(1, -(-len(self.current()) // PAGE_SIZE))
+
+    def render(self) -> discord.Embed:
+        current = self.current()
+        start = self.page * PAGE_SIZE
+        lines = [self.format_item(self.items[position]) for position in current[start:start + PAGE_SIZE]]
+
+        embed = discord.Embed(title=self.title, description=self.description, color=self.color)
+        for name, value in self.fields:
+            embed.add_field(name=name, value=value, inline=False)
+        active = [str(value) for value in self.selected.values() if value is not None]
+        embed.add_field(
+            name=f"📋 列表 ({len(current)}項{'，篩選: ' + '、'.join(active) if active else ''})",
+            value="\n".join(lines)[:1024] if lines else "沒有符合條件的項目",
+            inline=False
+        )
+        footer = f"第 {self.page + 1}/{self.page_count()} 頁"
+        embed.set_footer(text=f"{footer} · {self.footer}" if self.footer else footer)
+        return embed
+
+    def update_buttons(self):
+        self.prev_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count() - 1
+
+    async def refresh(self, interaction: discord.Interaction):
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    def _make_filter_callback(self, name, select):
+        async def callback(interaction: discord.Interaction):
+            value = select.values[0]
+            self.selected[name] = None if value == FILTER_ALL else self.filter_values[name].get(value, value)
+            self.page = 0
+            await self.refresh(interaction)
+        return callback
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("❌ 這不是你的列表！", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀ 上一頁", style=discord.ButtonStyle.secondary, row=4)
+    async def prev_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page = max(0, self.page - 1)
+        await self.refresh(interaction)
+
+    @discord.ui.button(label="下一頁 ▶", style=discord.ButtonStyle.secondary, row=4)
+    async def next_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page = min(self.page_count() - 1, self.page + 1)
+        await self.refresh(interaction)
+
+def format_task_line(task):
+    """任務列表的一行"""
+    status = "✅" if task.get("completed") else "⏳"
+    if task["type"] == "作業":
+        detail = f"({task['pages']})"
+    else:
+        confidence_emoji = "🔴" if task['confidence'] <= 3 else "🟡" if task['confidence'] <= 6 else "🟢"
+        detail = f"({task['range']}) {confidence_emoji}{task['confidence']}"
+    deadline = datetime.fromisoformat(task["deadline"]).strftime("%m/%d") if task.get("deadline") else "-"
+    return f"{status} #{task['id']} {task['type']} {task['subject']} {detail} - {task['estimated_time']}分鐘 截止:{deadline}"
+
+# 任務列表的篩選：科目、類型、狀態
+TASK_FILTERS = {
+    "subject": (lambda task: task["subject"], "篩選科目"),
+    "type": (lambda task: task["type"], "篩選類型"),
+    "status": (lambda task: "已完成" if task.get("completed") else "未完成", "篩選狀態"),
+}
+
 # 設定日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 SOUND_FILE_PATH = os.getenv("SOUND_FILE_PATH", "omg.mp3")
-
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
-    max_retries=0,
-)
+# 題庫資料夾輪詢間隔 (秒)，設為 0 則停用自動更新
+KNOWLEDGE_WATCH_INTERVAL = float(os.getenv("KNOWLEDGE_WATCH_INTERVAL", "5"))
+# 工作佇列輪詢間隔 (秒)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# 機器人啟動時一併啟動的背景 worker 數 (設為 0 則需自行執行 bot/worker.py)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "2"))
+# 多行程時，多久同步一次其他行程改過的使用者資料 (秒)
+STATE_SYNC_INTERVAL = float(os.getenv("STATE_SYNC_INTERVAL", "5"))
 
 SYSTEM_PROMPT = """你是一個專業的讀書計畫助手。
 請用繁體中文回答,語氣友善且專業。
@@ -118,28 +271,52 @@ CHAT_SYSTEM_PROMPT = """你是一位溫暖、善解人意的心靈導師和學
 # 設定通知頻道 ID
 NOTIFICATION_CHANNEL_ID = 1468954162057187393
 
-bot = discord.Bot(intents=discord.Intents.all())
+if SHARD_COUNT:
+    bot = discord.AutoShardedBot(shard_count=SHARD_COUNT, shard_ids=SHARD_IDS, **bot_options("study"))
+else:
+    bot = discord.Bot(**bot_options("study"))
 
 # 資料儲存
 DATA_FILE = "study_data.json"
 
+# 設定 USER_DB 時改用 SQLite，多個行程可以共用 (第一次啟動時自動搬移 DATA_FILE)
+if MULTI_PROCESS and not USER_DB:
+    raise RuntimeError("多個機器人行程必須設定 USER_DB 共用使用者資料")
+user_store = UserStore(USER_DB, DATA_FILE) if USER_DB else None
+
+# 多行程時背景工作的結果送回發出指令的行程
+JOB_OWNER = PROCESS_INDEX if MULTI_PROCESS else None
+
+@metrics.timed("load_data")
 def load_data() -> Dict:
     """載入資料"""
+    if user_store:
+        return user_store.load_all()
     if os.path.exists(DATA_FILE):
         with open(DATA_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     return {}
 
+@metrics.timed("save_data")
 def save_data(data: Dict):
     """儲存資料"""
+    if user_store:
+        user_store.save_all(data)
+        return
     with open(DATA_FILE, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
+@metrics.timed("llm_chat")
+def chat_completion(**kwargs):
+    """(在執行緒中執行) llm 模組與 OpenAI SDK 在第一次呼叫時才載入，不拖慢機器人啟動"""
+    from llm import get_client
+    return get_client().chat.completions.create(**kwargs)
+
 async def generate_reply(prompt: str) -> str:
     """使用 AI 生成回覆"""
     try:
         response = await asyncio.to_thread(
-            client.chat.completions.create,
+            chat_completion,
             model="deepseek/deepseek-r1-0528:free",
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
@@ -163,7 +340,7 @@ async def generate_chat_reply(messages: List[Dict], personality: str = "") -> st
         full_messages = [{"role": "system", "content": system_prompt}] + messages
         
         response = await asyncio.to_thread(
-            client.chat.completions.create,
+            chat_completion,
             model="deepseek/deepseek-r1-0528:free",
             messages=full_messages,
             temperature=0.8,  # 增加一些創意和溫暖感
@@ -173,38 +350,6 @@ async def generate_chat_reply(messages: List[Dict], personality: str = "") -> st
         logging.error(f"談心 AI 生成錯誤: {e}")
         return "抱歉，我現在有點累了...但我隨時都在這裡陪你。要不要待會再聊？💙"
 
-async def analyze_personality(chat_history: List[Dict]) -> str:
-    """分析使用者個性"""
-    if len(chat_history) < 6:  # 至少3次對話（6條訊息）才開始分析
-        return ""
-    
-    try:
-        # 取最近10次對話
-        recent_messages = chat_history[-20:]
-        
-        analysis_prompt = """基於以下對話歷史，請分析這位學生的個性特質。
-
-請以2-3句話描述：
-1. 他們的情緒狀態傾向（焦慮/樂觀/平穩等）
-2. 他們的表達風格（直接/含蓄/幽默等）
-3. 他們最需要的支持類型（鼓勵/實際建議/陪伴等）
-
-對話歷史：
-""" + "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent_messages])
-        
-        response = await asyncio.to_thread(
-            client.chat.completions.create,
-            model="deepseek/deepseek-r1-0528:free",
-            messages=[
-                {"role": "system", "content": "你是一位專業的心理分析師，擅長透過對話理解學生的個性。"},
-                {"role": "user", "content": analysis_prompt}
-            ],
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        logging.error(f"個性分析錯誤: {e}")
-        return ""
-
 def get_user_data(user_id: str) -> Dict:
     """獲取使用者資料"""
     data = load_data()
@@ -216,8 +361,19 @@ def get_user_data(user_id: str) -> Dict:
             "personality_profile": ""  # 個性分析
         }
         save_data(data)
+    # 舊資料第一次讀取時補建統計彙總並馬上存檔，唯讀的指令 (/統計、/讀書計畫) 之後不必每次重算
+    if "stats" not in data[user_id]:
+        ensure_stats(data[user_id])
+        save_data(data)
     return data[user_id]
 
+def next_task_id(user_data: Dict) -> int:
+    """配發任務編號：只增不減，刪除任務後編號也不會被重複使用 (提醒以 (使用者, 編號) 記錄)"""
+    # 舊資料沒有計數器時從現有最大編號接著配發
+    task_id = user_data.get("next_task_id") or max((t["id"] for t in user_data["tasks"]), default=0) + 1
+    user_data["next_task_id"] = task_id + 1
+    return task_id
+
 def format_time_duration(seconds: int) -> str:
     """格式化時間長度"""
     hours = seconds // 3600
@@ -231,99 +387,29 @@ def format_time_duration(seconds: int) -> str:
     else:
         return f"{secs} 秒"
 
-# ==================== PDF 處理相關 ====================
-
-SOURCE_ROOT = "upload"      # 主資料夾
-OUTPUT_ROOT = "json_knowledge" # 輸出的 JSON 要放哪裡
-
-def extract_text(pdf_path):
-    text = ""
-    try:
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            t = page.extract_text()
-            if t: text += t + "\n"
-        return text
-    except Exception as e:
-        logging.error(f"❌ 讀取失敗 {pdf_path}: {e}")
-        return ""
-
-def process_category(category_name, folder_path):
-    """處理單一分類資料夾"""
-    json_filename = os.path.join(OUTPUT_ROOT, f"{category_name}.json")
-    knowledge_base = []
-    
-    # 檢查是否已有舊檔 (斷點續傳)
-    if os.path.exists(json_filename):
-        try:
-            with open(json_filename, 'r', encoding='utf-8') as f:
-                knowledge_base = json.load(f)
-        except: pass
-    
-    existing_files = {item['source'] for item in knowledge_base}
-    
-    files = [f for f in os.listdir(folder_path) if f.lower().endswith('.pdf')]
-    logging.info(f"📂 分類 [{category_name}] 發現 {len(files)} 個 PDF")
-
-    updated = False
-    for filename in files:
-        if filename in existing_files:
-            continue
-            
-        logging.info(f"   🚀 正在處理: {filename}...")
-        text = extract_text(os.path.join(folder_path, filename))
-        
-        if text.strip():
-            # 切分文字 (Chunking)
-            chunk_size = 1000
-            for i in range(0, len(text), chunk_size):
-                chunk = text[i:i+chunk_size]
-                if len(chunk) > 50:
-                    knowledge_base.append({
-                        "category": category_name, # 標記分類
-                        "source": filename,
-                        "content": chunk
-                    })
-            updated = True
-    
-    # 如果有新資料才存檔
-    if updated:
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(knowledge_base, f, ensure_ascii=False, indent=2)
-        logging.info(f"   💾 [{category_name}] 已存檔！")
-    else:
-        logging.info(f"   ⏸️ [{category_name}] 無新增資料。")
-
-def process_pdfs():
-    """處理所有 PDF 檔案"""
-    if not os.path.exists(OUTPUT_ROOT):
-        os.makedirs(OUTPUT_ROOT)
-
-    # 掃描 source_root 下的所有子資料夾
-    if not os.path.exists(SOURCE_ROOT):
-        logging.error(f"找不到 {SOURCE_ROOT} 資料夾")
-        return
-
-    subfolders = [f for f in os.listdir(SOURCE_ROOT) if os.path.isdir(os.path.join(SOURCE_ROOT, f))]
-    
-    logging.info(f"🔍 發現分類: {subfolders}")
-
-    for folder in subfolders:
-        folder_path = os.path.join(SOURCE_ROOT, folder)
-        process_category(folder, folder_path)
-
 # ==================== 題庫相關 ====================
 
 # 設定 JSON 資料夾路徑
 JSON_FOLDER = "json_knowledge"
 
-# 快取所有題庫 { "歷史": [...資料...], "理化": [...資料...] }
+# 快取所有題庫 { "歷史": ChunkStore, "理化": ChunkStore }
+# 只載入片段索引，內容以 mmap 按需讀取
+# 更新時一律先在旁邊建好新物件再整個替換，查詢中的指令不會看到空的題庫
 knowledge_cache = {}
 
+# 各分類的檢索索引，第一次指定主題出題時才建立 { 分類: (ChunkStore, BM25Index) }
+knowledge_index = {}
+# 各分類的向量索引 { 分類: (ChunkStore, EmbeddingStore, {內容雜湊: 片段編號}) }
+knowledge_vectors = {}
+# 各分類每個片段的內容雜湊 (片段 ID) { 分類: (ChunkStore, [雜湊]) }
+knowledge_chunk_ids = {}
+
+# 答題紀錄與熟練度，出題時依熟練度加權抽片段
+mastery_tracker = MasteryTracker()
+
 def load_all_knowledge():
     """載入所有分類的 JSON"""
     global knowledge_cache
-    knowledge_cache = {} # 清空快取
     
     if not os.path.exists(JSON_FOLDER):
         os.makedirs(JSON_FOLDER)
@@ -331,55 +417,121 @@ def load_all_knowledge():
 
     files = [f for f in os.listdir(JSON_FOLDER) if f.endswith(".json")]
     
+    new_cache = {}
     for filename in files:
         category_name = filename.replace(".json", "") # 去掉副檔名當作分類名
         try:
-            with open(os.path.join(JSON_FOLDER, filename), "r", encoding="utf-8") as f:
-                data = json.load(f)
-                knowledge_cache[category_name] = data
-                logging.info(f"✅ 已載入分類：{category_name} ({len(data)} 筆片段)")
+            data = ChunkStore(category_name, os.path.join(JSON_FOLDER, filename))
+            new_cache[category_name] = data
+            logging.info(f"✅ 已載入分類：{category_name} ({len(data)} 筆片段)")
         except Exception as e:
             logging.error(f"❌ 載入失敗 {filename}: {e}")
 
+    knowledge_cache = new_cache
+
+def reload_category(category_name: str):
+    """只重新載入單一分類"""
+    json_path = os.path.join(JSON_FOLDER, f"{category_name}.json")
+    if not os.path.exists(json_path):
+        knowledge_cache.pop(category_name, None)
+        logging.info(f"🗑️ 已移除分類：{category_name}")
+        return
+
+    try:
+        data = ChunkStore(category_name, json_path)
+    except Exception as e:
+        logging.error(f"❌ 載入失敗 {category_name}: {e}")
+        return
+    knowledge_cache[category_name] = data
+    logging.info(f"🔄 已重新載入分類：{category_name} ({len(data)} 筆片段)")
+
+def get_knowledge_index(category: str):
+    """取得 (必要時建立) 分類的 BM25 索引，回傳 (題庫, 索引)"""
+    category_data = knowledge_cache[category]
+    cached = knowledge_index.get(category)
+    # 題庫被替換過就重建，索引的片段編號只對建立時的題庫有效
+    if cached is None or cached[0] is not category_data:
+        started = time.perf_counter()
+        index = BM25Index(category_data.content(i) for i in range(len(category_data)))
+        cached = knowledge_index[category] = (category_data, index)
+        logging.info(f"🔎 已建立 [{category}] 檢索索引 ({len(index)} 筆片段, {time.perf_counter() - started:.2f} 秒)")
+    return cached
+
+def get_chunk_ids(category: str):
+    """取得 (必要時計算) 分類中每個片段的 ID，回傳 (題庫, [片段 ID])"""
+    category_data = knowledge_cache[category]
+    cached = knowledge_chunk_ids.get(category)
+    if cached is None or cached[0] is not category_data:
+        cached = knowledge_chunk_ids[category] = (
+            category_data, [content_hash(category_data.content(i)) for i in range(len(category_data))]
+        )
+    return cached
+
+def search_knowledge_vectors(category: str, topic: str, k: int = 2) -> List[Dict]:
+    """以向量相似度找出最相關的片段 (尚未計算向量則回傳空列表)"""
+    from embedding_store import EmbeddingStore
+
+    category_data, chunk_ids = get_chunk_ids(category)
+    cached = knowledge_vectors.get(category)
+    if cached is None or cached[0] is not category_data:
+        rows = {chunk_id: i for i, chunk_id in enumerate(chunk_ids)}
+        cached = knowledge_vectors[category] = (category_data, EmbeddingStore(category), rows)
+    category_data, store, rows = cached
+    if not len(store):
+        return []
+
+    query_vector = get_embedder().embed_query(topic)
+    # 多取幾筆，略過已不在題庫中的舊向量
+    hits = store.search(query_vector, k * 4)
+    return [category_data[rows[key]] for key, _ in hits if key in rows][:k]
+
+@metrics.timed("search_knowledge")
+def search_knowledge(category: str, topic: str, k: int = 2) -> List[Dict]:
+    """依主題找出最相關的片段"""
+    if EMBEDDINGS_ENABLED:
+        hits = search_knowledge_vectors(category, topic, k)
+        if hits:
+            return hits
+
+    category_data, index = get_knowledge_index(category)
+    return [category_data[doc_id] for doc_id, _ in index.search(topic, k)]
+
+async def watch_knowledge():
+    """監看上傳與題庫資料夾，只處理並重新載入有變動的分類"""
+    watcher = KnowledgeWatcher(SOURCE_ROOT, JSON_FOLDER)
+    logging.info(f"👀 開始監看題庫資料夾 (每 {KNOWLEDGE_WATCH_INTERVAL:g} 秒)")
+    while True:
+        try:
+            # 有新 PDF 的分類交給背景 worker 處理，寫出 JSON 後下一輪會自動重新載入
+            # (多行程時只由主行程排入，避免重複處理)
+            for category in (await asyncio.to_thread(watcher.poll_sources) if IS_PRIMARY else []):
+                await asyncio.to_thread(
+                    job_queue.enqueue, "ingest_category", {"category": category},
+                    priority=PRIORITY_INGEST, lock_key=category,
+                )
+
+            changed, removed = await asyncio.to_thread(watcher.poll_json)
+            for category in changed + removed:
+                await asyncio.to_thread(reload_category, category)
+        except Exception as e:
+            logging.error(f"題庫監看錯誤: {e}")
+        await asyncio.sleep(KNOWLEDGE_WATCH_INTERVAL)
+
 # 動態取得分類列表 (給 Discord 自動補全用)
 def get_categories(ctx: discord.AutocompleteContext):
     return list(knowledge_cache.keys())
 
-# 出題 Prompt
-def build_prompt(doc_data, category):
-    return f"""
-你是一位專業的國中老師。
-科目：{category}
-參考資料來源：{doc_data['source']}
-資料內容：
-{doc_data['content']}
-
-任務：根據資料內容出一題「單選題」，並填寫以下欄位：
-- question: 題目內容
-- option_a: 選項 A 的內容（不需加 A. 前綴）
-- option_b: 選項 B 的內容（不需加 B. 前綴）
-- option_c: 選項 C 的內容（不需加 C. 前綴）
-- option_d: 選項 D 的內容（不需加 D. 前綴）
-- correct_answer: 正確答案，只能填 A、B、C 或 D 其中一個字母
-- explanation: 詳細解析，說明為何正確答案是對的
-
-規則：
-1. 使用繁體中文。
-2. 題目須具備教育意義，幫助學生理解概念，而非僅考察記憶。
-3. 請確保題目與解析的內容都來自提供的資料內容，不要加入額外資訊。
-4. 選項和題目務必合理，不能出現明顯錯誤或不合邏輯的內容。
-5. 請勿使用詩歌體或過於文學化的語言，保持清晰直接，適合國中學生閱讀。
-"""
-
 # ==================== Slash Commands ====================
 
 @bot.slash_command(name="出題", description="選擇科目並出題")
 async def exam(
     ctx: discord.ApplicationContext,
-    subject: Option(str, "請選擇科目", autocomplete=get_categories)
+    subject: Option(str, "請選擇科目", autocomplete=get_categories),
+    主題: Option(str, "指定主題或關鍵字(可選，例如:醉翁亭記)", required=False, default=None)
 ):
     # ✅ 先 defer，避免 timeout
-    await ctx.defer()
+    with metrics.span("discord_defer"):
+        await ctx.defer()
     
     # 檢查該科目是否存在
     if subject not in knowledge_cache:
@@ -393,65 +545,97 @@ async def exam(
         await ctx.followup.send(f"⚠️ 「{subject}」題庫是空的。")
         return
 
-    await ctx.followup.send(f"📚 正在準備 **{subject}** 的試題...")
-
-    try:
-        # 隨機挑選一段
-        selected_doc = random.choice(category_data)
-        prompt = build_prompt(selected_doc, subject)
-
-        # 使用 OpenRouter API (Structured Output)
-        # 注意：DeepSeek R1 會輸出 <think> 標籤，不適合 structured output
-        # 改用支援 structured output 的模型
-        response = await asyncio.to_thread(
-            client.beta.chat.completions.parse,
-            model="meta-llama/llama-3.3-70b-instruct",
-            messages=[
-                {"role": "system", "content": "你是一位專業的國中老師，擅長出題。請按照指定格式回答。"},
-                {"role": "user", "content": prompt}
-            ],
-            response_format=QuizQuestion,
-        )
-
-        quiz = response.choices[0].message.parsed
-        
-        # 格式化題目顯示
-        question_text = (
-            f"📝 **{subject} 題目**\n\n"
-            f"{quiz.question}\n\n"
-            f"**A.** {quiz.option_a}\n"
-            f"**B.** {quiz.option_b}\n"
-            f"**C.** {quiz.option_c}\n"
-            f"**D.** {quiz.option_d}"
+    selected_doc = None
+    chunk_id = None
+    if 主題:
+        hits = await asyncio.to_thread(search_knowledge, subject, 主題)
+        if hits:
+            # 合併最相關的片段作為出題依據，作答結果記在最相關的片段上
+            chunk_id = content_hash(hits[0]["content"])
+            selected_doc = {
+                "source": "、".join(dict.fromkeys(doc["source"] for doc in hits)),
+                "content": "\n".join(doc["content"] for doc in hits),
+            }
+            await ctx.followup.send(f"📚 正在準備 **{subject}**「{主題}」的試題...")
+        else:
+            await ctx.followup.send(f"🔍 「{subject}」題庫中找不到與「{主題}」相關的內容，改為隨機出題...")
+    else:
+        await ctx.followup.send(f"📚 正在準備 **{subject}** 的試題...")
+
+    # 沒有指定主題時依熟練度加權抽一段 (越常答錯越容易抽到)
+    if selected_doc is None:
+        category_data, chunk_ids = await asyncio.to_thread(get_chunk_ids, subject)
+        # 第一次抽題要為整個分類建立抽樣樹，放到執行緒避免卡住事件迴圈
+        row = await asyncio.to_thread(mastery_tracker.draw, str(ctx.author.id), subject, category_data, chunk_ids)
+        selected_doc, chunk_id = category_data[row], chunk_ids[row]
+
+    # 交給背景 worker 呼叫 LLM，完成後由 dispatch_job_results 貼到頻道
+    with metrics.span("job_enqueue"):
+        await asyncio.to_thread(
+            job_queue.enqueue, "generate_quiz", {"subject": subject, "doc": selected_doc, "chunk_id": chunk_id},
+            priority=PRIORITY_QUIZ, max_attempts=2, channel_id=ctx.channel_id, user_id=ctx.author.id,
+            owner=JOB_OWNER,
         )
-        
-        # 建立按鈕 View
-        view = QuizView(quiz, ctx.author.id)
-        await ctx.followup.send(question_text, view=view)
-
-    except Exception as e:
-        logging.error(f"出題錯誤: {e}")
-        await ctx.followup.send(f"❌ 出題系統發生錯誤: {e}")
 
 @bot.slash_command(name="重載題庫", description="重新讀取 JSON 檔案")
 async def reload_db(ctx):
-    await ctx.defer()
-    # 使用 asyncio.to_thread 避免阻塞導致 interaction timeout
-    await asyncio.to_thread(load_all_knowledge)
-    await ctx.followup.send(f"✅ 題庫已更新，目前有 {len(knowledge_cache)} 個分類。")
+    # 轉換題庫格式交給背景 worker，完成後自動重新載入並通知
+    job_id = await asyncio.to_thread(
+        job_queue.enqueue, "compile_knowledge", {},
+        priority=PRIORITY_INGEST, channel_id=ctx.channel_id, user_id=ctx.author.id, owner=JOB_OWNER,
+    )
+    await ctx.respond(f"🔄 已排入背景工作 #{job_id}，題庫重新載入後會在這裡通知。")
 
 @bot.slash_command(name="更新題庫", description="處理 PDF 並更新題庫")
 async def update_knowledge_base(ctx):
-    await ctx.defer()
-    
-    try:
-        # 使用 asyncio.to_thread 避免阻塞導致 interaction timeout
-        await asyncio.to_thread(process_pdfs)
-        await asyncio.to_thread(load_all_knowledge)
-        await ctx.followup.send(f"✅ 題庫已更新完成！目前有 {len(knowledge_cache)} 個分類。")
-    except Exception as e:
-        logging.error(f"更新題庫錯誤: {e}")
-        await ctx.followup.send(f"❌ 更新題庫時發生錯誤: {e}")
+    # 處理 PDF 很花時間，交給背景 worker，不受 interaction 時限影響
+    job_id = await asyncio.to_thread(
+        job_queue.enqueue, "ingest_all", {},
+        priority=PRIORITY_INGEST, channel_id=ctx.channel_id, user_id=ctx.author.id, owner=JOB_OWNER,
+    )
+    await ctx.respond(f"📥 已排入背景工作 #{job_id}，處理完成後會在這裡通知。")
+
+@bot.slash_command(name="工作狀態", description="查看背景工作狀態")
+async def job_status(
+    ctx: discord.ApplicationContext,
+    工作編號: Option(int, "工作編號(可選,不填則顯示佇列統計)", required=False, default=None)
+):
+    """查看背景工作"""
+    status_labels = {"pending": "⏳ 等待中", "running": "⚙️ 執行中", "done": "✅ 完成", "failed": "❌ 失敗"}
+
+    if 工作編號 is not None:
+        job = await asyncio.to_thread(job_queue.get, 工作編號)
+        if not job:
+            await ctx.respond(f"❌ 找不到編號 #{工作編號} 的工作!", ephemeral=True)
+            return
+        embed = discord.Embed(title=f"🛠️ 工作 #{job['id']}", description=job["kind"], color=discord.Color.blue())
+        embed.add_field(name="狀態", value=status_labels.get(job["status"], job["status"]), inline=True)
+        embed.add_field(name="嘗試次數", value=f"{job['attempts']}/{job['max_attempts']}", inline=True)
+        if job["progress"]:
+            progress = job["progress"]
+            embed.add_field(name="進度", value=f"{progress['stage']} {progress['done']}/{progress['total']}", inline=True)
+        if job["error"]:
+            embed.add_field(name="錯誤", value=job["error"][:1000], inline=False)
+        await ctx.respond(embed=embed, ephemeral=True)
+        return
+
+    stats = await asyncio.to_thread(job_queue.stats)
+    embed = discord.Embed(title="🛠️ 背景工作佇列", color=discord.Color.blue())
+    for kind, counts in sorted(stats.items()):
+        embed.add_field(
+            name=kind,
+            value=" | ".join(f"{status_labels.get(status, status)} {n}" for status, n in counts.items()),
+            inline=False,
+        )
+    if not stats:
+        embed.description = "目前沒有任何工作"
+    notif = notifier.stats()
+    embed.add_field(
+        name="🔔 通知頻道",
+        value=f"已送出 {notif['sent']} 則摘要 | 合併 {notif['merged']} | 丟棄 {notif['dropped']} | 失敗 {notif['failed']} | 等待中 {notif['pending']}",
+        inline=False,
+    )
+    await ctx.respond(embed=embed, ephemeral=True)
 
 @bot.slash_command(name="談心", description="跟機器人聊聊天，舒緩讀書壓力")
 async def chat_with_bot(
@@ -459,7 +643,8 @@ async def chat_with_bot(
     心情: Option(str, "想說的話或現在的心情", required=True)
 ):
     """溫暖的談心功能"""
-    await ctx.defer()  # 因為 AI 回應需要時間
+    with metrics.span("discord_defer"):
+        await ctx.defer()  # 因為 AI 回應需要時間
     
     user_id = str(ctx.author.id)
     data = load_data()
@@ -478,11 +663,13 @@ async def chat_with_bot(
     # 儲存 AI 的回應
     chat_history.append({"role": "assistant", "content": response})
     
-    # 每5次對話更新一次個性分析
+    # 每5次對話更新一次個性分析 (背景執行，完成後由 dispatch_job_results 存檔)
     if len(chat_history) % 10 == 0:
         logging.info(f"更新使用者 {user_id} 的個性分析...")
-        personality = await analyze_personality(chat_history)
-        user_data["personality_profile"] = personality
+        await asyncio.to_thread(
+            job_queue.enqueue, "analyze_personality", {"chat_history": chat_history},
+            priority=PRIORITY_PERSONALITY, user_id=ctx.author.id, owner=JOB_OWNER,
+        )
     
     # 儲存更新的對話歷史
     user_data["chat_history"] = chat_history
@@ -509,22 +696,11 @@ async def chat_with_bot(
     embed.set_footer(text=footer_text)
     embed.timestamp = datetime.now()
     
-    await ctx.followup.send(embed=embed)
+    with metrics.span("discord_send"):
+        await ctx.followup.send(embed=embed)
     
-    # 發送通知（可選）
-    try:
-        channel = bot.get_channel(NOTIFICATION_CHANNEL_ID)
-        if channel:
-            notif = discord.Embed(
-                title="💬 談心記錄",
-                description=f"{ctx.author.mention} 來談心了",
-                color=discord.Color.blue()
-            )
-            notif.add_field(name="次數", value=f"第 {chat_count} 次", inline=True)
-            notif.timestamp = datetime.now()
-            await channel.send(embed=notif)
-    except Exception as e:
-        logging.error(f"通知失敗: {e}")
+    # 通知頻道 (背景合併成摘要發送)
+    notifier.publish("chat", user=ctx.author.mention, count=chat_count)
 
 @bot.slash_command(name="查看談心記錄", description="查看你和機器人的對話歷史")
 async def view_chat_history(ctx: discord.ApplicationContext):
@@ -616,7 +792,7 @@ async def tutorial(ctx: discord.ApplicationContext):
     
     embed.add_field(
         name="📝 /出題",
-        value="從題庫中隨機出題測驗",
+        value="從題庫中出題測驗\n參數: 科目、主題(可選,依關鍵字挑選相關內容)",
         inline=False
     )
     
@@ -628,7 +804,7 @@ async def tutorial(ctx: discord.ApplicationContext):
     
     embed.add_field(
         name="2️⃣ /新增複習",
-        value="新增複習任務\n參數: 科目、範圍、把握度(1-10,1最不確定,10最有把握)",
+        value="新增複習任務\n參數: 科目、範圍、把握度(1-10,1最不確定,10最有把握)\n選「使用遺忘曲線」會建立間隔複習卡片，用 /今日複習、/完成複習 管理",
         inline=False
     )
     
@@ -670,13 +846,13 @@ async def tutorial(ctx: discord.ApplicationContext):
     
     embed.add_field(
         name="🍅 番茄鐘功能",
-        value="/番茄鐘 - 開始25分鐘專注\n/停止番茄鐘 - 停止計時",
+        value="/番茄鐘 - 開始或加入讀書房 (可設定循環次數與長休息，重新啟動後會接續)\n/停止番茄鐘 - 離開讀書房",
         inline=False
     )
     
     embed.add_field(
         name="💡 其他指令",
-        value="/我的任務 - 查看所有任務列表\n/查看談心記錄 - 查看對話歷史\n/清除談心記錄 - 重置對話記憶\n/更新題庫 - 處理 PDF 並更新題庫",
+        value="/我的任務 - 查看所有任務列表\n/統計 - 查看每日/每週讀書統計\n/讀書計畫 - 排出每天該做的事\n/查看談心記錄 - 查看對話歷史\n/清除談心記錄 - 重置對話記憶\n/更新題庫 - 處理 PDF 並更新題庫",
         inline=False
     
     )
@@ -685,13 +861,31 @@ async def tutorial(ctx: discord.ApplicationContext):
     
     await ctx.respond(embed=embed)
 
+def add_estimate_hint(embed, suggestion, estimate, corrected):
+    """依過去的計時紀錄顯示 (或說明已套用) 建議的預估時間"""
+    if not suggestion:
+        return
+    minutes, ratio, samples = suggestion
+    if minutes == estimate:
+        return
+    if corrected:
+        text = f"已從 {estimate} 分鐘修正為 **{minutes}** 分鐘"
+    else:
+        text = f"建議改為 **{minutes}** 分鐘 (新增時加上 `自動修正:True` 即可套用)"
+    embed.add_field(
+        name="🤖 預估修正",
+        value=f"{text}\n根據 {samples} 次計時，你通常花預估的 {ratio*100:.0f}% 時間",
+        inline=False
+    )
+
 @bot.slash_command(name="新增作業", description="新增一個作業任務")
 async def add_homework(
     ctx: discord.ApplicationContext,
     日期: Option(str, "截止日期(格式:YYYY-MM-DD)", required=True),
     科目: Option(str, "科目名稱", required=True),
     頁數: Option(str, "頁數或範圍(例如:p.1-10)", required=True),
-    預估時間: Option(int, "預估完成時間(分鐘)", required=True, min_value=1)
+    預估時間: Option(int, "預估完成時間(分鐘)", required=True, min_value=1),
+    自動修正: Option(bool, "依過去的計時紀錄自動修正預估時間", required=False, default=False)
 ):
     """新增作業"""
     user_id = str(ctx.author.id)
@@ -706,23 +900,29 @@ async def add_homework(
         return
     
     # 生成任務編號
-    task_id = len(user_data["tasks"]) + 1
+    task_id = next_task_id(user_data)
+    suggestion = suggest(user_data, 科目, 預估時間)
+    estimated_time = suggestion[0] if 自動修正 and suggestion else 預估時間
     
     task = {
         "id": task_id,
         "type": "作業",
         "subject": 科目,
         "pages": 頁數,
-        "estimated_time": 預估時間,
+        "estimated_time": estimated_time,
         "actual_time": None,
         "deadline": deadline.isoformat(),
         "completed": False,
         "created_at": datetime.now().isoformat()
     }
+    if estimated_time != 預估時間:
+        task["user_estimate"] = 預估時間
     
     user_data["tasks"].append(task)
+    record_added(user_data)
     data[user_id] = user_data
     save_data(data)
+    reminder_service.add_task(user_id, task)
     
     # 計算剩餘天數
     days_left = (deadline - datetime.now()).days
@@ -733,30 +933,18 @@ async def add_homework(
         color=discord.Color.green()
     )
     embed.add_field(name="📄 頁數", value=頁數, inline=True)
-    embed.add_field(name="⏱️ 預估時間", value=f"{預估時間} 分鐘", inline=True)
+    embed.add_field(name="⏱️ 預估時間", value=f"{estimated_time} 分鐘", inline=True)
     embed.add_field(name="📅 截止日期", value=日期, inline=True)
     embed.add_field(name="⏰ 剩餘時間", value=f"{days_left} 天", inline=True)
     embed.add_field(name="🔢 任務編號", value=f"#{task_id}", inline=True)
+    add_estimate_hint(embed, suggestion, 預估時間, 自動修正)
     
     embed.set_footer(text="使用 /開始計時 來開始做作業")
     
     await ctx.respond(embed=embed)
     
-    # 發送通知
-    try:
-        channel = bot.get_channel(NOTIFICATION_CHANNEL_ID)
-        if channel:
-            notif = discord.Embed(
-                title="📝 新增作業",
-                description=f"{ctx.author.mention} 新增了作業",
-                color=discord.Color.blue()
-            )
-            notif.add_field(name="科目", value=科目, inline=True)
-            notif.add_field(name="截止", value=日期, inline=True)
-            notif.timestamp = datetime.now()
-            await channel.send(embed=notif)
-    except Exception as e:
-        logging.error(f"通知失敗: {e}")
+    # 通知頻道 (背景合併成摘要發送)
+    notifier.publish("homework", user=ctx.author.mention, subject=科目, deadline=日期)
 
 @bot.slash_command(name="新增複習", description="新增一個複習任務")
 async def add_review(
@@ -765,7 +953,8 @@ async def add_review(
     範圍: Option(str, "複習範圍(例如:第1-3章)", required=True),
     把握度: Option(int, "把握程度(1-10,1最不確定,10最有把握)", required=True, min_value=1, max_value=10),
     預估時間: Option(int, "預估複習時間(分鐘)", required=True, min_value=1),
-    使用遺忘曲線: Option(bool, "是否自動生成後續複習(1,3,7,14,30天後)", required=False, default=False)
+    使用遺忘曲線: Option(bool, "是否建立間隔複習卡片(依每次複習的把握度安排下次複習)", required=False, default=False),
+    自動修正: Option(bool, "依過去的計時紀錄自動修正預估時間", required=False, default=False)
 ):
     """新增複習"""
     user_id = str(ctx.author.id)
@@ -773,72 +962,75 @@ async def add_review(
     user_data = get_user_data(user_id)
     
     current_time = datetime.now()
-    created_tasks = []
-
-    # 定義遺忘曲線的時間間隔 (天數)
-    intervals = [0, 1, 3, 7, 14, 30] if 使用遺忘曲線 else [0]
+    suggestion = suggest(user_data, 科目, 預估時間)
+    estimated_time = suggestion[0] if 自動修正 and suggestion else 預估時間
+    
+    confidence_emoji = "🔴" if 把握度 <= 3 else "🟡" if 把握度 <= 6 else "🟢"
+    confidence_text = "不確定" if 把握度 <= 3 else "普通" if 把握度 <= 6 else "有把握"
     
-    for i, days in enumerate(intervals):
-        task_date = current_time + timedelta(days=days)
-        task_id = len(user_data["tasks"]) + 1
+    if 使用遺忘曲線:
+        # 只存一張卡片，下次複習日等複習完再依結果計算
+        card_id = user_data.get("next_card_id", 1)
+        user_data["next_card_id"] = card_id + 1
+        card = new_card(card_id, 科目, 範圍, 把握度, estimated_time)
+        if estimated_time != 預估時間:
+            card["user_estimate"] = 預估時間
+        user_data.setdefault("cards", {})[str(card_id)] = card
+        # 每次排定的複習都算一個新增的任務 (今天的第一次學習)
+        record_added(user_data)
         
-        display_range = 範圍
-        if 使用遺忘曲線:
-            if days == 0:
-                suffix = "(首次學習)"
-            else:
-                suffix = f"(複習 R{i} - {days}天後)"
-            display_range = f"{範圍} {suffix}"
-
-        deadline_str = task_date.strftime("%Y-%m-%d")
-
+        data[user_id] = user_data
+        save_data(data)
+        due_index.add(user_id, card)
+        
+        embed = discord.Embed(
+            title="🧠 已建立間隔複習卡片!",
+            description=f"**{科目}** {範圍}",
+            color=discord.Color.purple()
+        )
+        embed.add_field(name="💪 把握度", value=f"{confidence_emoji} {把握度}/10 ({confidence_text})", inline=True)
+        embed.add_field(name="⏱️ 預估時間", value=f"{estimated_time} 分鐘", inline=True)
+        embed.add_field(name="🃏 卡片編號", value=f"#{card_id}", inline=True)
+        embed.add_field(
+            name="💡 提示",
+            value="今天先讀一次，之後用 /今日複習 查看到期的卡片，複習完用 /完成複習 回報把握度，\n"
+                  "越有把握下次間隔越長，忘記了就會很快再出現。",
+            inline=False
+        )
+    else:
+        task_id = next_task_id(user_data)
         task = {
             "id": task_id,
             "type": "複習",
             "subject": 科目,
-            "range": display_range,
+            "range": 範圍,
             "confidence": 把握度,
-            "estimated_time": 預估時間,
+            "estimated_time": estimated_time,
             "actual_time": None,
-            "deadline": f"{deadline_str}T23:59:59",
+            "deadline": f"{current_time.strftime('%Y-%m-%d')}T23:59:59",
             "completed": False,
             "created_at": current_time.isoformat()
         }
+        if estimated_time != 預估時間:
+            task["user_estimate"] = 預估時間
         
         user_data["tasks"].append(task)
-        created_tasks.append(task)
-
-    data[user_id] = user_data
-    save_data(data)
-    
-    confidence_emoji = "🔴" if 把握度 <= 3 else "🟡" if 把握度 <= 6 else "🟢"
-    confidence_text = "不確定" if 把握度 <= 3 else "普通" if 把握度 <= 6 else "有把握"
-    
-    if 使用遺忘曲線:
-        embed = discord.Embed(
-            title="🧠 已套用遺忘曲線!",
-            description=f"成功為 **{科目}** 建立了 **{len(created_tasks)}** 個複習排程",
-            color=discord.Color.purple()
-        )
-        schedule_text = ""
-        for task in created_tasks:
-            date_str = datetime.fromisoformat(task['deadline']).strftime('%Y-%m-%d')
-            schedule_text += f"📅 {date_str}: #{task['id']} {task['range']}\n"
-            
-        embed.add_field(name="📅 複習計畫表", value=schedule_text, inline=False)
-        embed.add_field(name="💡 提示", value="這些任務已自動加入您的行事曆", inline=False)
+        record_added(user_data)
+        data[user_id] = user_data
+        save_data(data)
+        reminder_service.add_task(user_id, task)
         
-    else:
-        task = created_tasks[0]
         embed = discord.Embed(
             title="✅ 複習已新增!",
             description=f"**{科目}** 複習",
             color=discord.Color.green()
         )
         embed.add_field(name="📖 範圍", value=範圍, inline=True)
-        embed.add_field(name="⏱️ 預估時間", value=f"{預估時間} 分鐘", inline=True)
+        embed.add_field(name="⏱️ 預估時間", value=f"{estimated_time} 分鐘", inline=True)
         embed.add_field(name="💪 把握度", value=f"{confidence_emoji} {把握度}/10 ({confidence_text})", inline=True)
-        embed.add_field(name="🔢 任務編號", value=f"#{task['id']}", inline=True)
+        embed.add_field(name="🔢 任務編號", value=f"#{task_id}", inline=True)
+
+    add_estimate_hint(embed, suggestion, 預估時間, 自動修正)
 
     if 把握度 <= 3:
         embed.add_field(
@@ -847,10 +1039,117 @@ async def add_review(
             inline=False
         )
     
-    embed.set_footer(text="使用 /開始計時 來開始複習")
+    embed.set_footer(text="使用 /開始計時 來開始複習" if not 使用遺忘曲線 else "使用 /今日複習 查看今天要複習的卡片")
+    
+    await ctx.respond(embed=embed)
+
+# ==================== 間隔複習卡片 ====================
+
+due_index = DueIndex()
+
+def format_card(card):
+    confidence_emoji = "🔴" if card['confidence'] <= 3 else "🟡" if card['confidence'] <= 6 else "🟢"
+    reviewed = f"已複習 {card['repetitions']} 次" if card["last_reviewed"] else "首次學習"
+    return f"#{card['id']} {card['subject']} {card['range']} {confidence_emoji}{card['confidence']} - {card['estimated_time']}分鐘 ({reviewed})"
+
+@bot.slash_command(name="今日複習", description="查看今天到期的間隔複習卡片")
+async def due_reviews(ctx: discord.ApplicationContext):
+    """今天 (含逾期) 要複習的卡片"""
+    user_id = str(ctx.author.id)
+    user_data = get_user_data(user_id)
+    cards = user_data.get("cards", {})
+    today = datetime.now().date()
+    
+    due_cards = [cards[str(card_id)] for card_id in due_index.due(user_id, today) if str(card_id) in cards]
+    
+    if not due_cards:
+        await ctx.respond(f"🎉 今天沒有要複習的卡片! (共 {len(cards)} 張卡片)")
+        return
+    
+    embed = discord.Embed(
+        title="🧠 今日複習",
+        description=f"有 {len(due_cards)} 張卡片要複習，預估 {sum(c['estimated_time'] for c in due_cards)} 分鐘",
+        color=discord.Color.purple()
+    )
+    lines = []
+    for card in due_cards[:20]:
+        overdue = (today - datetime.fromisoformat(card["due"]).date()).days
+        lines.append(format_card(card) + (f" ⚠️逾期{overdue}天" if overdue > 0 else ""))
+    if len(due_cards) > 20:
+        lines.append(f"... 還有 {len(due_cards) - 20} 張")
+    embed.add_field(name="📋 卡片", value="\n".join(lines), inline=False)
+    embed.set_footer(text="複習完使用 /完成複習 回報把握度")
     
     await ctx.respond(embed=embed)
 
+@bot.slash_command(name="完成複習", description="回報複習結果並安排下次複習")
+async def finish_review(
+    ctx: discord.ApplicationContext,
+    卡片編號: Option(int, "複習的卡片編號", required=True),
+    把握度: Option(int, "這次複習後的把握程度(1-10)", required=True, min_value=1, max_value=10),
+    實際時間: Option(int, "這次複習實際花的時間(分鐘)，會計入讀書統計", required=False, default=None, min_value=1)
+):
+    """依 SM-2 更新卡片"""
+    user_id = str(ctx.author.id)
+    data = load_data()
+    user_data = get_user_data(user_id)
+    
+    card = user_data.get("cards", {}).get(str(卡片編號))
+    if not card:
+        await ctx.respond(f"❌ 找不到編號 #{卡片編號} 的複習卡片!")
+        return
+    
+    early = datetime.fromisoformat(card["due"]).date() > datetime.now().date()
+    # 讀書統計與預估修正：這次複習算完成一個任務 (到期日當天以前算準時)
+    record_completed(user_data, {**card, "deadline": f"{card['due']}T23:59:59"})
+    if 實際時間:
+        record_timer(user_data, card, 實際時間)
+        observe(user_data, card, 實際時間)
+    review_card(card, 把握度)
+    # 下一次複習
+    record_added(user_data)
+    
+    data[user_id] = user_data
+    save_data(data)
+    due_index.add(user_id, card)
+    
+    remembered = confidence_to_quality(把握度) >= 3
+    embed = discord.Embed(
+        title="✅ 複習完成!" if remembered else "🔁 沒關係，明天再來一次!",
+        description=f"**{card['subject']}** {card['range']}",
+        color=discord.Color.green() if remembered else discord.Color.orange()
+    )
+    embed.add_field(name="📅 下次複習", value=f"{card['due']} ({card['interval']} 天後)", inline=True)
+    embed.add_field(name="🔁 連續記得", value=f"{card['repetitions']} 次", inline=True)
+    embed.add_field(name="📈 難易度", value=f"{card['ease']:.2f}", inline=True)
+    if 實際時間:
+        embed.add_field(name="⏱️ 實際時間", value=f"{實際時間} 分鐘 (預估 {card['estimated_time']} 分鐘)", inline=True)
+    if early:
+        embed.set_footer(text="這張卡片還沒到期，提早複習也會重新安排日期")
+    
+    await ctx.respond(embed=embed)
+
+@bot.slash_command(name="刪除複習卡片", description="刪除一張間隔複習卡片")
+async def delete_card(
+    ctx: discord.ApplicationContext,
+    卡片編號: Option(int, "要刪除的卡片編號", required=True)
+):
+    """刪除卡片"""
+    user_id = str(ctx.author.id)
+    data = load_data()
+    user_data = get_user_data(user_id)
+    
+    card = user_data.get("cards", {}).pop(str(卡片編號), None)
+    if not card:
+        await ctx.respond(f"❌ 找不到編號 #{卡片編號} 的複習卡片!")
+        return
+    
+    data[user_id] = user_data
+    save_data(data)
+    due_index.remove(user_id, 卡片編號)
+    
+    await ctx.respond(f"🗑️ 已刪除複習卡片 #{卡片編號} **{card['subject']}** {card['range']}")
+
 @bot.slash_command(name="刪除任務", description="刪除一個任務")
 async def delete_task(
     ctx: discord.ApplicationContext,
@@ -873,6 +1172,7 @@ async def delete_task(
     
     data[user_id] = user_data
     save_data(data)
+    reminder_service.remove_task(user_id, 任務編號)
     
     embed = discord.Embed(
         title="🗑️ 任務已刪除",
@@ -909,9 +1209,11 @@ async def complete_task(
     
     task["completed"] = True
     task["completed_at"] = datetime.now().isoformat()
+    record_completed(user_data, task)
     
     data[user_id] = user_data
     save_data(data)
+    reminder_service.remove_task(user_id, 任務編號)
     
     embed = discord.Embed(
         title="🎉 任務完成!",
@@ -1019,6 +1321,8 @@ async def stop_timer(
     
     task["actual_time"] = round(elapsed_minutes, 1)
     del user_data["timers"][str(任務編號)]
+    record_timer(user_data, task, task["actual_time"])
+    observe(user_data, task, task["actual_time"])
     
     data[user_id] = user_data
     save_data(data)
@@ -1106,34 +1410,32 @@ async def monthly_calendar(
     
     total_tasks = sum(len(tasks) for tasks in daily_tasks.values())
     days_with_tasks = len(daily_tasks)
+    stats_text = f"{total_tasks} 個任務 | {days_with_tasks} 天有安排"
+    footer = "使用 /查看日期 來查看特定日期的詳細行程"
+    
+    if not daily_tasks:
+        embed.add_field(name="📊 統計", value=stats_text, inline=False)
+        embed.set_footer(text=footer)
+        # ✅ 用 followup 而不是 respond
+        await ctx.followup.send(embed=embed)
+        return
     
-    embed.add_field(name="📊 統計", value=f"{total_tasks} 個任務 | {days_with_tasks} 天有安排", inline=False)
-    
-    if daily_tasks:
-        task_summary = []
-        sorted_days = sorted(daily_tasks.keys())
-        
-        for day in sorted_days[:10]:
-            tasks = daily_tasks[day]
-            task_count = len(tasks)
-            completed = sum(1 for t in tasks if t.get("completed", False))
-            
-            status = "✅" if completed == task_count else "⏳"
-            task_summary.append(f"{status} {target_month}/{day} - {task_count} 個任務 ({completed} 已完成)")
-        
-        if len(sorted_days) > 10:
-            task_summary.append(f"... 及其他 {len(sorted_days) - 10} 天")
-        
-        embed.add_field(
-            name="📋 任務日期",
-            value="\n".join(task_summary),
-            inline=False
-        )
+    def format_day(day):
+        tasks = daily_tasks[day]
+        completed = sum(1 for t in tasks if t.get("completed", False))
+        status = "✅" if completed == len(tasks) else "⏳"
+        return f"{status} {target_month}/{day} - {len(tasks)} 個任務 ({completed} 已完成)"
     
-    embed.set_footer(text="使用 /查看日期 來查看特定日期的詳細行程")
+    view = Paginator(
+        ctx.author.id, embed.title, sorted(daily_tasks), format_day,
+        description=embed.description, fields=[("月曆", calendar_text), ("📊 統計", stats_text)], footer=footer,
+    )
     
     # ✅ 用 followup 而不是 respond
-    await ctx.followup.send(embed=embed)
+    if view.needs_view:
+        await ctx.followup.send(embed=view.render(), view=view)
+    else:
+        await ctx.followup.send(embed=view.render())
 
 @bot.slash_command(name="查看日期", description="查看特定日期的所有行程")
 async def view_date(
@@ -1161,61 +1463,47 @@ async def view_date(
                 pass
     
     weekday = ['一', '二', '三', '四', '五', '六', '日'][target_date.weekday()]
+    title = f"📅 {日期} (週{weekday}) 的行程"
     
-    embed = discord.Embed(
-        title=f"📅 {日期} (週{weekday}) 的行程",
-        description=f"共 {len(tasks_on_date)} 個任務",
-        color=discord.Color.blue()
-    )
+    # 當天到期的間隔複習卡片 (由索引查詢)
+    cards = user_data.get("cards", {})
+    due_cards = [cards[str(card_id)] for card_id in due_index.on(user_id, target_date.date()) if str(card_id) in cards]
+    fields = []
+    if due_cards:
+        fields.append((f"🧠 間隔複習 ({len(due_cards)}張)", "\n".join(format_card(card) for card in due_cards[:15])))
     
     if not tasks_on_date:
-        embed.description = "🎉 這天沒有任何任務!"
+        description = f"這天沒有作業或複習任務，有 {len(due_cards)} 張卡片要複習" if due_cards else "🎉 這天沒有任何任務!"
+        embed = discord.Embed(title=title, description=description, color=discord.Color.blue())
+        for name, value in fields:
+            embed.add_field(name=name, value=value, inline=False)
         embed.set_footer(text="使用 /新增作業 或 /新增複習 來新增任務")
-    else:
-        homework = [t for t in tasks_on_date if t["type"] == "作業"]
-        review = [t for t in tasks_on_date if t["type"] == "複習"]
-        
-        total_time = sum(t["estimated_time"] for t in tasks_on_date)
-        completed_count = sum(1 for t in tasks_on_date if t.get("completed", False))
-        
-        if homework:
-            hw_text = []
-            for task in homework:
-                status = "✅" if task.get("completed") else "⏳"
-                hw_text.append(
-                    f"{status} #{task['id']} {task['subject']} ({task['pages']}) - {task['estimated_time']}分鐘"
-                )
-            embed.add_field(
-                name=f"📝 作業 ({len(homework)}個)",
-                value="\n".join(hw_text),
-                inline=False
-            )
-        
-        if review:
-            rv_text = []
-            for task in review:
-                status = "✅" if task.get("completed") else "⏳"
-                confidence_emoji = "🔴" if task['confidence'] <= 3 else "🟡" if task['confidence'] <= 6 else "🟢"
-                rv_text.append(
-                    f"{status} #{task['id']} {task['subject']} ({task['range']}) {confidence_emoji}{task['confidence']} - {task['estimated_time']}分鐘"
-                )
-            embed.add_field(
-                name=f"📚 複習 ({len(review)}個)",
-                value="\n".join(rv_text),
-                inline=False
-            )
-        
-        embed.add_field(
-            name="📊 統計",
-            value=f"預估總時間: {total_time} 分鐘 ({total_time/60:.1f} 小時)\n完成進度: {completed_count}/{len(tasks_on_date)}",
-            inline=False
-        )
+        await ctx.respond(embed=embed)
+        return
     
-    await ctx.respond(embed=embed)
+    total_time = sum(t["estimated_time"] for t in tasks_on_date)
+    completed_count = sum(1 for t in tasks_on_date if t.get("completed", False))
+    # 依過去的計時紀錄預測未完成任務實際要花的時間
+    remaining_forecast = sum(forecast_minutes(user_data, t) for t in tasks_on_date if not t.get("completed"))
+    fields.append((
+        "📊 統計",
+        f"預估總時間: {total_time} 分鐘 ({total_time/60:.1f} 小時)\n"
+        f"剩餘預測: 約 {remaining_forecast:.0f} 分鐘 ({remaining_forecast/60:.1f} 小時)\n"
+        f"完成進度: {completed_count}/{len(tasks_on_date)}"
+    ))
+    
+    # 作業在前、未完成在前
+    tasks_on_date.sort(key=lambda t: (t.get("completed", False), t["type"] != "作業"))
+    view = Paginator(
+        ctx.author.id, title, tasks_on_date, format_task_line,
+        description=f"共 {len(tasks_on_date)} 個任務", fields=fields, filters=TASK_FILTERS,
+    )
+    
+    await ctx.respond(embed=view.render(), view=view)
 
 @bot.slash_command(name="我的任務", description="查看所有任務列表")
 async def my_tasks(ctx: discord.ApplicationContext):
-    """顯示所有任務"""
+    """顯示所有任務 (分頁，可依科目、類型、狀態篩選)"""
     user_id = str(ctx.author.id)
     user_data = get_user_data(user_id)
     
@@ -1223,64 +1511,248 @@ async def my_tasks(ctx: discord.ApplicationContext):
         await ctx.respond("你還沒有新增任何任務!使用 `/新增作業` 或 `/新增複習` 來開始吧 📚")
         return
     
-    embed = discord.Embed(
-        title=f"📚 所有任務",
-        color=discord.Color.blue()
-    )
-    
     incomplete = [t for t in user_data["tasks"] if not t.get("completed", False)]
     completed = [t for t in user_data["tasks"] if t.get("completed", False)]
+    # 未完成的依截止日排在前面，已完成的最近完成的在前
+    incomplete.sort(key=lambda t: t.get("deadline") or "9999")
+    completed.sort(key=lambda t: t.get("completed_at") or "", reverse=True)
     
-    if incomplete:
-        hw_list = []
-        rv_list = []
-        
-        for task in incomplete:
-            if task["type"] == "作業":
-                deadline = datetime.fromisoformat(task["deadline"]).strftime("%m/%d")
-                hw_list.append(f"⏳ #{task['id']} {task['subject']} ({task['pages']}) - 截止:{deadline}")
-            else:
-                confidence_emoji = "🔴" if task['confidence'] <= 3 else "🟡" if task['confidence'] <= 6 else "🟢"
-                rv_list.append(f"⏳ #{task['id']} {task['subject']} ({task['range']}) {confidence_emoji}{task['confidence']}")
-        
-        if hw_list:
-            embed.add_field(
-                name=f"📝 作業 ({len(hw_list)}個)",
-                value="\n".join(hw_list[:10]),
-                inline=False
-            )
-        
-        if rv_list:
-            embed.add_field(
-                name=f"📚 複習 ({len(rv_list)}個)",
-                value="\n".join(rv_list[:10]),
-                inline=False
-            )
+    total_estimated = sum(t['estimated_time'] for t in user_data["tasks"])
+    view = Paginator(
+        ctx.author.id, "📚 所有任務", incomplete + completed, format_task_line,
+        fields=[(
+            "📊 統計",
+            f"總任務: {len(user_data['tasks'])} | 待完成: {len(incomplete)} | 已完成: {len(completed)}\n預估總時間: {total_estimated} 分鐘 ({total_estimated/60:.1f} 小時)"
+        )],
+        filters=TASK_FILTERS,
+    )
     
-    if completed:
-        completed_text = "\n".join([
-            f"✅ #{t['id']} {t['subject']} ({t['type']})"
-            for t in completed[-5:]
-        ])
+    await ctx.respond(embed=view.render(), view=view)
+
+# ==================== 讀書統計 ====================
+
+def format_stats_bucket(embed, bucket):
+    """把一期的彙總加進 embed"""
+    embed.add_field(name="⏰ 讀書時間", value=f"{bucket['minutes']:.0f} 分鐘 ({bucket['minutes']/60:.1f} 小時)", inline=True)
+
+    ratio = estimate_ratio(bucket)
+    if ratio is None:
+        ratio_text = "尚無計時紀錄"
+    elif ratio > 1:
+        ratio_text = f"⏱️ 實際比預估多 {(ratio-1)*100:.0f}%"
+    else:
+        ratio_text = f"👍 實際比預估少 {(1-ratio)*100:.0f}%"
+    embed.add_field(name="🎯 預估準確度", value=ratio_text, inline=True)
+
+    rate = completion_rate(bucket)
+    embed.add_field(
+        name="✅ 完成率",
+        value=f"{bucket['completed']}/{bucket['added']} ({rate*100:.0f}%)" if rate is not None else f"完成 {bucket['completed']} 個",
+        inline=True
+    )
+
+    if bucket["by_subject"]:
+        subjects = sorted(bucket["by_subject"].items(), key=lambda kv: kv[1], reverse=True)
         embed.add_field(
-            name=f"✅ 已完成 (最近5個)",
-            value=completed_text,
+            name="📚 各科時間",
+            value="\n".join(f"{subject}: {minutes:.0f} 分鐘" for subject, minutes in subjects[:10]),
             inline=False
         )
-    
-    total_estimated = sum(t['estimated_time'] for t in user_data["tasks"])
+
+@bot.slash_command(name="統計", description="查看每日或每週的讀書統計")
+async def study_stats(
+    ctx: discord.ApplicationContext,
+    期間: Option(str, "統計期間", required=False, default="本週", choices=["今天", "本週"]),
+    往前: Option(int, "往前幾天/幾週(0為目前)", required=False, default=0, min_value=0, max_value=52)
+):
+    """讀書統計 (直接讀取預先累加的彙總)"""
+    user_id = str(ctx.author.id)
+    user_data = get_user_data(user_id)
+    today = datetime.now().date()
+
+    if 期間 == "今天":
+        day = today - timedelta(days=往前)
+        bucket = get_day(user_data, day)
+        title = f"📊 {day.strftime('%Y-%m-%d')} 讀書統計"
+        trend_days = [day - timedelta(days=i) for i in range(6, -1, -1)]
+        trend = [(d.strftime("%m/%d"), get_day(user_data, d)["minutes"]) for d in trend_days]
+    else:
+        day = today - timedelta(weeks=往前)
+        bucket = get_week(user_data, day)
+        start = day - timedelta(days=day.weekday())
+        title = f"📊 {start.strftime('%m/%d')} ~ {(start + timedelta(days=6)).strftime('%m/%d')} 讀書統計"
+        trend_days = [day - timedelta(weeks=i) for i in range(5, -1, -1)]
+        trend = [((d - timedelta(days=d.weekday())).strftime("%m/%d 週"), get_week(user_data, d)["minutes"]) for d in trend_days]
+
+    embed = discord.Embed(title=title, color=discord.Color.teal())
+    format_stats_bucket(embed, bucket)
+
+    peak = max(minutes for _, minutes in trend) or 1
     embed.add_field(
-        name="📊 統計",
-        value=f"總任務: {len(user_data['tasks'])} | 待完成: {len(incomplete)} | 已完成: {len(completed)}\n預估總時間: {total_estimated} 分鐘 ({total_estimated/60:.1f} 小時)",
+        name="📈 趨勢",
+        value="\n".join(f"`{label}` {'█' * round(minutes / peak * 10):<10} {minutes:.0f} 分" for label, minutes in trend),
         inline=False
     )
+    embed.set_footer(text="統計在每次結束計時、新增或完成任務時更新")
+
+    await ctx.respond(embed=embed)
+
+# ==================== 讀書計畫 ====================
+
+@bot.slash_command(name="讀書計畫", description="依截止日與把握度排出每天該做的事")
+async def study_plan(
+    ctx: discord.ApplicationContext,
+    每日分鐘: Option(int, "每天可以讀書的分鐘數", required=False, default=120, min_value=10, max_value=1440),
+    天數: Option(int, "要排幾天", required=False, default=7, min_value=1, max_value=14)
+):
+    """產生讀書計畫"""
+    user_id = str(ctx.author.id)
+    user_data = get_user_data(user_id)
+    today = datetime.now().date()
+    
+    items = build_items(user_data, today, 天數)
+    if not items:
+        await ctx.respond("🎉 目前沒有未完成的任務，好好休息吧!")
+        return
+    
+    result = plan(items, 每日分鐘, today, 天數)
+    
+    embed = discord.Embed(
+        title="🗓️ 讀書計畫",
+        description=f"共 {len(items)} 項，每天 {每日分鐘} 分鐘，排 {天數} 天\n(截止日早、把握度低的優先；預估時間已依計時紀錄修正)",
+        color=discord.Color.blue()
+    )
+    weekdays = ['一', '二', '三', '四', '五', '六', '日']
+    for day, slots in result["days"]:
+        if not slots:
+            continue
+        used = sum(minutes for _, minutes in slots)
+        lines = [f"• {item['label']} - {minutes:.0f}分" for item, minutes in slots[:8]]
+        if len(slots) > 8:
+            lines.append(f"... 還有 {len(slots) - 8} 項")
+        embed.add_field(
+            name=f"{day.strftime('%m/%d')} (週{weekdays[day.weekday()]}) {used:.0f}/{每日分鐘} 分鐘",
+            value="\n".join(lines)[:1024],
+            inline=False
+        )
+    
+    if result["late"]:
+        late_lines = [
+            f"• {item['label']} (截止 {item['deadline'].strftime('%m/%d')}，差 {minutes:.0f} 分)"
+            for item, minutes in result["late"][:10]
+        ]
+        embed.add_field(name=f"⚠️ 來不及 ({len(result['late'])}項)", value="\n".join(late_lines)[:1024], inline=False)
+        embed.add_field(
+            name="💡 建議",
+            value=f"要在截止前全部完成，每天大約需要 **{needed_daily_minutes(items, today)}** 分鐘",
+            inline=False
+        )
+        embed.color = discord.Color.red()
+    if result["unscheduled"]:
+        embed.set_footer(text=f"另有 {len(result['unscheduled'])} 項排在 {天數} 天之後")
     
     await ctx.respond(embed=embed)
 
+# ==================== 截止提醒 ====================
+
+async def send_task_reminders(user_id: str, tasks: List[Dict]):
+    """私訊使用者即將截止的任務 (同一批合併成一則)"""
+    user = bot.get_user(int(user_id)) or await bot.fetch_user(int(user_id))
+
+    embed = discord.Embed(
+        title="⏰ 截止提醒",
+        description=f"你有 {len(tasks)} 個任務快要截止了!",
+        color=discord.Color.orange()
+    )
+    for task in tasks[:25]:
+        deadline = datetime.fromisoformat(task["deadline"]).strftime("%m/%d %H:%M")
+        detail = task.get("pages") or task.get("range", "")
+        embed.add_field(
+            name=f"#{task['id']} {task['subject']} {task['type']}",
+            value=f"{detail}\n截止: {deadline}",
+            inline=False
+        )
+    embed.set_footer(text="完成後記得使用 /完成任務 標記喔!")
+    await user.send(embed=embed)
+
+    # 記錄已提醒，重新啟動後不會重複提醒
+    reminded_ids = {task["id"] for task in tasks}
+    data = load_data()
+    for task in data.get(user_id, {}).get("tasks", []):
+        if task["id"] in reminded_ids:
+            task["reminded"] = True
+    save_data(data)
+
+reminder_service = ReminderService(send_task_reminders, owns=owns_user)
+
+# ==================== 通知頻道 ====================
+
+# 事件種類 -> (摘要標題, 每一行的格式)
+NOTIFICATION_KINDS = {
+    "homework": ("📝 {count} 個作業新增", lambda e: f"{e['user']} {e['subject']} (截止 {e['deadline']})"),
+    "chat": ("💬 {count} 次談心", lambda e: f"{e['user']} 第 {e['count']} 次"),
+}
+# 每一類最多列出幾行，其餘只顯示數量
+NOTIFICATION_LINES = 10
+
+async def send_notification_digest(events: List[Dict], stats: Dict):
+    """把一段時間內的通知事件合併成一則摘要送到通知頻道"""
+    grouped = defaultdict(list)
+    for event in events:
+        grouped[event["kind"]].append(event)
+
+    minutes = max(1, round(NOTIFY_INTERVAL / 60))
+    embed = discord.Embed(
+        title=f"🔔 最近 {minutes} 分鐘動態",
+        color=discord.Color.blue()
+    )
+    for kind, (title, line) in NOTIFICATION_KINDS.items():
+        items = grouped.get(kind)
+        if not items:
+            continue
+        lines = [line(e) for e in items[:NOTIFICATION_LINES]]
+        if len(items) > NOTIFICATION_LINES:
+            lines.append(f"...還有 {len(items) - NOTIFICATION_LINES} 則")
+        embed.add_field(name=title.format(count=len(items)), value="\n".join(lines)[:1024], inline=False)
+    footer = f"合併 {len(events)} 則通知"
+    if stats["dropped"]:
+        footer += f" · 累計因佇列已滿丟棄 {stats['dropped']} 則"
+    embed.set_footer(text=footer)
+    embed.timestamp = datetime.now()
+    await send_to_channel(NOTIFICATION_CHANNEL_ID, embed=embed)
+    logging.info(f"🔔 已送出通知摘要：{len(events)} 則 (累計合併 {stats['merged']}、丟棄 {stats['dropped']})")
+
+notifier = NotificationBatcher(send_notification_digest)
+
 # ==================== 番茄鐘與語音指令 ====================
 
-active_pomodoros = {} 
-background_music_tasks = {}
+class CachedOpusAudio(discord.AudioSource):
+    """直接送出預先轉好的 Opus 封包：不開 ffmpeg 子行程，也不用重新編碼 PCM"""
+
+    def __init__(self, packets, loop=False):
+        self.frames = OpusLoop(packets, loop)
+
+    def read(self):
+        return self.frames.next_packet()
+
+    def is_opus(self):
+        return True
+
+def make_bell_source(loop):
+    """產生提示音音源，優先使用快取的 Opus 封包，轉檔失敗才退回 FFmpeg 即時解碼"""
+    try:
+        return CachedOpusAudio(load_sound(SOUND_FILE_PATH), loop)
+    except SoundUnavailable:
+        pass  # 第一次失敗時已記錄，直接退回
+    except Exception as e:
+        logging.error(f"⚠️ 音效快取無法使用，改用 FFmpeg 播放: {e}")
+    ffmpeg_options = {'options': '-vn'}
+    if loop:
+        ffmpeg_options['before_options'] = '-stream_loop -1'
+    return discord.FFmpegPCMAudio(SOUND_FILE_PATH, **ffmpeg_options)
+
+# 每個伺服器一個播放器，播放結束靠 after= 回呼通知，不再輪詢
+playback = PlaybackManager(make_bell_source)
 
 async def play_bell_sound(ctx, duration_seconds=10):
     """連接語音頻道並循環播放音檔一段時間"""
@@ -1288,180 +1760,199 @@ async def play_bell_sound(ctx, duration_seconds=10):
         await ctx.channel.send("❌ 你必須在語音頻道中才能播放音樂！")
         return
 
-    voice_channel = ctx.author.voice.channel
-    sound_file = SOUND_FILE_PATH
-
     # 檢查檔案是否存在
-    if not os.path.exists(sound_file):
-        await ctx.channel.send(f"❌ 找不到音效檔案: {sound_file}")
-        logging.error(f"音效檔案不存在: {sound_file}")
+    if not os.path.exists(SOUND_FILE_PATH):
+        await ctx.channel.send(f"❌ 找不到音效檔案: {SOUND_FILE_PATH}")
+        logging.error(f"音效檔案不存在: {SOUND_FILE_PATH}")
         return
 
     try:
-        vc = ctx.voice_client
-        if not vc:
-            vc = await voice_channel.connect()
-        elif vc.channel != voice_channel:
-            await vc.move_to(voice_channel)
-
-        end_time = asyncio.get_event_loop().time() + duration_seconds
-        
-        while asyncio.get_event_loop().time() < end_time and vc.is_connected():
-            if not vc.is_playing():
-                vc.play(discord.FFmpegPCMAudio(sound_file))
-            await asyncio.sleep(0.5)
-        
-        if vc.is_playing():
-            vc.stop()
-            
+        player = playback.get(ctx.guild.id)
+        await player.connect(ctx.author.voice.channel)
+        await player.play_for(duration_seconds, owner=ctx.author.id)
     except Exception as e:
         logging.error(f"語音播放出錯: {e}")
         await ctx.channel.send(f"⚠️ 語音播放失敗: {e}")
 
-async def play_infinite_bell(ctx, user_id):
-    """使用 FFmpeg 內建循環功能實現無縫無限播放"""
-    if not ctx.author.voice:
-        await ctx.channel.send("❌ 你必須在語音頻道中才能播放音樂！")
-        return
-
-    voice_channel = ctx.author.voice.channel
-    sound_file = SOUND_FILE_PATH
-
+async def start_background_music(owner, voice_channel, text_channel):
+    """啟動 (或重新啟動) 背景音樂，直到 /停止音樂 或讀書房結束；owner 為使用者或讀書房"""
     # 檢查檔案是否存在
-    if not os.path.exists(sound_file):
-        await ctx.channel.send(f"❌ 找不到音效檔案: {sound_file}")
-        logging.error(f"音效檔案不存在: {sound_file}")
+    if not os.path.exists(SOUND_FILE_PATH):
+        await text_channel.send(f"❌ 找不到音效檔案: {SOUND_FILE_PATH}")
+        logging.error(f"音效檔案不存在: {SOUND_FILE_PATH}")
         return
 
     try:
-        vc = ctx.voice_client
-        if not vc:
-            vc = await voice_channel.connect()
-        elif vc.channel != voice_channel:
-            await vc.move_to(voice_channel)
-
-        logging.info(f"🔁 開始無限循環播放音效 (使用者: {user_id})")
-        
-        ffmpeg_options = {
-            'before_options': '-stream_loop -1',
-            'options': '-vn'
-        }
-        
-        source = discord.FFmpegPCMAudio(sound_file, **ffmpeg_options)
-        vc.play(source)
-        
-        while vc.is_connected() and user_id in background_music_tasks:
-            await asyncio.sleep(1)
-        
-        if vc.is_playing():
-            vc.stop()
-        
-        logging.info(f"⏹️ 停止無限循環播放 (使用者: {user_id})")
-            
-    except asyncio.CancelledError:
-        logging.info(f"🛑 無限播放被取消 (使用者: {user_id})")
-        if vc and vc.is_playing():
-            vc.stop()
+        player = playback.get(voice_channel.guild.id)
+        await player.connect(voice_channel)
+        player.play(loop=True, owner=owner)
+        logging.info(f"🔁 開始無限循環播放音效 ({owner})")
     except Exception as e:
         logging.error(f"❌ 無限播放出錯: {e}")
-        await ctx.channel.send(f"⚠️ 音樂播放失敗: {e}")
-
-async def pomodoro_task_logic(ctx, user_id):
-    """番茄鐘核心流程"""
-    try:
-        await ctx.channel.send(
-            f"🍅 {ctx.author.mention} **專注模式開始！** 倒數 25 分鐘。\n"
-            f"🎵 背景音樂已啟動，使用 `/停止番茄鐘` 來停止。\n"
-            f"讓我們再創高峰，這會很偉大！"
-        )
-        
-        music_task = asyncio.create_task(play_infinite_bell(ctx, user_id))
-        background_music_tasks[user_id] = music_task
-        
-        await asyncio.sleep(25 * 60) 
-        
-        await ctx.channel.send(
-            f"{ctx.author.mention} ⏰ **專注時間到！** 休息時間開始。\n"
+        await text_channel.send(f"⚠️ 音樂播放失敗: {e}")
+
+def stop_background_music(guild_id, user_id):
+    """停止使用者啟動的、或自己所在讀書房的背景音樂，回傳是否有停止"""
+    player = playback.find(guild_id)
+    if player is None or not player.is_playing:
+        return False
+    room = pomodoro_manager.get(player.owner)
+    if player.owner != user_id and not (room and user_id in room["members"]):
+        return False
+    player.stop()
+    logging.info(f"⏹️ 停止無限循環播放 (使用者: {user_id})")
+    return True
+
+def room_mentions(session):
+    return " ".join(f"<@{member}>" for member in session["members"])
+
+async def close_room(session):
+    """讀書房結束或沒人了：停止音樂並離開語音頻道"""
+    if session.get("guild_id"):
+        await playback.disconnect(session["guild_id"])
+
+async def on_pomodoro_phase(session, previous):
+    """番茄鐘換階段時由排程器呼叫 (不再為每個番茄鐘保留一個 sleep 中的 coroutine)"""
+    phase = session["phase"]
+    if phase == FINISHED:
+        await close_room(session)
+    channel = bot.get_channel(session["channel_id"])
+    if channel is None:
+        return
+    mention = room_mentions(session)
+    progress = f"(第 {session['cycle']}/{session['cycles']} 輪)" if session["cycles"] > 1 else ""
+
+    if phase in (BREAK, LONG_BREAK):
+        minutes = phase_minutes(session, phase)
+        label = "長休息" if phase == LONG_BREAK else "休息"
+        await channel.send(
+            f"{mention} ⏰ **專注時間到！** 休息時間開始。{progress}\n"
             f"🎵 音樂持續播放中..."
         )
-
-        await ctx.channel.send(f"☕ {ctx.author.mention} 現在自動進入 **5 分鐘休息模式**。喝杯咖啡，放鬆一下。")
-        await asyncio.sleep(5 * 60) 
-
-        await ctx.channel.send(
-            f"{ctx.author.mention} ⚡ **休息結束！** 能量充滿，準備好開始下一場勝利了嗎？\n"
-            f"💡 使用 `/停止番茄鐘` 來停止音樂和計時器。"
+        await channel.send(f"☕ {mention} 現在自動進入 **{minutes} 分鐘{label}模式**。喝杯咖啡，放鬆一下。")
+    elif phase == FOCUS:
+        await channel.send(
+            f"{mention} ⚡ **休息結束！** 第 {session['cycle']}/{session['cycles']} 輪專注開始，"
+            f"倒數 {session['focus_minutes']} 分鐘。"
+        )
+    else:
+        await channel.send(
+            f"{mention} ⚡ **休息結束！** 能量充滿，準備好開始下一場勝利了嗎？\n"
+            f"🏁 這次的讀書房已經結束，想繼續就再用一次 `/番茄鐘`。"
         )
 
-        if user_id in active_pomodoros:
-            del active_pomodoros[user_id]
-            
-    except asyncio.CancelledError:
-        logging.info(f"使用者 {user_id} 的番茄鐘已取消")
-        if user_id in background_music_tasks:
-            background_music_tasks[user_id].cancel()
-            del background_music_tasks[user_id]
-    except Exception as e:
-        logging.error(f"番茄鐘流程出錯: {e}")
-        await ctx.channel.send(f"⚠️ 番茄鐘發生錯誤: {e}")
-
-@bot.slash_command(name="番茄鐘", description="開始番茄鐘 (25分專注+5分休息)")
-async def pomodoro(ctx: discord.ApplicationContext):
-    """開始番茄鐘"""
+pomodoro_manager = PomodoroManager(on_pomodoro_phase, process_path(POMODORO_FILE))
+
+async def restore_pomodoros():
+    """重新啟動後接續上次的讀書房，並回到原本的語音頻道播放音樂"""
+    for session in pomodoro_manager.restore():
+        channel = bot.get_channel(session["channel_id"])
+        voice_channel = bot.get_channel(session["voice_channel_id"]) if session.get("voice_channel_id") else None
+        if voice_channel is not None and channel is not None:
+            await start_background_music(pomodoro_manager.key_of(session), voice_channel, channel)
+        if channel is not None:
+            remaining = max(0, int((session["phase_ends_at"] - time.time()) // 60))
+            await channel.send(f"🔄 {room_mentions(session)} 機器人已重新上線，番茄鐘繼續進行 (本階段剩約 {remaining} 分鐘)。")
+
+@bot.slash_command(name="番茄鐘", description="開始或加入讀書房番茄鐘 (預設25分專注+5分休息，可設定循環與長休息)")
+async def pomodoro(
+    ctx: discord.ApplicationContext,
+    循環次數: Option(int, "要進行幾輪專注", required=False, default=1, min_value=1, max_value=12),
+    專注分鐘: Option(int, "每輪專注分鐘數", required=False, default=25, min_value=1, max_value=120),
+    休息分鐘: Option(int, "短休息分鐘數", required=False, default=5, min_value=1, max_value=60),
+    長休息分鐘: Option(int, "長休息分鐘數", required=False, default=15, min_value=1, max_value=120),
+    長休息間隔: Option(int, "每幾輪專注後長休息", required=False, default=4, min_value=1, max_value=12)
+):
+    """開始番茄鐘；伺服器已經有讀書房時直接加入"""
     user_id = ctx.author.id
-    
+    guild_id = ctx.guild.id if ctx.guild else None
+    key = room_key(guild_id, user_id)
+    room = pomodoro_manager.get(key)
+
+    # 別人開的讀書房：加入共用的計時器與音樂，不重新計時
+    if room is not None and room["members"] != [user_id]:
+        if user_id in room["members"]:
+            await ctx.respond("📚 你已經在讀書房裡了！使用 `/停止番茄鐘` 離開。")
+            return
+        pomodoro_manager.join(key, user_id)
+        remaining = max(0, int((room["phase_ends_at"] - time.time()) // 60))
+        voice_hint = f"語音頻道 <#{room['voice_channel_id']}>，" if room.get("voice_channel_id") else ""
+        await ctx.respond(
+            f"🤝 {ctx.author.mention} 加入讀書房！目前 {len(room['members'])} 人一起讀書。\n"
+            f"{voice_hint}本階段剩約 {remaining} 分鐘。"
+        )
+        return
+
     # ✅ 先回應，避免 timeout
-    if user_id in active_pomodoros:
-        active_pomodoros[user_id].cancel()
+    if room is not None:
         await ctx.respond("🔄 偵測到舊的計時器，已為你重新啟動！")
     else:
         await ctx.respond("🚀 番茄鐘啟動！大家一起加油！")
 
-    if ctx.author.voice:
+    voice_channel = ctx.author.voice.channel if ctx.author.voice else None
+    if voice_channel:
         try:
-            if not ctx.voice_client:
-                await ctx.author.voice.channel.connect()
-            elif ctx.voice_client.channel != ctx.author.voice.channel:
-                await ctx.voice_client.move_to(ctx.author.voice.channel)
+            await playback.get(guild_id).connect(voice_channel)
         except Exception as e:
             logging.error(f"加入語音失敗: {e}")
             await ctx.channel.send(f"⚠️ 無法加入語音頻道: {e}")
 
-    task = asyncio.create_task(pomodoro_task_logic(ctx, user_id))
-    active_pomodoros[user_id] = task
+    session = new_session(
+        user_id, guild_id, ctx.channel.id,
+        voice_channel.id if voice_channel else None,
+        cycles=循環次數, focus_minutes=專注分鐘, break_minutes=休息分鐘,
+        long_break_minutes=長休息分鐘, long_break_every=長休息間隔
+    )
+    pomodoro_manager.start(session)
+
+    rounds = f"共 {循環次數} 輪，" if 循環次數 > 1 else ""
+    await ctx.channel.send(
+        f"🍅 {ctx.author.mention} **專注模式開始！** {rounds}倒數 {專注分鐘} 分鐘。\n"
+        f"🎵 背景音樂已啟動，其他人可以用 `/番茄鐘` 加入，使用 `/停止番茄鐘` 離開。\n"
+        f"讓我們再創高峰，這會很偉大！"
+    )
+    if voice_channel:
+        await start_background_music(key, voice_channel, ctx.channel)
 
-@bot.slash_command(name="停止番茄鐘", description="停止目前的番茄鐘計時")
+@bot.slash_command(name="停止番茄鐘", description="離開讀書房 (最後一人離開時停止計時)")
 async def stop_pomodoro(ctx: discord.ApplicationContext):
-    """停止番茄鐘"""
+    """離開讀書房，沒有人時停止番茄鐘"""
     user_id = ctx.author.id
-    
-    if user_id in active_pomodoros:
-        active_pomodoros[user_id].cancel()
-        del active_pomodoros[user_id]
-        
-        if user_id in background_music_tasks:
-            background_music_tasks[user_id].cancel()
-            del background_music_tasks[user_id]
-        
-        if ctx.voice_client:
-            await ctx.voice_client.disconnect()
-            
-        await ctx.respond("🛑 番茄鐘已停止。我們不需要休息，我們只需要勝利！")
-    else:
+    key = room_key(ctx.guild.id if ctx.guild else None, user_id)
+    room = pomodoro_manager.get(key)
+
+    if room is None or user_id not in room["members"]:
         await ctx.respond("❌ 你目前沒有正在執行的番茄鐘。")
+        return
+
+    pomodoro_manager.leave(key, user_id)
+    if key in pomodoro_manager:
+        await ctx.respond(f"👋 你已離開讀書房，還有 {len(room['members'])} 人繼續加油！")
+        return
+
+    await close_room(room)
+    await ctx.respond("🛑 番茄鐘已停止。我們不需要休息，我們只需要勝利！")
+
+@bot.listen("on_voice_state_update")
+async def leave_room_on_voice_exit(member, before, after):
+    """成員離開讀書房的語音頻道就自動退出，沒人時結束讀書房並斷線"""
+    if member.bot or before.channel is None or before.channel == after.channel:
+        return
+    key = room_key(member.guild.id, member.id)
+    room = pomodoro_manager.get(key)
+    if room is None or room.get("voice_channel_id") != before.channel.id or member.id not in room["members"]:
+        return
+    pomodoro_manager.leave(key, member.id)
+    if key not in pomodoro_manager:
+        await close_room(room)
+        channel = bot.get_channel(room["channel_id"])
+        if channel is not None:
+            await channel.send("🚪 讀書房已經沒有人了，番茄鐘結束並離開語音頻道。")
 
 @bot.slash_command(name="停止音樂", description="停止背景提醒音樂")
 async def stop_music(ctx: discord.ApplicationContext):
     """停止無限循環的提醒音樂"""
-    user_id = ctx.author.id
-    
-    if user_id in background_music_tasks:
-        background_music_tasks[user_id].cancel()
-        del background_music_tasks[user_id]
-        
-        if ctx.voice_client and ctx.voice_client.is_playing():
-            ctx.voice_client.stop()
-        
+    if ctx.guild and stop_background_music(ctx.guild.id, ctx.author.id):
         await ctx.respond("🔇 已停止提醒音樂！")
     else:
         await ctx.respond("❌ 目前沒有正在播放的提醒音樂。")
@@ -1476,10 +1967,7 @@ async def join_voice(ctx: discord.ApplicationContext):
     channel = ctx.author.voice.channel
     
     try:
-        if ctx.voice_client:
-            await ctx.voice_client.move_to(channel)
-        else:
-            await channel.connect()
+        await playback.get(ctx.guild.id).connect(channel)
         await ctx.respond(f"🔊 已加入語音頻道：**{channel.name}**")
     except Exception as e:
         logging.error(f"加入語音失敗: {e}")
@@ -1510,16 +1998,9 @@ async def test_infinite_music(ctx: discord.ApplicationContext):
         await ctx.followup.send("❌ 你必須先進入一個語音頻道！")
         return
     
-    user_id = ctx.author.id
-    
-    if user_id in background_music_tasks:
-        background_music_tasks[user_id].cancel()
-        del background_music_tasks[user_id]
-    
     await ctx.followup.send("🔁 開始無限循環播放音樂！使用 `/停止音樂` 來停止。")
     
-    music_task = asyncio.create_task(play_infinite_bell(ctx, user_id))
-    background_music_tasks[user_id] = music_task
+    await start_background_music(ctx.author.id, ctx.author.voice.channel, ctx.channel)
 
 @bot.slash_command(name="開啟連結", description="顯示連結按鈕")
 async def open_link(ctx: discord.ApplicationContext):
@@ -1535,11 +2016,235 @@ async def open_link(ctx: discord.ApplicationContext):
     
     await ctx.respond("點擊下方按鈕開啟連結：", view=view)
 
-# ==================== Events ====================
+# ==================== 背景工作 ====================
+
+job_queue = JobQueue()
+worker_processes = []
+
+def start_workers():
+    """啟動背景 worker 行程 (CPU 工作完全不在機器人行程內執行)"""
+    worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+    for group, count in (("ingest", INGEST_WORKERS), ("llm", LLM_WORKERS)):
+        if count > 0:
+            worker_processes.append(subprocess.Popen(
+                [sys.executable, worker_script, "--kinds", group, "--processes", str(count)]
+            ))
+            logging.info(f"🛠️ 已啟動 {count} 個 {group} worker")
+
+@atexit.register
+def stop_workers():
+    for process in worker_processes:
+        process.terminate()
+    # worker 收到 SIGTERM 會先結束自己的子行程，等它們結束再離開
+    for process in worker_processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+@metrics.timed("send_to_channel")
+async def send_to_channel(channel_id: Optional[int], *args, **kwargs):
+    """傳訊息到指定頻道 (找不到頻道就略過)"""
+    if not channel_id:
+        return
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        try:
+            channel = await bot.fetch_channel(channel_id)
+        except discord.DiscordException as e:
+            logging.error(f"找不到頻道 {channel_id}: {e}")
+            return
+    await channel.send(*args, **kwargs)
+
+async def on_quiz_job(job: Dict):
+    """把背景出好的題目貼到頻道"""
+    subject = job["payload"]["subject"]
+    if job["status"] == "failed":
+        await send_to_channel(job["channel_id"], f"<@{job['user_id']}> ❌ 出題系統發生錯誤: {job['error']}")
+        return
+
+    from llm import QuizQuestion
+
+    quiz = QuizQuestion(**job["result"]["quiz"])
+    # 格式化題目顯示
+    question_text = (
+        f"<@{job['user_id']}> 📝 **{subject} 題目**\n\n"
+        f"{quiz.question}\n\n"
+        f"**A.** {quiz.option_a}\n"
+        f"**B.** {quiz.option_b}\n"
+        f"**C.** {quiz.option_c}\n"
+        f"**D.** {quiz.option_d}"
+    )
+    # 建立按鈕 View
+    view = QuizView(quiz, job["user_id"], subject, job["payload"].get("chunk_id"), f"job-{job['id']}")
+    await send_to_channel(job["channel_id"], question_text, view=view)
+
+async def on_personality_job(job: Dict):
+    """把個性分析結果存回使用者資料"""
+    if job["status"] == "failed" or not job["result"]["personality"]:
+        return
+    user_id = str(job["user_id"])
+    data = load_data()
+    user_data = get_user_data(user_id)
+    user_data["personality_profile"] = job["result"]["personality"]
+    data[user_id] = user_data
+    save_data(data)
+
+async def on_knowledge_job(job: Dict):
+    """題庫處理完成後重新載入並通知"""
+    if job["status"] == "failed":
+        await send_to_channel(job["channel_id"], f"❌ 更新題庫時發生錯誤: {job['error']}")
+        return
+    if job["kind"] == "ingest_file":
+        await asyncio.to_thread(reload_category, job["payload"]["category"])
+        return
+    await asyncio.to_thread(load_all_knowledge)
+    await send_to_channel(job["channel_id"], f"✅ 題庫已更新完成！目前有 {len(knowledge_cache)} 個分類。")
+
+JOB_RESULT_HANDLERS = {
+    "generate_quiz": on_quiz_job,
+    "analyze_personality": on_personality_job,
+    "ingest_file": on_knowledge_job,
+    "ingest_all": on_knowledge_job,
+    "compile_knowledge": on_knowledge_job,
+}
+
+async def dispatch_job_results():
+    """把背景 worker 完成的工作結果送回 Discord"""
+    while True:
+        try:
+            jobs = await asyncio.to_thread(
+                job_queue.pop_finished, list(JOB_RESULT_HANDLERS), owner=JOB_OWNER, include_unowned=IS_PRIMARY,
+            )
+            for job in jobs:
+                # 背景工作排隊與執行時間 (出題的 LLM 呼叫、PDF 處理都在 worker 行程中)
+                if job["started_at"]:
+                    metrics.observe("job_queue_seconds", job["started_at"] - job["created_at"], kind=job["kind"])
+                    if job["finished_at"]:
+                        metrics.observe("job_run_seconds", job["finished_at"] - job["started_at"], kind=job["kind"])
+                try:
+                    await JOB_RESULT_HANDLERS[job["kind"]](job)
+                except Exception as e:
+                    logging.error(f"處理工作 #{job['id']} 結果失敗: {e}")
+        except Exception as e:
+            logging.error(f"工作佇列錯誤: {e}")
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+# ==================== 效能量測 ====================
+
+# 指令開始執行的時間 { id(ctx): perf_counter }
+command_started = {}
+
+async def metrics_before_command(ctx: discord.ApplicationContext):
+    command_started[id(ctx)] = time.perf_counter()
+    # 從使用者送出指令到處理器開始執行 (gateway 延遲 + 事件迴圈排隊)
+    queued = (discord.utils.utcnow() - ctx.interaction.created_at).total_seconds()
+    metrics.observe("command_queue_seconds", max(0.0, queued), command=ctx.command.qualified_name)
+
+async def metrics_after_command(ctx: discord.ApplicationContext):
+    started = command_started.pop(id(ctx), None)
+    if started is not None:
+        metrics.observe("command_seconds", time.perf_counter() - started, command=ctx.command.qualified_name)
+
+async def metrics_command_error(ctx: discord.ApplicationContext, error):
+    name = ctx.command.qualified_name if ctx.command else ""
+    metrics.inc("command_errors_total", command=name)
+    # 有 listener 時 py-cord 不會再印出預設的錯誤訊息，這裡自己記下 traceback
+    logging.error(f"❌ 指令 /{name} 發生錯誤: {error}", exc_info=error)
+
+# 關閉時完全不掛上 hook，指令執行沒有任何額外成本
+if metrics.enabled:
+    bot.before_invoke(metrics_before_command)
+    bot.after_invoke(metrics_after_command)
+    bot.add_listener(metrics_command_error, "on_application_command_error")
+
+def format_metric_rows(rows, limit=10):
+    return "\n".join(
+        f"`{row['name']}` ×{row['count']} | p50 {row['p50'] * 1000:.0f} ms | p99 {row['p99'] * 1000:.0f} ms"
+        for row in rows[:limit]
+    ) or "尚無資料"
+
+@bot.slash_command(
+    name="效能統計", description="(管理員) 查看指令與各段處理的耗時",
+    default_member_permissions=discord.Permissions(administrator=True),
+)
+async def metrics_report(ctx: discord.ApplicationContext):
+    """顯示效能量測結果"""
+    if not metrics.enabled:
+        await ctx.respond("📊 效能量測未開啟，請設定 `METRICS_ENABLED=1` 後重新啟動。", ephemeral=True)
+        return
+
+    embed = discord.Embed(title="📊 效能統計", color=discord.Color.blue())
+    commands = metrics.summary("command_seconds", "command")
+    for row in commands:
+        errors = metrics.counter_total("command_errors_total", command=row["name"])
+        if errors:
+            row["name"] += f" (錯誤 {errors:g})"
+    embed.add_field(name="⌨️ 指令 (依總耗時)", value=format_metric_rows(commands), inline=False)
+    embed.add_field(name="⏳ 指令排隊", value=format_metric_rows(metrics.summary("command_queue_seconds", "command"), 5), inline=False)
+    embed.add_field(name="🔬 各段處理", value=format_metric_rows(metrics.summary("span_seconds", "span")), inline=False)
+    embed.add_field(name="🛠️ 背景工作執行", value=format_metric_rows(metrics.summary("job_run_seconds", "kind")), inline=False)
+    embed.add_field(name="📥 背景工作排隊", value=format_metric_rows(metrics.summary("job_queue_seconds", "kind")), inline=False)
+    if METRICS_PORT:
+        embed.set_footer(text=f"Prometheus: http://{METRICS_HOST}:{METRICS_PORT + PROCESS_INDEX}/metrics")
+    await ctx.respond(embed=embed, ephemeral=True)
+
+async def sync_shared_state(version: int):
+    """多行程時：把其他行程改過的使用者資料同步到本行程的提醒排程、複習索引與答題熟練度"""
+    while True:
+        await asyncio.sleep(STATE_SYNC_INTERVAL)
+        try:
+            changed, version = await asyncio.to_thread(user_store.changed_since, version)
+            for user_id, user_data in changed.items():
+                due_index.reset_user(user_id, user_data.get("cards", {}).values())
+                reminder_service.sync_user(user_id, user_data.get("tasks", []))
+            await asyncio.to_thread(mastery_tracker.follow)
+        except Exception as e:
+            logging.error(f"同步共用資料失敗: {e}")
+
+knowledge_watch_task = None
+job_dispatch_task = None
+reminder_task = None
+pomodoro_task = None
+notification_task = None
+sync_task = None
+metrics_server = None
 
 @bot.event
 async def on_ready():
+    global knowledge_watch_task, job_dispatch_task, reminder_task, pomodoro_task, notification_task, sync_task, metrics_server
     load_all_knowledge()
+    # on_ready 在重新連線時也會觸發，背景工作只啟動一次
+    if KNOWLEDGE_WATCH_INTERVAL > 0 and knowledge_watch_task is None:
+        knowledge_watch_task = asyncio.create_task(watch_knowledge())
+    if job_dispatch_task is None:
+        if IS_PRIMARY:
+            start_workers()
+        job_dispatch_task = asyncio.create_task(dispatch_job_results())
+    if reminder_task is None:
+        version = user_store.version() if user_store else 0
+        reminder_service.load(load_data())
+        due_index.load(load_data())
+        await asyncio.to_thread(mastery_tracker.load)
+        reminder_task = asyncio.create_task(reminder_service.run())
+        if MULTI_PROCESS:
+            sync_task = asyncio.create_task(sync_shared_state(version))
+    if pomodoro_task is None:
+        # 先把音效轉成 Opus 放進記憶體，第一次播放就不用等轉檔
+        try:
+            await asyncio.to_thread(load_sound, SOUND_FILE_PATH)
+        except Exception as e:
+            logging.error(f"⚠️ 預先載入音效失敗: {e}")
+        await restore_pomodoros()
+        pomodoro_task = asyncio.create_task(pomodoro_manager.run())
+    if notification_task is None:
+        notification_task = asyncio.create_task(notifier.run())
+    if metrics.enabled and METRICS_PORT and metrics_server is None:
+        try:
+            # 多行程時每個行程用不同的埠
+            metrics_server = await serve_metrics(metrics, port=METRICS_PORT + PROCESS_INDEX)
+        except OSError as e:
+            logging.error(f"⚠️ 無法開啟效能量測端點: {e}")
     logging.info(f'{bot.user} 已上線!讀書計畫機器人準備就緒 📚')
     print(f'{bot.user} 已登入')
     print(f"✅ 題庫已載入，共 {len(knowledge_cache)} 個分類")
@@ -0,0 +1,216 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# 多個機器人行程共用的使用者資料 (空白 = 沿用 study_data.json)
+USER_DB = os.getenv("USER_DB", "")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data    TEXT NOT NULL,
+    version INTEGER NOT NULL   -- 每次寫入遞增，其他行程據此得知哪些使用者被改過
+);
+CREATE INDEX IF NOT EXISTS users_version ON users (version);
+"""
+
+_MISSING = object()
+
+
+def _is_id_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, dict) and "id" in item for item in value)
+
+
+def merge(base: Any, ours: Any, theirs: Any) -> Any:
+    """三方合併：base 是讀取時的內容，ours 是這次要寫入的，theirs 是其他行程已寫入的
+
+    只有一邊改過的部分取改過的那邊；字典逐鍵合併，有 id 的列表 (任務) 逐項合併，
+    兩邊改了同一個值時以這次寫入為準。缺少的鍵以 _MISSING 表示。
+    """
+    if ours == theirs or theirs == base:
+        return ours
+    if ours == base:
+        return theirs
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(theirs) + [key for key in ours if key not in theirs]:
+            value = merge(base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING))
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+    if _is_id_list(ours) and _is_id_list(theirs):
+        base_items = {item["id"]: item for item in base} if _is_id_list(base) else {}
+        our_items = {item["id"]: item for item in ours}
+        their_items = {item["id"]: item for item in theirs}
+        merged = []
+        for item_id in list(their_items) + [item_id for item_id in our_items if item_id not in their_items]:
+            value = merge(base_items.get(item_id, _MISSING), our_items.get(item_id, _MISSING),
+                          their_items.get(item_id, _MISSING))
+            if value is not _MISSING:
+                merged.append(value)
+        return merged
+    return ours
+
+
+class UserMap(MutableMapping):
+    """load_all 回傳的資料：用到哪位使用者才解析哪位的 JSON，指令不必為其他使用者付出代價"""
+
+    def __init__(self, raw: Dict[str, str], versions: Dict[str, int]):
+        self._raw = raw
+        self._parsed: Dict[str, Dict] = {}
+        # 讀取時的內容與版本號 { user_id: (JSON, version) }，寫回時用來偵測其他行程的修改
+        self.bases: Dict[str, Tuple[str, int]] = {user_id: (raw[user_id], versions[user_id]) for user_id in raw}
+
+    def __getitem__(self, user_id: str) -> Dict:
+        if user_id not in self._parsed:
+            self._parsed[user_id] = json.loads(self._raw[user_id])
+        return self._parsed[user_id]
+
+    def __setitem__(self, user_id: str, user_data: Dict):
+        self._parsed[user_id] = user_data
+
+    def __delitem__(self, user_id: str):
+        if user_id not in self:
+            raise KeyError(user_id)
+        self._raw.pop(user_id, None)
+        self._parsed.pop(user_id, None)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._parsed or user_id in self._raw
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._raw
+        yield from (user_id for user_id in self._parsed if user_id not in self._raw)
+
+    def __len__(self) -> int:
+        return len(self._raw.keys() | self._parsed.keys())
+
+    def touched(self) -> Dict[str, Dict]:
+        """讀取或寫入過的使用者 (只有這些可能有變動)"""
+        return self._parsed
+
+
+class UserStore:
+    """以 SQLite 存放使用者資料，一位使用者一列
+
+    load_all / save_all 與原本的 load_data / save_data 用法相同，
+    但 save_all 只寫回內容有變動的使用者，且每位使用者以版本號 compare-and-swap：
+    讀取後有其他行程寫過同一位使用者 (例如提醒標記 reminded 的同時在另一個分片新增作業)，
+    就重新讀取最新內容並三方合併後再寫入，不會蓋掉對方的修改。
+    """
+
+    def __init__(self, path: str, legacy_json: str = ""):
+        self.path = path
+        # 不是從 load_all 讀來的資料 (例如搬移舊檔) 寫回時的比較基準 { user_id: (JSON, version) }
+        self._known: Dict[str, Tuple[str, int]] = {}
+        self._lock = threading.Lock()
+        # 寫入時遇到其他行程的修改而合併的次數
+        self.merges = 0
+        with self._connect() as conn:
+            # WAL 設定會保存在資料庫檔案中，只需設定一次
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            empty = conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+        if empty and legacy_json and os.path.exists(legacy_json):
+            with open(legacy_json, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            self.save_all(legacy)
+            logging.info(f"📦 已把 {legacy_json} 的 {len(legacy)} 位使用者搬到 {path}")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _dumps(user_data: Dict) -> str:
+        return json.dumps(user_data, ensure_ascii=False, sort_keys=True)
+
+    def load_all(self) -> UserMap:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT user_id, data, version FROM users").fetchall()
+        return UserMap({user_id: text for user_id, text, _ in rows}, {user_id: version for user_id, _, version in rows})
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, user_id: str, text: str, version: int, base_version: Optional[int]) -> bool:
+        """只在資料庫中的版本仍是 base_version 時寫入 (None = 還不存在)，回傳是否成功"""
+        if base_version is None:
+            cursor = conn.execute(
+                "INSERT INTO users (user_id, data, version) VALUES (?, ?, ?) ON CONFLICT (user_id) DO NOTHING",
+                (user_id, text, version),
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE users SET data = ?, version = ? WHERE user_id = ? AND version = ?",
+                (text, version, user_id, base_version),
+            )
+        return cursor.rowcount == 1
+
+    def save_all(self, data: Dict) -> int:
+        """寫回有變動的使用者，回傳寫入筆數"""
+        with self._lock:
+            if isinstance(data, UserMap):
+                users, bases = data.touched(), data.bases
+            else:
+                users, bases = data, self._known
+            changed = []
+            for user_id, user_data in users.items():
+                text = self._dumps(user_data)
+                if bases.get(user_id, (None, None))[0] != text:
+                    changed.append((user_id, text))
+            if not changed:
+                return 0
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM users").fetchone()[0]
+                    written = {}
+                    for user_id, text in changed:
+                        version += 1
+                        base_text, base_version = bases.get(user_id, (None, None))
+                        while not self._write(conn, user_id, text, version, base_version):
+                            # 其他行程在我們讀取之後寫過這位使用者：以最新內容合併後重試
+                            row = conn.execute(
+                                "SELECT data, version FROM users WHERE user_id = ?", (user_id,)
+                            ).fetchone()
+                            if row is None:
+                                base_version = None
+                                continue
+                            current_text, base_version = row
+                            base = json.loads(base_text) if base_text is not None else {}
+                            merged = merge(base, users[user_id], json.loads(current_text))
+                            users[user_id] = merged
+                            text, base_text = self._dumps(merged), current_text
+                            self.merges += 1
+                            logging.info(f"🔀 使用者 {user_id} 已被其他行程修改，合併後寫入")
+                        written[user_id] = (text, version)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            bases.update(written)
+            self._known.update(written)
+        return len(changed)
+
+    def version(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(MAX(version), 0) FROM users").fetchone()[0]
+
+    def changed_since(self, version: int) -> Tuple[Dict, int]:
+        """版本號大於 version 的使用者，回傳 ({使用者: 資料}, 最新版本號)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT user_id, data, version FROM users WHERE version > ? ORDER BY version", (version,)
+            ).fetchall()
+        if not rows:
+            return {}, version
+        return {user_id: json.loads(text) for user_id, text, _ in rows}, rows[-1][2]
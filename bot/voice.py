@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# 產生音源：make_source(loop) -> AudioSource，loop=True 時音源本身要無限循環
+SourceFactory = Callable[[bool], Any]
+
+
+class GuildPlayer:
+    """單一伺服器的語音播放 (一個伺服器只有一個 VoiceClient)
+
+    播放結束由 VoiceClient 的 after= 回呼通知，再透過 call_soon_threadsafe 回到事件迴圈，
+    等待播放的地方用 asyncio.Event，播放中或閒置時都不需要輪詢。
+    """
+
+    def __init__(self, guild_id: Hashable, make_source: SourceFactory):
+        self.guild_id = guild_id
+        self.make_source = make_source
+        self.voice_client = None
+        self.owner: Optional[Hashable] = None  # 誰啟動了目前的播放
+        self.looping = False
+        self._generation = 0  # 每次 play/stop 遞增，舊音源遲到的 after 回呼會被忽略
+        self._done = asyncio.Event()
+        self._done.set()
+
+    @property
+    def is_playing(self) -> bool:
+        return not self._done.is_set()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.voice_client is not None and self.voice_client.is_connected()
+
+    async def connect(self, voice_channel):
+        """加入或移動到指定語音頻道"""
+        vc = self.voice_client or voice_channel.guild.voice_client
+        if vc is None or not vc.is_connected():
+            vc = await voice_channel.connect()
+        elif vc.channel != voice_channel:
+            await vc.move_to(voice_channel)
+        self.voice_client = vc
+        return vc
+
+    def play(self, loop: bool = True, owner: Optional[Hashable] = None):
+        """開始播放 (會取代目前的播放)"""
+        self._stop_current()
+        self.looping = loop
+        self.owner = owner
+        self._done.clear()
+        self._start(self._generation)
+
+    def _start(self, generation: int):
+        event_loop = asyncio.get_running_loop()
+
+        def after(error):
+            # 在 py-cord 的播放執行緒中呼叫，轉交給事件迴圈處理
+            event_loop.call_soon_threadsafe(self._on_finished, generation, error)
+
+        self.voice_client.play(self.make_source(self.looping), after=after)
+
+    def _on_finished(self, generation: int, error):
+        if generation != self._generation:
+            return  # 已經被 stop 或新的 play 取代
+        if error is not None:
+            logging.error(f"❌ 語音播放出錯 (伺服器: {self.guild_id}): {error}")
+        elif self.looping and self.is_connected:
+            # 音源自己結束 (例如 ffmpeg 被中斷) 但仍要循環，就接著再播
+            self._start(generation)
+            return
+        self._finish()
+
+    def _finish(self):
+        self.looping = False
+        self.owner = None
+        self._done.set()
+
+    def _stop_current(self):
+        self._generation += 1
+        if self.voice_client is not None and self.voice_client.is_playing():
+            self.voice_client.stop()
+
+    def stop(self):
+        """停止播放"""
+        self._stop_current()
+        self._finish()
+
+    async def wait(self):
+        """等到播放結束"""
+        await self._done.wait()
+
+    async def play_for(self, seconds: float, owner: Optional[Hashable] = None):
+        """循環播放一段時間，時間到由計時器停止 (不輪詢)"""
+        self.play(loop=True, owner=owner)
+        generation = self._generation
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if generation == self._generation:
+                self.stop()
+
+    async def disconnect(self):
+        self.stop()
+        if self.voice_client is not None:
+            await self.voice_client.disconnect()
+            self.voice_client = None
+
+
+class PlaybackManager:
+    """依伺服器管理 GuildPlayer"""
+
+    def __init__(self, make_source: SourceFactory):
+        self.make_source = make_source
+        self.players: Dict[Hashable, GuildPlayer] = {}
+
+    def get(self, guild_id: Hashable) -> GuildPlayer:
+        player = self.players.get(guild_id)
+        if player is None:
+            player = self.players[guild_id] = GuildPlayer(guild_id, self.make_source)
+        return player
+
+    def find(self, guild_id: Hashable) -> Optional[GuildPlayer]:
+        return self.players.get(guild_id)
+
+    async def disconnect(self, guild_id: Hashable):
+        player = self.players.pop(guild_id, None)
+        if player is not None:
+            await player.disconnect()
@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+from job_queue import JOB_HEARTBEAT_SECONDS, JobQueue
+from jobs import INGEST_KINDS, JOB_TIMEOUTS, LLM_KINDS, run_job
+
+# 沒有工作時的輪詢間隔 (秒)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# 多久檢查一次卡住的工作 (其他 worker 當掉留下的)
+STALE_CHECK_INTERVAL = 30
+
+KIND_GROUPS = {
+    "ingest": INGEST_KINDS,
+    "llm": LLM_KINDS,
+    "all": INGEST_KINDS + LLM_KINDS,
+}
+
+
+@contextmanager
+def heartbeat(queue: JobQueue, job_id: int, attempts: int):
+    """執行工作期間在背景執行緒定期回報心跳，行程當掉時心跳就會停止"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                queue.heartbeat(job_id, attempts)
+            except Exception as e:
+                logging.warning(f"回報心跳失敗: {e}")
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def sweep_stale(queue: JobQueue):
+    handled = queue.requeue_stale(timeouts=JOB_TIMEOUTS)
+    if handled:
+        logging.info(f"♻️ 處理了 {handled} 個卡住的工作 (重試或標記失敗)")
+
+
+def run_worker(group: str):
+    """單一 worker 行程：不斷取出工作執行"""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - %(levelname)s - [worker {group}:{os.getpid()}] %(message)s')
+    queue = JobQueue()
+
+    kinds = KIND_GROUPS[group]
+    logging.info(f"🛠️ worker 啟動，處理: {', '.join(kinds)}")
+    last_sweep = float("-inf")
+    while True:
+        # 定期檢查，當掉的 worker 留下的工作 (和它佔住的 lock_key) 不會卡到下次重新啟動
+        if time.monotonic() - last_sweep >= STALE_CHECK_INTERVAL:
+            sweep_stale(queue)
+            last_sweep = time.monotonic()
+        job = queue.claim(kinds)
+        if job is None:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        with heartbeat(queue, job["id"], job["attempts"]):
+            run_job(job, queue)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="讀書機器人背景工作 worker")
+    parser.add_argument("--kinds", choices=list(KIND_GROUPS), default="all", help="要處理的工作種類")
+    parser.add_argument("--processes", type=int, default=1, help="worker 行程數")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(args.kinds)
+        return
+
+    processes = [multiprocessing.Process(target=run_worker, args=(args.kinds,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def shutdown(signum=None, frame=None):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        sys.exit(0)
+
+    # 機器人以 terminate() (SIGTERM) 結束 worker，要一併結束子行程，不然它們會變成孤兒繼續取工作
+    # (在子行程啟動後才設定，子行程仍以預設方式處理 SIGTERM)
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()
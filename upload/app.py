@@ -1,5 +1,11 @@
 import streamlit as st
 import os
+import sys
+import time
+
+# 與機器人共用工作佇列
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+from job_queue import JobQueue  # noqa: E402
 
 st.title("📂 多資料夾檔案上傳工具")
 
@@ -14,11 +20,36 @@ UPLOAD_DIRS = {
     "數學": os.path.join(BASE_DIR, "upload/math")
 }
 
+# 工作一直沒有 worker 開始處理 (例如 INGEST_WORKERS=0 或 worker 掛了) 就不再等待 (秒)
+PENDING_WAIT_SECONDS = 30
+# 最多在頁面上追蹤處理進度多久 (秒)，之後可用 /工作狀態 查詢
+PROGRESS_WAIT_SECONDS = 30 * 60
+
+STAGE_LABELS = {
+    "extract": "擷取文字",
+    "chunk": "切分片段",
+    "save": "儲存題庫",
+}
+
 # 確保所有目標資料夾都存在
 for path in UPLOAD_DIRS.values():
     if not os.path.exists(path):
         os.makedirs(path)
 
+job_queue = JobQueue()
+
+
+def save_upload(uploaded_file, file_path):
+    """寫完才改名，資料夾監看不會讀到寫一半的檔案
+
+    Streamlit 收到的檔案本來就整個在記憶體中，getbuffer() 直接寫出，不會再多複製一份。
+    """
+    part_path = file_path + ".part"
+    with open(part_path, "wb") as f:
+        f.write(uploaded_file.getbuffer())
+    os.replace(part_path, file_path)
+
+
 # --- 網站介面與邏輯 ---
 
 # 讓使用者選擇要上傳到哪個資料夾
@@ -29,15 +60,57 @@ save_directory = UPLOAD_DIRS[selected_folder_name]
 
 st.write(f"您選擇的路徑是: `{save_directory}`")
 
-# 檔案上傳元件
-uploaded_file = st.file_uploader("### 2. 上傳檔案")
+# 檔案上傳元件 (可一次選多個檔案)
+uploaded_files = st.file_uploader("### 2. 上傳檔案", accept_multiple_files=True)
 
-if uploaded_file is not None:
-    # 直接在目標資料夾內建立檔案，不需要額外子資料夾
-    file_path = os.path.join(save_directory, uploaded_file.name)
+if uploaded_files and st.button("3. 儲存並更新題庫"):
+    jobs = []
+    for uploaded_file in uploaded_files:
+        # 直接在目標資料夾內建立檔案，不需要額外子資料夾
+        file_path = os.path.join(save_directory, uploaded_file.name)
+        save_upload(uploaded_file, file_path)
 
-    # 寫入檔案
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+        if uploaded_file.name.lower().endswith(".pdf"):
+            category = os.path.basename(save_directory)
+            # 同一分類的工作依序執行，避免同時寫入同一個題庫 JSON
+            job_id = job_queue.enqueue("ingest_file", {
+                "category": category,
+                "path": file_path,
+            }, lock_key=category)
+            jobs.append((uploaded_file.name, job_id))
+        else:
+            st.info(f"📎 {uploaded_file.name} 已儲存 (非 PDF，不會加入題庫)")
+
+    st.success(f"✅ {len(uploaded_files)} 個檔案已成功儲存至 **{selected_folder_name}** 資料夾！")
 
-    st.success(f"✅ 檔案已成功儲存至 **{selected_folder_name}** 資料夾！")
+    # 顯示每個檔案的處理進度 (由機器人在背景處理)
+    bars = {job_id: (name, st.progress(0.0, text=f"⏳ {name} 等待處理...")) for name, job_id in jobs}
+    started = time.monotonic()
+    # 有任何一個工作開始執行就代表 worker 在運作，同分類排在後面的檔案繼續等
+    worker_seen = False
+    while bars:
+        waited = time.monotonic() - started
+        for job_id, (name, bar) in list(bars.items()):
+            job = job_queue.get(job_id)
+            worker_seen |= job["status"] != "pending"
+            if job["status"] == "done":
+                result = job["result"]
+                bar.progress(1.0, text=f"✅ {name} 完成，共 {result['chunks']} 個片段")
+                if result.get("page_stats"):
+                    st.caption(f"{name}: {result['page_stats']}")
+                del bars[job_id]
+            elif job["status"] == "failed":
+                bar.progress(1.0, text=f"❌ {name} 處理失敗: {job['error']}")
+                del bars[job_id]
+            elif job["status"] == "pending" and not worker_seen and waited > PENDING_WAIT_SECONDS:
+                bar.progress(0.0, text=f"📥 {name} 已排入佇列 (工作 #{job_id})，背景 worker 開始處理後會自動加入題庫")
+                del bars[job_id]
+            elif waited > PROGRESS_WAIT_SECONDS:
+                bar.progress(0.0, text=f"⏳ {name} 仍在處理中，可在 Discord 用 /工作狀態 {job_id} 查詢")
+                del bars[job_id]
+            elif job["progress"]:
+                progress = job["progress"]
+                fraction = progress["done"] / progress["total"] if progress["total"] else 0.0
+                label = STAGE_LABELS.get(progress["stage"], progress["stage"])
+                bar.progress(min(fraction, 1.0), text=f"⚙️ {name} {label} ({progress['done']}/{progress['total']})")
+        time.sleep(0.5)